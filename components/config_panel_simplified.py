@@ -1,7 +1,8 @@
 ﻿# filepath: d:\codes2\pico pad\MacroPadConfigurator\components\config_panel_simplified.py
 import tkinter as tk
 from tkinter import ttk, messagebox
-from engine import update_profile_key, load_profiles
+from engine import update_profile_key, load_bindings, UNCHANGED
+from device.aio import device_loop
 
 # Import our new tab modules
 from .config_tabs.basic_tab import BasicConfigTab
@@ -139,11 +140,10 @@ class ConfigPanel:
             key_index = self.app.selected_key
             
             # Load profiles
-            profiles = load_profiles()
+            profiles = load_bindings()
             
             if profile_index in profiles and key_index in profiles[profile_index]:
-                key_config = profiles[profile_index][key_index]
-                name = key_config.get("name", f"Key {key_index}")
+                name = profiles[profile_index].get(key_index).display_name(key_index)
                 
                 # Set shared name
                 self.shared_name = name
@@ -182,14 +182,52 @@ class ConfigPanel:
         name = self.shared_name
         
         # Update the key configuration
-        if update_profile_key(profile_index, key_index, key_combination, name, extra_data):
-            messagebox.showinfo("Success", f"Key {key_index} updated in profile {profile_index}")
+        self.save_key(profile_index, key_index, key_combination, name, extra_data,
+                      f"Key {key_index} updated in profile {profile_index}",
+                      "Failed to update key configuration")
+    
+    def save_key(self, profile_index, key_index, key_combination, name, extra_data, success_message, error_message):
+        """
+        Write a key update without blocking the UI.
+        
+        The write runs on the device loop's file I/O worker (in save order)
+        and the outcome is shown once it is done; without a Tk bridge on the
+        app it is written synchronously.
+        """
+        bridge = getattr(self.app, "bridge", None)
+        if bridge is None:
+            self.on_key_saved(update_profile_key(profile_index, key_index, key_combination, name, extra_data),
+                              success_message, error_message)
+            return
+        
+        if hasattr(self.app, "status_bar"):
+            self.app.status_bar.update_status(f"Saving key {key_index}...")
+        future = device_loop.run_file_io(update_profile_key, profile_index, key_index, key_combination, name, extra_data)
+        
+        def done(future):
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"Error saving key: {e}")
+                result = False
+            bridge.post(self.on_key_saved, result, success_message, error_message)
+        future.add_done_callback(done)
+    
+    def on_key_saved(self, success, success_message, error_message):
+        """Report the outcome of save_key (Tk thread)."""
+        if success == UNCHANGED:
+            # Nothing was written, so the pad was not reloaded either
+            if hasattr(self.app, "status_bar"):
+                self.app.status_bar.update_status("No changes to save")
+            messagebox.showinfo("No Changes", "This key already has this configuration; nothing was saved.")
+        elif success:
+            messagebox.showinfo("Success", success_message)
             
             # Update UI to show the new configuration
             if hasattr(self.app, "refresh_keypad"):
                 self.app.refresh_keypad()
         else:
-            messagebox.showerror("Error", "Failed to update key configuration")
+            messagebox.showerror("Error", error_message)
     
     def save_text_config(self):
         """Save the text configuration to the selected key."""
@@ -208,14 +246,9 @@ class ConfigPanel:
         name = self.shared_name
         
         # Update the key configuration
-        if update_profile_key(profile_index, key_index, key_combination, name, extra_data):
-            messagebox.showinfo("Success", f"Text configuration for Key {key_index} updated in profile {profile_index}")
-            
-            # Update UI to show the new configuration
-            if hasattr(self.app, "refresh_keypad"):
-                self.app.refresh_keypad()
-        else:
-            messagebox.showerror("Error", "Failed to update text configuration")
+        self.save_key(profile_index, key_index, key_combination, name, extra_data,
+                      f"Text configuration for Key {key_index} updated in profile {profile_index}",
+                      "Failed to update text configuration")
     
     def register_save_button(self, button):
         """Register a save button to be enabled/disabled based on key selection."""
@@ -1,5 +1,7 @@
+import time
 import tkinter as tk
-from engine import load_profiles
+from engine import load_bindings, get_layout
+from utils.bindings import KIND_TEXT, KIND_SOFTWARE, Profile
 
 # Import our custom widgets
 from utils.modern_widgets import ModernKeyButton
@@ -26,11 +28,19 @@ except ImportError:
     # Use ModernFrame from our ui_components module
     from utils.ui_components import ModernFrame
 
+# Keys pressed on the pad are redrawn at most once per frame (~60 per second)
+FRAME_MS = 16
+# Shortest time a pad keypress stays lit, so quick taps are still visible
+MIN_FLASH = 0.08
+
 class KeypadSection:
     def __init__(self, root, app=None):
         self.root = root
         self.app = app  # Reference to main app
         self.selected_key = None
+        self.key_lit = {}  # key id -> time its highlight ends, None while held down
+        self.telemetry = None  # KeyTelemetry being shown
+        self.frame_pending = False
         
         # Create modern frame with curved corners
         if 'ModernFrame' in globals():
@@ -73,24 +83,30 @@ class KeypadSection:
             self.update_keys(self.app.selected_profile)
 
     def create_keypad(self):
-        """Create the keypad buttons."""
+        """Create the keypad buttons, sized to fit the layout's key grid."""
         # Clear any existing buttons
         for button in self.key_buttons:
             button[1].destroy()
         self.key_buttons = []
+        self.key_lit = {}
+        
+        self.layout = get_layout()
+        
+        # Shrink buttons for grids larger than the original 3x3 pad
+        width = min(100, 335 // self.layout.cols - 16)
+        height = min(80, 360 // self.layout.rows - 16)
+        padding = 8 if self.layout.key_count <= 9 else 4
         
         # Create new buttons with modern styling
-        for i in range(9):
-            key_num = str(i + 1)
-            
+        for key_num in self.layout.key_ids():
             # Use modern button class
             btn = ModernKeyButton(
                 self.button_frame,
                 text=f"Key {key_num}",
                 command=lambda k=key_num: self.configure_key(k),
-                width=100,
-                height=80,
-                corner_radius=12,
+                width=width,
+                height=height,
+                corner_radius=12 if padding == 8 else 8,
                 bg=COLORS["bg_light"],
                 fg=COLORS["text"],
                 activebg=COLORS["accent"],
@@ -98,42 +114,44 @@ class KeypadSection:
             )
             
             # Position button in grid with slightly more space
-            row, col = divmod(i, 3)
-            btn.grid(row=row, column=col, padx=8, pady=8)
+            row, col = self.layout.position(key_num)
+            btn.grid(row=row, column=col, padx=padding, pady=padding)
             self.key_buttons.append((key_num, btn))
 
     def update_keys(self, profile_id):
         """Update keypad buttons with the selected profile's configuration."""
-        profiles = load_profiles()
+        profiles = load_bindings()
         
-        if profile_id not in profiles:
+        # Rebuild the grid if the layout changed underneath us
+        if get_layout() != self.layout:
+            self.create_keypad()
+        
+        if profile_id not in profiles and not self.layout.has_profile(profile_id):
             print(f"Profile {profile_id} not found")
             return
             
-        profile = profiles[profile_id]
+        # Profiles in the layout without any configured key yet are empty
+        profile = profiles.get(profile_id) or Profile(profile_id)
         
         for key_num, btn in self.key_buttons:
-            if key_num in profile:
-                key_config = profile[key_num]
-                name = key_config.get("name", f"Key {key_num}")
-                keys = key_config.get("key", [])
-                  # Format button text based on key type
-                if "text_type" in key_config:
+            binding = profile.get(key_num)
+            if binding is not None:
+                name = binding.display_name(key_num)
+                # Format button text based on key type
+                if binding.kind == KIND_TEXT:
                     # This is a text input key
-                    text_type = key_config.get("text_type")
-                    if text_type == "single":
+                    if binding.text_type == "single":
                         display_text = "Single Line Text"
                     else:
                         display_text = "Paragraph Text"
                     btn.set_text(f"{name}\n[{display_text}]")
                 # Check if this key has software assigned
-                elif "software" in key_config:
+                elif binding.kind == KIND_SOFTWARE:
                     # Add software indicator by adjusting the text
-                    software_name = key_config["software"].split("\\")[-1].split(".")[0]
-                    btn.set_text(f"{name}\n[Launch: {software_name}]")
+                    btn.set_text(f"{name}\n[Launch: {binding.software_name}]")
                 # Normal key combination
-                elif keys:
-                    key_text = f"{name}\n[{' + '.join(keys)}]"
+                elif binding.keys:
+                    key_text = f"{name}\n[{' + '.join(binding.keys)}]"
                     btn.set_text(key_text)
                 else:
                     # No special configuration
@@ -155,4 +173,45 @@ class KeypadSection:
             
         # Update app's selected key if needed
         if update_app and self.app and hasattr(self.app, 'set_selected_key'):
-            self.app.set_selected_key(key)
\ No newline at end of file
+            self.app.set_selected_key(key)
+
+    def show_key_events(self, telemetry):
+        """Schedule a redraw for the key events waiting in telemetry (Tk thread)."""
+        self.telemetry = telemetry
+        if not self.frame_pending:
+            self.frame_pending = True
+            self.root.after(FRAME_MS, self.redraw_key_events)
+
+    def redraw_key_events(self):
+        """Apply every key event received since the last frame in one redraw."""
+        self.frame_pending = False
+        now = time.monotonic()
+        profile_id = getattr(self.app, 'selected_profile', None)
+        events = self.telemetry.drain() if self.telemetry is not None else []
+        for event in events:
+            # Only keys of the profile on screen map to these buttons
+            if profile_id is not None and event.profile_id != profile_id:
+                continue
+            if event.pressed:
+                self.key_lit[event.key_id] = None
+            else:
+                self.key_lit[event.key_id] = max(now, event.received + MIN_FLASH)
+
+        for key_id, until in list(self.key_lit.items()):
+            if until is not None and until <= now:
+                del self.key_lit[key_id]
+        for key_num, btn in self.key_buttons:
+            btn.set_pressed(key_num in self.key_lit)
+
+        # Keep drawing frames until the last released key has faded
+        if any(until is not None for until in self.key_lit.values()) and not self.frame_pending:
+            self.frame_pending = True
+            self.root.after(FRAME_MS, self.redraw_key_events)
+
+    def clear_key_events(self):
+        """Drop all pad keypress highlights, e.g. when the pad disconnects."""
+        if self.telemetry is not None:
+            self.telemetry.drain()
+        self.key_lit = {}
+        for key_num, btn in self.key_buttons:
+            btn.set_pressed(False)
@@ -1,6 +1,6 @@
 # filepath: d:\codes2\pico pad\MacroPadConfigurator\components\profiles_section.py
 import tkinter as tk
-from engine import load_profiles
+from engine import load_profiles, get_layout
 
 # Define colors directly to avoid circular imports
 COLORS = {
@@ -21,6 +21,9 @@ from utils.ui_components import ModernFrame
 from utils.modern_widgets import ModernKeyButton
 
 class ProfilesSection:
+    # Number of profile buttons that fit without scrolling
+    VISIBLE_PROFILES = 7
+
     def __init__(self, root, app=None):
         self.root = root
         self.app = app  # Reference to main app
@@ -59,27 +62,26 @@ class ProfilesSection:
         separator = tk.Frame(interior, height=1, bg=COLORS["bg_light"])
         separator.pack(fill="x", padx=5, pady=1)
         
-        # Create a container frame for the profile buttons
-        self.button_container = tk.Frame(interior, bg=COLORS["bg_medium"])
-        self.button_container.pack(fill="both", expand=True, padx=5, pady=5)
-        
         self.profile_buttons = []
         profiles = load_profiles()
-        profile_names = {
-            "0": "Default", 
-            "1": "VSCode", 
-            "2": "OBS", 
-            "3": "Software", 
-            "4": "Windows", 
-            "5": "Photoshop"
-        }
+        layout = get_layout()
+        profile_ids = layout.profile_ids(profiles.keys())
+        
+        # Create a container frame for the profile buttons; it scrolls when
+        # the layout has more profiles than fit in the panel
+        self.scroll_canvas = None
+        if len(profile_ids) > self.VISIBLE_PROFILES:
+            self.button_container = self.create_scroll_container(interior)
+        else:
+            self.button_container = tk.Frame(interior, bg=COLORS["bg_medium"])
+            self.button_container.pack(fill="both", expand=True, padx=5, pady=5)
         
         # Track the first profile to select by default
         first_profile = None
         
         # Create modern buttons for profiles
-        for profile_id in sorted(profiles.keys()):
-            name = profile_names.get(profile_id, f"Profile {profile_id}")
+        for profile_id in profile_ids:
+            name = layout.profile_name(profile_id)
             
             # Save the first profile ID for default selection
             if first_profile is None:
@@ -91,7 +93,7 @@ class ProfilesSection:
                     self.button_container,
                     text=name,
                     command=lambda p=profile_id: self.select_profile(p),
-                    width=170,  # Wider to ensure profile names are fully visible
+                    width=150 if self.scroll_canvas else 170,  # Wider to ensure profile names are fully visible
                     height=40,  # Shorter height for profile buttons
                     corner_radius=10,
                     bg=COLORS["bg_light"],
@@ -119,10 +121,45 @@ class ProfilesSection:
                 btn.pack(fill="x", padx=5, pady=4)
                 self.profile_buttons.append((profile_id, btn))
         
+        if self.scroll_canvas:
+            self.bind_scroll_wheel()
+        
         # Select the first profile by default after short delay to ensure UI is ready
         if first_profile is not None and self.app:
             self.root.after(100, lambda: self.select_profile(first_profile))
 
+    def create_scroll_container(self, parent):
+        """Create a vertically scrolling frame for long profile lists."""
+        outer = tk.Frame(parent, bg=COLORS["bg_medium"])
+        outer.pack(fill="both", expand=True, padx=5, pady=5)
+        
+        canvas = tk.Canvas(outer, bg=COLORS["bg_medium"], highlightthickness=0, width=152)
+        scrollbar = tk.Scrollbar(outer, orient="vertical", command=canvas.yview, width=8)
+        canvas.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side="right", fill="y")
+        canvas.pack(side="left", fill="both", expand=True)
+        
+        container = tk.Frame(canvas, bg=COLORS["bg_medium"])
+        canvas.create_window((0, 0), window=container, anchor="nw")
+        container.bind("<Configure>", lambda e: canvas.configure(scrollregion=canvas.bbox("all")))
+        
+        self.scroll_canvas = canvas
+        return container
+
+    def bind_scroll_wheel(self):
+        """Let the mouse wheel scroll the profile list over any of its widgets."""
+        canvas = self.scroll_canvas
+        
+        def on_wheel(event):
+            # Windows/macOS report delta, X11 reports buttons 4 and 5
+            up = event.delta > 0 if event.delta else event.num == 4
+            canvas.yview_scroll(-1 if up else 1, "units")
+        
+        widgets = [canvas, self.button_container] + [btn for _, btn in self.profile_buttons]
+        for widget in widgets:
+            for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+                widget.bind(sequence, on_wheel, add="+")
+
     def select_profile(self, profile):
         """Handle profile selection."""
         # Update button appearance
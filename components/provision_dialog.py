@@ -0,0 +1,155 @@
+import tkinter as tk
+from tkinter import filedialog, messagebox
+
+from device.aio import device_loop
+from device.fleet import discover_pads, provision, format_results
+from engine import get_json_path, profile_store
+from utils.ui_components import COLORS
+
+
+class ProvisionDialog:
+    """Window that copies one keysfile to every attached pad (see device.fleet)."""
+
+    def __init__(self, root, app=None):
+        self.root = root
+        self.app = app
+        self.bridge = getattr(app, "bridge", None)
+        self.pads = []
+        self.running = False
+
+        self.window = tk.Toplevel(root)
+        self.window.title("Provision Pads")
+        self.window.geometry("640x400")
+        self.window.configure(bg=COLORS["bg_dark"])
+        self.window.transient(root)
+
+        # Source keysfile
+        source_frame = tk.Frame(self.window, bg=COLORS["bg_dark"])
+        source_frame.pack(fill="x", padx=10, pady=(10, 5))
+        tk.Label(source_frame, text="Keysfile:", bg=COLORS["bg_dark"], fg=COLORS["text"],
+                 font=("Segoe UI", 10)).pack(side="left")
+        self.source_var = tk.StringVar(value=get_json_path())
+        tk.Entry(source_frame, textvariable=self.source_var, bg=COLORS["bg_light"], fg=COLORS["text"],
+                 insertbackground=COLORS["text"], relief="flat").pack(side="left", fill="x", expand=True, padx=5)
+        tk.Button(source_frame, text="Browse", command=self.browse, bg=COLORS["bg_light"], fg=COLORS["text"],
+                  relief="flat").pack(side="left")
+
+        # Worker count
+        options_frame = tk.Frame(self.window, bg=COLORS["bg_dark"])
+        options_frame.pack(fill="x", padx=10, pady=5)
+        tk.Label(options_frame, text="Pads at once:", bg=COLORS["bg_dark"], fg=COLORS["text"],
+                 font=("Segoe UI", 10)).pack(side="left")
+        self.workers_var = tk.IntVar(value=16)
+        tk.Spinbox(options_frame, from_=1, to=64, width=5, textvariable=self.workers_var,
+                   bg=COLORS["bg_light"], fg=COLORS["text"], relief="flat").pack(side="left", padx=5)
+
+        # Results
+        self.output = tk.Text(self.window, bg=COLORS["bg_medium"], fg=COLORS["text"], relief="flat",
+                              font=("Consolas", 9), state="disabled")
+        self.output.pack(fill="both", expand=True, padx=10, pady=5)
+
+        # Buttons
+        button_frame = tk.Frame(self.window, bg=COLORS["bg_dark"])
+        button_frame.pack(fill="x", padx=10, pady=(5, 10))
+        self.refresh_button = tk.Button(button_frame, text="Find Pads", command=self.refresh,
+                                        bg=COLORS["bg_light"], fg=COLORS["text"], relief="flat")
+        self.refresh_button.pack(side="left")
+        self.start_button = tk.Button(button_frame, text="Provision All", command=self.start,
+                                      bg=COLORS["accent"], fg=COLORS["bg_dark"], relief="flat")
+        self.start_button.pack(side="right")
+
+        self.refresh()
+
+    def post(self, callback, *args):
+        """Run callback on the Tk thread."""
+        if self.bridge is not None:
+            self.bridge.post(callback, *args)
+        else:
+            self.root.after(0, lambda: callback(*args))
+
+    def write(self, text):
+        self.output.config(state="normal")
+        self.output.insert("end", text + "\n")
+        self.output.see("end")
+        self.output.config(state="disabled")
+
+    def clear(self):
+        self.output.config(state="normal")
+        self.output.delete("1.0", "end")
+        self.output.config(state="disabled")
+
+    def browse(self):
+        path = filedialog.askopenfilename(parent=self.window, title="Keysfile to provision",
+                                          filetypes=[("Keysfile", "*.json"), ("All files", "*.*")])
+        if path:
+            self.source_var.set(path)
+
+    def refresh(self):
+        """Look for attached pads in the background."""
+        self.clear()
+        self.write("Looking for pads...")
+        future = device_loop.run_blocking(discover_pads)
+        future.add_done_callback(lambda f: self.post(self.show_pads, f))
+
+    def show_pads(self, future):
+        try:
+            self.pads = future.result()
+        except Exception as e:
+            self.pads = []
+            self.write(f"Error finding pads: {e}")
+            return
+        self.clear()
+        if not self.pads:
+            self.write("No pads found. Connect the pads and press Find Pads.")
+        for pad in self.pads:
+            self.write(f"{pad.name:24} {pad.drive}  {pad.port or ''}")
+
+    def start(self):
+        """Provision every pad found, reporting each one as it finishes."""
+        if self.running:
+            return
+        if not self.pads:
+            messagebox.showwarning("No Pads", "No pads were found to provision.", parent=self.window)
+            return
+        source = self.source_var.get()
+        try:
+            workers = max(1, int(self.workers_var.get()))
+        except (tk.TclError, ValueError):
+            workers = 16
+
+        self.running = True
+        self.start_button.config(state="disabled")
+        self.refresh_button.config(state="disabled")
+        self.clear()
+        self.write(f"Provisioning {len(self.pads)} pads from {source}...")
+
+        def report(result):
+            status = "ok" if result else f"FAILED: {result.error}"
+            self.post(self.write, f"{result.pad.name:24} {result.seconds * 1000:8.1f} ms  {status}")
+
+        pads = list(self.pads)
+
+        def run():
+            # Save pending deferred or journaled edits first, on the worker
+            # that applies saves, so the pads get what the app shows
+            device_loop.run_file_io(profile_store.flush).result()
+            return provision(source, pads, workers, True, None, report)
+
+        future = device_loop.run_blocking(run)
+        future.add_done_callback(lambda f: self.post(self.finish, f))
+
+    def finish(self, future):
+        self.running = False
+        self.start_button.config(state="normal")
+        self.refresh_button.config(state="normal")
+        try:
+            results, wall = future.result()
+        except Exception as e:
+            self.write(f"Error: {e}")
+            return
+        self.write("")
+        self.write(format_results(results, wall).splitlines()[-1])
+        if hasattr(self.app, "status_bar"):
+            failed = sum(1 for result in results if not result)
+            self.app.status_bar.update_status(
+                f"Provisioned {len(results) - failed}/{len(results)} pads" + (f", {failed} failed" if failed else ""))
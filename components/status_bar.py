@@ -1,9 +1,20 @@
 import tkinter as tk
 import threading
-import time
 import os
-import serial
-import serial.tools.list_ports
+
+from device.aio import device_loop, TkBridge, connection_class
+from device.client import ProtocolClient
+from device.protocol import ProtocolError
+from device.connection import ConnectionManager, STATE_CONNECTED
+from device.hotplug import HotplugMonitor
+from device.latency import LatencyProbe, format_summary
+from device.live import LiveSync
+from device.merkle import HashTree, SerialTree, sync
+from device.reload import ReloadPipeline
+from device.telemetry import KeyTelemetry
+from device.transfer import send_keysfile
+from device.registry import DeviceRegistry, default_cache_path
+from device.ports import enumerate_usb_serial
 
 # Import colors and ModernFrame if available
 try:
@@ -31,12 +42,32 @@ except ImportError:
             self.interior = self
 
 class StatusBar:
-    def __init__(self, root, app=None):
+    # Seconds before checking again when a new pad's port could not be opened
+    # yet; hotplug events come before udev has created the device node
+    PROBE_RETRY_DELAYS = (0.25, 0.5, 1.0, 2.0, 4.0)
+
+    def __init__(self, root, app=None, hotplug_backend=None):
         self.root = root
         self.app = app
         self.connected = False
         self.device_port = None
-        self.stop_thread = False  # Flag to control the connection check thread
+        self.stop_thread = False  # Set once the status bar is shutting down
+        self.hotplug_backend = hotplug_backend  # None picks the best backend for the platform
+        self.registry = DeviceRegistry(default_cache_path())  # Known pads by USB VID/PID/serial
+        self.probe_retries = 0
+        self.probe_retry_pending = False
+        # Device I/O runs on the shared asyncio loop; results reach Tk in batches
+        self.loop = device_loop
+        self.bridge = getattr(app, "bridge", None) or TkBridge(root)
+        # One long-lived serial session per pad; its link state drives the indicator
+        self.connections = ConnectionManager(on_state=self.on_link_state, factory=connection_class())
+        self.live_sync = None  # Pushes key edits over the serial link when the pad supports it
+        self.live_lock = threading.Lock()
+        # Keys pressed on the pad, shown on the keypad as they happen
+        self.telemetry = KeyTelemetry(on_pending=self.on_key_events)
+        self.latency_probe = None  # Pings the pad once a second while live
+        self.reload_pipeline = None  # One soft reload per save instead of auto-reloads
+        self.hash_tree = None  # Keymap hash tree, compared with the pad's to find drift
         
         # Create modern status bar with rounded corners
         if 'ModernFrame' in globals():
@@ -86,9 +117,20 @@ class StatusBar:
         )
         self.connection_status_label.pack(side="right", padx=15)
         
-        # Start connection monitoring thread
-        self.connection_thread = threading.Thread(target=self.check_connection_loop, daemon=True)
-        self.connection_thread.start()
+        # Serial round-trip times, filled in once the pad answers pings
+        self.latency_label = tk.Label(
+            self.connection_status_frame, 
+            text="", 
+            bg=COLORS["bg_medium"], 
+            fg=COLORS["text_dim"], 
+            font=("Segoe UI", 9)
+        )
+        self.latency_label.pack(side="right", padx=5)
+        
+        # Check once now, then again whenever a serial device is plugged or unplugged
+        self.loop.run_blocking(self.check_connection)
+        self.hotplug_monitor = HotplugMonitor(self.on_hotplug, backend=self.hotplug_backend, loop=self.loop)
+        self.hotplug_monitor.start()
     
     def update_status(self, message):
         """Update the status bar with a message."""
@@ -112,40 +154,198 @@ class StatusBar:
             self.device_port = None
     
     def check_connection(self):
-        """Check if the device is connected."""
+        """Check if the device is connected (blocking, run it on the device loop's executor)."""
         try:
-            # Look for common USB device identifiers for Arduino-based devices
-            # Adjust these values based on your specific device
-            ports = list(serial.tools.list_ports.comports())
-            for port in ports:
-                # Check for Raspberry Pi Pico device
-                # Adjust the detection criteria based on your specific device
-                if "Pico" in port.description or "USB Serial Device" in port.description:
-                    try:
-                        # Try to open the serial connection briefly to confirm it's working
-                        ser = serial.Serial(port.device, 9600, timeout=1)
-                        ser.close()
-                        self.root.after(0, lambda: self.update_connection_status(True, port.device))
-                        return True
-                    except:
-                        pass
+            # Pads are recognised by USB VID/PID (read from sysfs on Linux,
+            # filtered before anything else); a port is only probe-opened
+            # the first time its VID/PID/serial number is seen
+            ports = enumerate_usb_serial(self.registry.usb_ids)
+            pads = self.registry.find_pads(ports)
+            if self.registry.unconfirmed:
+                self.schedule_probe_retry()
+            else:
+                self.probe_retries = 0
+            if pads:
+                # One port per pad, its usb_cdc.data port when it has one
+                device = pads[0].device
+                # Keep the session to the active pad; its reader thread
+                # reports connected/disconnected through on_link_state
+                for other in self.connections.devices():
+                    if other != device:
+                        self.connections.disconnect(other)
+                self.connections.connect(device)
+                return True
             
             # No matching device found
-            self.root.after(0, lambda: self.update_connection_status(False))
+            self.connections.close_all()
+            self.bridge.post_latest("connection", self.update_connection_status, False)
             return False
         except Exception as e:
             print(f"Error checking connection: {e}")
-            self.root.after(0, lambda: self.update_connection_status(False))
+            self.bridge.post_latest("connection", self.update_connection_status, False)
             return False
     
-    def check_connection_loop(self):
-        """Continuously check for device connection in a separate thread."""
-        while not self.stop_thread:
-            self.check_connection()
-            time.sleep(2)  # Check every 2 seconds
+    def schedule_probe_retry(self):
+        """Check the connection again shortly, backing off, while a new pad's port cannot be opened."""
+        if self.stop_thread or self.probe_retry_pending or self.probe_retries >= len(self.PROBE_RETRY_DELAYS):
+            return
+        delay = self.PROBE_RETRY_DELAYS[self.probe_retries]
+        self.probe_retries += 1
+        self.probe_retry_pending = True
+        self.loop.call_later(delay, self.retry_probe)
+    
+    def retry_probe(self):
+        """Timer callback (device loop thread) for schedule_probe_retry."""
+        self.probe_retry_pending = False
+        if not self.stop_thread:
+            self.loop.run_blocking(self.check_connection)
+    
+    def on_link_state(self, state, device):
+        """Mirror a serial session's link state in the status bar (device loop thread)."""
+        if self.stop_thread:
+            return
+        connected = state == STATE_CONNECTED
+        self.bridge.post_latest("connection", self.update_connection_status, connected, device if connected else None)
+        # Both wait on the pad's answers, which this thread delivers; run them
+        # elsewhere, on one worker so a quick reconnect is handled in order
+        if connected:
+            self.loop.run_session(self.start_live_sync, device)
+        else:
+            self.loop.run_session(self.stop_live_sync)
+    
+    def start_live_sync(self, device):
+        """Switch to live key updates if the pad on device speaks the protocol."""
+        connection = self.connections.get(device)
+        if connection is None:
+            return
+        with self.live_lock:
+            if self.live_sync is not None:
+                return
+            client = ProtocolClient(connection)
+            client.start()
+            live_sync = LiveSync(client)
+            if not live_sync.start():
+                client.stop()
+                return
+            self.live_sync = live_sync
+            self.telemetry.attach(client)
+            self.latency_probe = LatencyProbe(client, on_sample=self.on_latency_sample)
+            self.latency_probe.start()
+            self.reload_pipeline = ReloadPipeline(client, on_result=self.on_pad_reloaded)
+            self.reload_pipeline.start()
+            self.hash_tree = HashTree(prepare=live_sync.entry_for_pad)
+        self.bridge.post(self.update_status, "Live key updates enabled")
+        # Fix whatever changed while the pad was away
+        self.sync_pad()
+    
+    def stop_live_sync(self):
+        """Stop live updates and save any edit still waiting for the keysfile."""
+        with self.live_lock:
+            live_sync, self.live_sync = self.live_sync, None
+            latency_probe, self.latency_probe = self.latency_probe, None
+            reload_pipeline, self.reload_pipeline = self.reload_pipeline, None
+            self.hash_tree = None
+        if latency_probe is not None:
+            latency_probe.stop()
+            if not self.stop_thread:
+                self.bridge.post_latest("latency", self.latency_label.config, {"text": ""})
+        if live_sync is not None:
+            self.telemetry.detach()
+            live_sync.stop()
+            # After live_sync.stop(): its final save is part of the last reload
+            if reload_pipeline is not None:
+                reload_pipeline.stop()
+            live_sync.client.stop()
+            keypad = getattr(self.app, 'keypad_section', None)
+            if keypad is not None and not self.stop_thread:
+                self.bridge.post(keypad.clear_key_events)
+    
+    def sync_pad(self, report_in_sync=False):
+        """Send the keys that differ between the keysfile and the pad (blocking, run it on the device loop's executor)."""
+        from engine import get_json_path, profile_store
+        with self.live_lock:
+            live_sync, hash_tree = self.live_sync, self.hash_tree
+        if live_sync is None:
+            self.bridge.post(self.update_status, "No pad connected over serial")
+            return None
+        try:
+            # Read errors must not look like an empty keymap, or every key would be removed
+            profiles = profile_store.read(get_json_path()).get("profiles", {})
+            result = sync(profiles, SerialTree(live_sync.client), hash_tree)
+        except (ProtocolError, OSError, ValueError) as e:
+            self.bridge.post(self.update_status, f"Pad sync failed: {e}")
+            return None
+        if result.changes:
+            self.bridge.post(self.update_status, f"Pad synced: {len(result.changes)} keys sent "
+                                                 f"({result.bytes_sent + result.bytes_received} bytes)")
+        elif report_in_sync:
+            self.bridge.post(self.update_status, "Pad already matches the keysfile")
+        return result
+    
+    def send_config(self):
+        """Send the whole keysfile over the serial link, for pads without a drive."""
+        with self.live_lock:
+            live_sync = self.live_sync
+        if live_sync is None:
+            self.update_status("No pad connected over serial")
+            return
+        self.update_status("Sending keysfile over serial...")
+        
+        def progress(done, count):
+            self.bridge.post_latest("transfer", self.update_status, f"Sending keysfile over serial: {done}/{count} chunks")
+        
+        def send():
+            try:
+                result = send_keysfile(live_sync.client, on_progress=progress)
+            except (ProtocolError, OSError) as e:
+                # Sending again resumes from the last chunk the pad received
+                self.bridge.post_latest("transfer", self.update_status, f"Sending keysfile failed: {e}")
+                return
+            self.bridge.post_latest("transfer", self.update_status,
+                                    f"Keysfile sent: {result.size / 1024:.1f} KB ({result.ratio:.1f}x compressed) "
+                                    f"at {result.kb_per_s:.0f} KB/s")
+        
+        self.loop.run_blocking(send)
+    
+    def on_pad_reloaded(self, result):
+        """Report how long the pad took to run the saved keymap (reload pipeline thread)."""
+        if self.stop_thread:
+            return
+        if result.error:
+            message = f"Pad reload failed: {result.error}"
+        elif not result.in_sync:
+            message = "Pad reloaded, but is not running the saved keymap"
+        else:
+            message = f"Pad running the new keymap ({result.save_to_ready * 1000:.0f} ms after saving)"
+        self.bridge.post(self.update_status, message)
+    
+    def on_latency_sample(self, histogram):
+        """Show the latest round-trip summary (latency probe thread)."""
+        if not self.stop_thread:
+            self.bridge.post_latest("latency", self.latency_label.config, {"text": format_summary(histogram.summary())})
+    
+    def on_key_events(self):
+        """Have the keypad draw the pad's new key events (device loop thread)."""
+        keypad = getattr(self.app, 'keypad_section', None)
+        if keypad is not None and not self.stop_thread:
+            self.bridge.post_latest("key-events", keypad.show_key_events, self.telemetry)
+    
+    def get_connection(self):
+        """The SerialConnection to the active pad, or None."""
+        if self.device_port is None:
+            return None
+        return self.connections.get(self.device_port)
+    
+    def on_hotplug(self, events):
+        """Re-check the connection when serial devices come or go."""
+        if not self.stop_thread:
+            # A new plug gets the full set of probe retries
+            self.probe_retries = 0
+            self.loop.run_blocking(self.check_connection)
     
     def stop(self):
-        """Stop the connection checking thread when closing the application."""
+        """Stop the hotplug monitor and close the serial sessions when closing the application."""
         self.stop_thread = True
-        if self.connection_thread.is_alive():
-            self.connection_thread.join(timeout=1)
\ No newline at end of file
+        self.hotplug_monitor.stop()
+        self.stop_live_sync()
+        self.connections.close_all()
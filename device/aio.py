@@ -0,0 +1,324 @@
+"""
+One asyncio event loop, on one background thread, for the app's device I/O.
+
+Serial ports and hotplug sockets are watched with loop.add_reader() instead
+of a thread each; blocking work (port enumeration, keysfile writes) runs in
+executors owned by the loop. Results go back to Tk through a TkBridge, which
+delivers them in batches from a single after_idle callback.
+"""
+import asyncio
+import concurrent.futures
+import os
+import threading
+
+from device.connection import BaseConnection, STATE_CONNECTING, STATE_CONNECTED, STATE_DISCONNECTED, STATE_CLOSED
+
+
+class DeviceLoop:
+    """
+    An asyncio loop running on a daemon thread, started on first use.
+
+    All methods may be called from any thread; coroutines and callbacks run
+    on the loop thread. Keysfile writes go through run_file_io(), a single
+    worker, so saves are applied in the order they were made; starting and
+    stopping a pad session go through run_session() for the same reason.
+    """
+
+    def __init__(self):
+        self.loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._file_executor = None
+        self._session_executor = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return self.loop
+            ready = threading.Event()
+            self.loop = asyncio.new_event_loop()
+            self._file_executor = concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix="file-io")
+            self._session_executor = concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix="session")
+
+            def run():
+                asyncio.set_event_loop(self.loop)
+                self.loop.call_soon(ready.set)
+                self.loop.run_forever()
+
+            self._thread = threading.Thread(target=run, name="device-loop", daemon=True)
+            self._thread.start()
+            ready.wait()
+            return self.loop
+
+    def stop(self, timeout=2):
+        """Cancel what is still running and stop the loop thread"""
+        with self._lock:
+            thread, loop = self._thread, self.loop
+            self._thread = None
+        if thread is None:
+            return
+
+        async def shutdown():
+            tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            loop.stop()
+
+        asyncio.run_coroutine_threadsafe(shutdown(), loop)
+        thread.join(timeout)
+        self._file_executor.shutdown(wait=True)
+        # A session still waiting on a silent pad must not hold up closing
+        self._session_executor.shutdown(wait=False)
+        if not thread.is_alive():
+            loop.close()
+
+    def in_loop_thread(self):
+        return self._thread is not None and threading.current_thread() is self._thread
+
+    def submit(self, coro):
+        """Run a coroutine on the loop; returns a concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.start())
+
+    def call_soon(self, callback, *args):
+        """Run callback(*args) on the loop thread"""
+        self.start().call_soon_threadsafe(callback, *args)
+
+    def call_later(self, delay, callback, *args):
+        """Run callback(*args) on the loop thread after delay seconds"""
+        loop = self.start()
+        loop.call_soon_threadsafe(loop.call_later, delay, callback, *args)
+
+    def run_blocking(self, func, *args):
+        """Run a blocking function in the loop's default executor"""
+        return self.submit(self._in_executor(None, func, *args))
+
+    def run_file_io(self, func, *args):
+        """Run a blocking file operation on the ordered file I/O worker"""
+        self.start()
+        return self.submit(self._in_executor(self._file_executor, func, *args))
+
+    def run_session(self, func, *args):
+        """Run a blocking pad session step (connect, disconnect) on its ordered worker"""
+        self.start()
+        return self.submit(self._in_executor(self._session_executor, func, *args))
+
+    async def _in_executor(self, executor, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+
+
+# Shared loop used by the StatusBar, the ConfigPanel and the device layer
+device_loop = DeviceLoop()
+
+
+class TkBridge:
+    """
+    Hand results from background threads to the Tk thread in batches.
+
+    post() only queues the call; the first call after a batch schedules one
+    after_idle() callback, which runs everything queued by then. post_latest()
+    keeps only the newest call per key, for state that is redrawn rather
+    than accumulated (connection status, key highlights).
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.posted = 0
+        self.batches = 0
+        self._lock = threading.Lock()
+        self._items = []
+        self._latest = {}  # key -> index in _items
+        self._scheduled = False
+
+    def post(self, callback, *args):
+        self._add(None, callback, args)
+
+    def post_latest(self, key, callback, *args):
+        self._add(key, callback, args)
+
+    def _add(self, key, callback, args):
+        with self._lock:
+            self.posted += 1
+            if key is not None and key in self._latest:
+                self._items[self._latest[key]] = (callback, args)
+            else:
+                if key is not None:
+                    self._latest[key] = len(self._items)
+                self._items.append((callback, args))
+            if self._scheduled:
+                return
+            self._scheduled = True
+        try:
+            self.root.after_idle(self._drain)
+        except RuntimeError:
+            pass  # The window is being destroyed
+
+    def _drain(self):
+        with self._lock:
+            items, self._items = self._items, []
+            self._latest = {}
+            self._scheduled = False
+            self.batches += 1
+        for callback, args in items:
+            try:
+                callback(*args)
+            except Exception as e:
+                print(f"Error in UI callback: {e}")
+
+
+class AsyncSerialConnection(BaseConnection):
+    """
+    SerialConnection (see device.connection) served by the DeviceLoop.
+
+    The port's file descriptor is watched with loop.add_reader() and written
+    without blocking, so any number of pads share the loop thread instead of
+    using two threads each. Reconnecting with exponential backoff is a
+    coroutine. The public methods and link states are those of
+    SerialConnection; POSIX only, as Windows serial handles cannot be
+    watched by the event loop.
+    """
+
+    def __init__(self, device, baudrate=115200, on_state=None, opener=None,
+                 min_backoff=0.1, max_backoff=5.0, receive_queue_size=1024, loop=None):
+        super().__init__(device, baudrate, on_state, opener, min_backoff, max_backoff, receive_queue_size)
+        self.device_loop = loop or device_loop
+        self._receiver = None
+        self._serial = None
+        self._fd = None
+        self._outbuf = bytearray()
+        self._lost = None
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = self.device_loop.submit(self._run())
+
+    def close(self):
+        """Stop reconnecting and close the port"""
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._connected.set()  # Wake anything waiting for a connection
+        if self._task is not None:
+            self._task.cancel()  # Thread-safe; interrupts a backoff sleep too
+            if not self.device_loop.in_loop_thread():
+                try:
+                    self._task.result(timeout=2)
+                except (concurrent.futures.CancelledError, concurrent.futures.TimeoutError):
+                    pass
+                except Exception as e:
+                    print(f"Error closing {self.device}: {e}")
+        self._set_state(STATE_CLOSED)
+
+    def set_receiver(self, callback):
+        """Deliver received bytes to callback(data) on the loop thread instead of receive()"""
+        self._receiver = callback
+
+    def send(self, data):
+        """Queue bytes to be written; returns immediately"""
+        if not self._closed.is_set():
+            self.device_loop.call_soon(self._write, bytes(data))
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        delay = self.min_backoff
+        first = True
+        self._set_state(STATE_CONNECTING)
+        while not self._closed.is_set():
+            try:
+                # Opening and configuring a port can block briefly; keep it off the loop
+                ser = await loop.run_in_executor(None, self.opener, self.device, self.baudrate, 0)
+            except Exception:
+                self._set_state(STATE_DISCONNECTED)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_backoff)
+                continue
+
+            if not first:
+                self.reconnects += 1
+            first = False
+            delay = self.min_backoff
+            self._attach(loop, ser)
+            try:
+                await self._lost
+            finally:
+                self._detach(loop)
+        self._connected.clear()
+
+    def _attach(self, loop, ser):
+        self._serial = ser
+        self._fd = ser.fileno()
+        os.set_blocking(self._fd, False)
+        self._lost = loop.create_future()
+        loop.add_reader(self._fd, self._on_readable)
+        if self._outbuf:
+            loop.add_writer(self._fd, self._on_writable)
+        self._connected.set()
+        self._set_state(STATE_CONNECTED)
+
+    def _detach(self, loop):
+        if self._fd is not None:
+            loop.remove_reader(self._fd)
+            loop.remove_writer(self._fd)
+        try:
+            self._serial.close()
+        except Exception:
+            pass
+        self._serial = None
+        self._fd = None
+        # Stale frames for a pad that may have rebooted, see BaseConnection
+        self._outbuf.clear()
+        self._connected.clear()
+        if not self._closed.is_set():
+            self._set_state(STATE_DISCONNECTED)
+
+    def _lose(self):
+        if self._lost is not None and not self._lost.done():
+            self._lost.set_result(None)
+
+    def _on_readable(self):
+        try:
+            data = os.read(self._fd, 4096)
+        except BlockingIOError:
+            return
+        except OSError:
+            self._lose()
+            return
+        if not data:
+            self._lose()  # End of file: the device went away
+            return
+        if self._receiver is not None:
+            try:
+                self._receiver(data)
+            except Exception as e:
+                print(f"Error handling data from {self.device}: {e}")
+            return
+        self._deliver(data)
+
+    def _write(self, data):
+        self._outbuf += data
+        if self._fd is not None:
+            self._on_writable()
+
+    def _on_writable(self):
+        loop = asyncio.get_running_loop()
+        try:
+            written = os.write(self._fd, self._outbuf)
+        except BlockingIOError:
+            written = 0
+        except OSError:
+            self._lose()
+            return
+        del self._outbuf[:written]
+        if self._outbuf:
+            loop.add_writer(self._fd, self._on_writable)
+        else:
+            loop.remove_writer(self._fd)
+
+
+def connection_class():
+    """AsyncSerialConnection where the loop can watch serial ports, else SerialConnection"""
+    if os.name == "posix":
+        return AsyncSerialConnection
+    from device.connection import SerialConnection
+    return SerialConnection
@@ -0,0 +1,300 @@
+import threading
+import time
+
+from device.protocol import (
+    FrameDecoder, ProtocolError, encode_frame,
+    encode_set_key, encode_set_profile, encode_profile_id, encode_ping, decode_ping,
+    MSG_ACK, MSG_NAK, MSG_SET_KEY, MSG_SET_PROFILE, MSG_SWITCH_PROFILE, MSG_GET_HASH, MSG_PING,
+    MSG_SET_AUTORELOAD, MSG_RELOAD
+)
+
+
+class ProtocolTimeout(ProtocolError):
+    """The pad did not answer a request"""
+
+
+class _Pending:
+    __slots__ = ("seq", "data", "frame", "event")
+
+    def __init__(self, seq):
+        self.seq = seq
+        self.data = None
+        self.frame = None
+        self.event = threading.Event()
+
+
+class ProtocolClient:
+    """
+    Host side of device.protocol on top of a SerialConnection.
+
+    A reader thread decodes everything the pad sends. ACK/NAK frames complete
+    the request with the same sequence number; any other frame is passed to
+    the handler registered for its type with add_handler(). request() may be
+    called from several threads at once.
+
+    Connections that push their data (set_receiver, as AsyncSerialConnection
+    does) are decoded on the connection's own thread and need no reader
+    thread; request() must then not be called from that thread.
+    """
+
+    def __init__(self, connection, timeout=0.5, retries=2):
+        self.connection = connection
+        self.timeout = timeout
+        self.retries = retries
+        self.decoder = FrameDecoder()
+        self.requests = 0
+        self.retransmits = 0
+        self.timeouts = 0
+        self._seq = 0
+        self._pending = {}
+        self._handlers = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        if hasattr(self.connection, "set_receiver"):
+            self.connection.set_receiver(self.feed)
+            return
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if hasattr(self.connection, "set_receiver"):
+            self.connection.set_receiver(None)
+        if self._thread is not None and self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1)
+        self._thread = None
+
+    def add_handler(self, msg_type, callback):
+        """Call callback(frame) from the reader thread for unsolicited frames of msg_type"""
+        self._handlers.setdefault(msg_type, []).append(callback)
+
+    def remove_handler(self, msg_type, callback):
+        if callback in self._handlers.get(msg_type, []):
+            self._handlers[msg_type].remove(callback)
+
+    def _run(self):
+        while not self._stop.is_set():
+            data = self.connection.receive(timeout=0.2)
+            if data:
+                self.feed(data)
+
+    def feed(self, data):
+        """Decode received bytes and dispatch the complete frames"""
+        for frame in self.decoder.feed(data):
+            self._dispatch(frame)
+
+    def _dispatch(self, frame):
+        if frame.type in (MSG_ACK, MSG_NAK):
+            with self._lock:
+                pending = self._pending.get(frame.seq)
+            if pending is not None:
+                pending.frame = frame
+                pending.event.set()
+            return
+        for callback in list(self._handlers.get(frame.type, [])):
+            try:
+                callback(frame)
+            except Exception as e:
+                print(f"Error handling frame {frame}: {e}")
+
+    def _next_seq(self):
+        with self._lock:
+            # Skip sequence numbers still waiting for an answer
+            for _ in range(256):
+                self._seq = (self._seq + 1) & 0xFF
+                if self._seq not in self._pending:
+                    pending = _Pending(self._seq)
+                    self._pending[self._seq] = pending
+                    return pending
+        raise ProtocolError("Too many requests in flight")
+
+    def request(self, msg_type, payload=b"", timeout=None, retries=None):
+        """
+        Send a request and wait for its ACK.
+
+        The frame is resent with the same sequence number when no answer
+        arrives within timeout; all requests are idempotent on the pad.
+
+        Returns:
+            The ACK Frame
+
+        Raises:
+            ProtocolError on a NAK, ProtocolTimeout when every attempt timed out
+        """
+        return self.wait_reply(self.send_request(msg_type, payload), timeout, retries)
+
+    def send_request(self, msg_type, payload=b""):
+        """
+        Send a request without waiting, so several can be in flight.
+
+        Every request sent must be passed to wait_reply().
+        """
+        pending = self._next_seq()
+        pending.data = encode_frame(msg_type, pending.seq, payload)
+        self.requests += 1
+        try:
+            self.connection.send(pending.data)
+        except Exception:
+            with self._lock:
+                self._pending.pop(pending.seq, None)
+            raise
+        return pending
+
+    def wait_reply(self, pending, timeout=None, retries=None):
+        """Wait for the answer to a send_request(), resending it on timeout; see request()"""
+        timeout = self.timeout if timeout is None else timeout
+        retries = self.retries if retries is None else retries
+        try:
+            for attempt in range(retries + 1):
+                if attempt:
+                    self.retransmits += 1
+                    self.connection.send(pending.data)
+                if pending.event.wait(timeout):
+                    break
+            else:
+                self.timeouts += 1
+                raise ProtocolTimeout(f"No answer from {self.connection.device}")
+        finally:
+            with self._lock:
+                self._pending.pop(pending.seq, None)
+
+        if pending.frame.type == MSG_NAK:
+            raise ProtocolError(pending.frame.payload.decode("utf-8", "replace") or "Request rejected")
+        return pending.frame
+
+    def cancel(self, pending):
+        """Stop waiting for a send_request() whose answer is no longer wanted"""
+        with self._lock:
+            self._pending.pop(pending.seq, None)
+
+    def set_key(self, profile_id, key_id, entry):
+        """Change one key on the pad; entry None removes it"""
+        self.request(MSG_SET_KEY, encode_set_key(profile_id, key_id, entry))
+
+    def set_profile(self, profile_id, profile):
+        self.request(MSG_SET_PROFILE, encode_set_profile(profile_id, profile))
+
+    def switch_profile(self, profile_id):
+        self.request(MSG_SWITCH_PROFILE, encode_profile_id(profile_id))
+
+    def get_hash(self, profile_id=None):
+        """Return the pad's config_hash of all profiles, or of one"""
+        return self.request(MSG_GET_HASH, encode_profile_id(profile_id)).payload
+
+    def set_autoreload(self, enabled):
+        """Turn CircuitPython's reload-on-write on or off until the next reload"""
+        self.request(MSG_SET_AUTORELOAD, bytes((1 if enabled else 0,)))
+
+    def reload(self):
+        """Ask the pad for a soft reload; it sends a READY frame once it is back"""
+        self.request(MSG_RELOAD)
+
+    def ping(self, number=0, timeout=None):
+        """
+        Time one round trip to the pad.
+
+        Never retransmitted, so a lost frame counts as lost instead of
+        showing up as one very slow round trip.
+
+        Returns:
+            Round-trip time in seconds
+        """
+        sent_ns = time.perf_counter_ns()
+        reply = self.request(MSG_PING, encode_ping(number, sent_ns), timeout, retries=0)
+        received_ns = time.perf_counter_ns()
+        if decode_ping(reply.payload) != (number & 0xFFFFFFFF, sent_ns):
+            raise ProtocolError("PING answered with a different payload")
+        return (received_ns - sent_ns) / 1e9
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "retransmits": self.retransmits,
+            "timeouts": self.timeouts,
+            "crc_errors": self.decoder.crc_errors
+        }
+
+
+def _serve_reference_pad(fd, pad, stop):
+    """Answer protocol frames arriving on a pty master with a ReferencePad"""
+    import os
+    import select
+    while not stop.is_set():
+        readable, _, _ = select.select([fd], [], [], 0.1)
+        if not readable:
+            continue
+        try:
+            data = os.read(fd, 4096)
+        except OSError:
+            return
+        reply = pad.feed(data)
+        if reply:
+            os.write(fd, reply)
+
+
+def demo(count=200):
+    """
+    Push count single-key changes to a ReferencePad over a pty pair and
+    report the round-trip times.
+    """
+    import os
+    import pty
+    import tty
+    from device.connection import SerialConnection
+    from device.protocol import config_hash
+    from device.reference_pad import ReferencePad
+
+    master, slave = pty.openpty()
+    tty.setraw(slave)
+    pad = ReferencePad({"0": {}})
+    stop = threading.Event()
+    server = threading.Thread(target=_serve_reference_pad, args=(master, pad, stop), daemon=True)
+    server.start()
+
+    connection = SerialConnection(os.ttyname(slave))
+    connection.start()
+    client = ProtocolClient(connection)
+    client.start()
+    try:
+        if not connection.wait_connected(2):
+            raise ProtocolError("Could not open the pty")
+
+        host = {"0": {}}
+        times = []
+        for i in range(count):
+            key_id = str(i % 9 + 1)
+            entry = {"name": f"Macro {i}", "key": ["ctrl", "shift", chr(ord("a") + i % 26)]}
+            host["0"][key_id] = entry
+            start = time.perf_counter()
+            client.set_key("0", key_id, entry)
+            times.append((time.perf_counter() - start) * 1000)
+        in_sync = client.get_hash() == config_hash(host)
+    finally:
+        client.stop()
+        connection.close()
+        stop.set()
+        server.join(timeout=1)
+        os.close(slave)
+        os.close(master)
+
+    times.sort()
+    return {
+        "count": count,
+        "median_ms": times[len(times) // 2],
+        "max_ms": times[-1],
+        "in_sync": in_sync,
+        "stats": client.stats()
+    }
+
+
+if __name__ == "__main__":
+    # Usage: python -m device.client   push key changes to a reference pad on a pty
+    result = demo()
+    print(f"{result['count']} SET_KEY round trips: median {result['median_ms']:.2f} ms, "
+          f"max {result['max_ms']:.2f} ms, hashes match: {result['in_sync']}, {result['stats']}")
@@ -0,0 +1,260 @@
+import queue
+import threading
+
+# Link states reported to on_state callbacks
+STATE_CONNECTING = "connecting"
+STATE_CONNECTED = "connected"
+STATE_DISCONNECTED = "disconnected"
+STATE_CLOSED = "closed"
+
+
+def open_serial(device, baudrate, timeout):
+    """Default opener; also accepts pyserial URLs such as loop://"""
+    import serial
+    return serial.serial_for_url(device, baudrate=baudrate, timeout=timeout, write_timeout=1)
+
+
+class BaseConnection:
+    """
+    What every serial session shares: settings, link state reporting and
+    the queue of received bytes.
+
+    Subclasses own the port and call _deliver() with what they read and
+    _set_state() as the link comes and goes. Bytes not yet written when the
+    link drops are discarded: they are frames with old sequence numbers for
+    a pad that may have rebooted, and ProtocolClient resends what it still
+    waits for.
+    """
+
+    def __init__(self, device, baudrate=115200, on_state=None, opener=None,
+                 min_backoff=0.1, max_backoff=5.0, receive_queue_size=1024):
+        self.device = device
+        self.baudrate = baudrate
+        self.on_state = on_state
+        self.opener = opener or open_serial
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.state = None
+        self.reconnects = 0
+
+        self.receive_queue = queue.Queue(maxsize=receive_queue_size)
+        self._connected = threading.Event()
+        self._closed = threading.Event()
+
+    @property
+    def connected(self):
+        return self.state == STATE_CONNECTED
+
+    def receive(self, timeout=None):
+        """Return the next chunk of received bytes, or None on timeout"""
+        try:
+            return self.receive_queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def wait_connected(self, timeout=None):
+        return self._connected.wait(timeout) and not self._closed.is_set()
+
+    def _set_state(self, state):
+        if state == self.state:
+            return
+        self.state = state
+        if self.on_state:
+            try:
+                self.on_state(state, self.device)
+            except Exception as e:
+                print(f"Error reporting link state: {e}")
+
+    def _deliver(self, data):
+        """Queue received bytes for receive()"""
+        try:
+            self.receive_queue.put_nowait(data)
+        except queue.Full:
+            # Nobody is reading; drop the oldest chunk rather than block the port
+            try:
+                self.receive_queue.get_nowait()
+            except queue.Empty:
+                pass
+            self.receive_queue.put_nowait(data)
+
+
+class SerialConnection(BaseConnection):
+    """
+    A long-lived serial session to one pad.
+
+    A reader thread and a writer thread own the port; other threads talk to
+    it only through send() and receive(), which are thread-safe queues. When
+    the port goes away (unplug, reset) the connection reports
+    STATE_DISCONNECTED and reopens it with exponential backoff until close()
+    is called.
+    """
+
+    def __init__(self, device, baudrate=115200, on_state=None, opener=None,
+                 min_backoff=0.1, max_backoff=5.0, receive_queue_size=1024):
+        super().__init__(device, baudrate, on_state, opener, min_backoff, max_backoff, receive_queue_size)
+        self.send_queue = queue.Queue()
+        self._serial = None
+        self._lock = threading.Lock()
+        self._reader = None
+        self._writer = None
+
+    def start(self):
+        if self._reader is not None:
+            return
+        self._reader = threading.Thread(target=self._read_loop, daemon=True)
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._reader.start()
+        self._writer.start()
+
+    def close(self):
+        """Stop both threads and close the port"""
+        self._closed.set()
+        self._connected.set()  # Wake anything waiting for a connection
+        self.send_queue.put(None)
+        self._drop_port()
+        for thread in (self._reader, self._writer):
+            if thread is not None and thread.is_alive() and thread is not threading.current_thread():
+                thread.join(timeout=1)
+        self._set_state(STATE_CLOSED)
+
+    def send(self, data):
+        """Queue bytes to be written; returns immediately"""
+        if not self._closed.is_set():
+            self.send_queue.put(bytes(data))
+
+    def _drop_port(self):
+        with self._lock:
+            ser, self._serial = self._serial, None
+            self._connected.clear()
+        if ser is not None:
+            try:
+                ser.close()
+            except Exception:
+                pass
+            if not self._closed.is_set():
+                self._discard_unsent()
+                self._set_state(STATE_DISCONNECTED)
+
+    def _discard_unsent(self):
+        """Forget bytes queued for the link that just dropped (see BaseConnection)"""
+        while True:
+            try:
+                data = self.send_queue.get_nowait()
+            except queue.Empty:
+                return
+            if data is None:
+                # close() raced us; the writer still needs its stop marker
+                self.send_queue.put(None)
+                return
+
+    def _open_with_backoff(self):
+        """Open the port, retrying with exponential backoff; False once closed"""
+        delay = self.min_backoff
+        if self.state != STATE_DISCONNECTED:
+            # Report "connecting" for the first attempt only, retries stay
+            # "disconnected" so listeners are not flooded while unplugged
+            self._set_state(STATE_CONNECTING)
+        while not self._closed.is_set():
+            try:
+                ser = self.opener(self.device, self.baudrate, 0.1)
+            except Exception:
+                self._set_state(STATE_DISCONNECTED)
+                if self._closed.wait(delay):
+                    return False
+                delay = min(delay * 2, self.max_backoff)
+                continue
+
+            with self._lock:
+                self._serial = ser
+                self._connected.set()
+            self._set_state(STATE_CONNECTED)
+            return True
+        return False
+
+    def _read_loop(self):
+        first = True
+        while not self._closed.is_set():
+            with self._lock:
+                ser = self._serial
+            if ser is None:
+                if not first:
+                    self.reconnects += 1
+                first = False
+                if not self._open_with_backoff():
+                    return
+                continue
+
+            try:
+                data = ser.read(ser.in_waiting or 1)
+                if data and ser.in_waiting:
+                    data += ser.read(ser.in_waiting)
+            except Exception:
+                self._drop_port()
+                continue
+            if data:
+                self._deliver(data)
+
+    def _write_loop(self):
+        while not self._closed.is_set():
+            data = self.send_queue.get()
+            if data is None:
+                return
+            while not self._closed.is_set():
+                if not self._connected.wait(0.5):
+                    continue
+                with self._lock:
+                    ser = self._serial
+                if ser is None:
+                    continue
+                try:
+                    ser.write(data)
+                    ser.flush()
+                except Exception:
+                    # Not resent after reconnecting, see BaseConnection
+                    self._drop_port()
+                break
+
+
+class ConnectionManager:
+    """
+    Keeps one SerialConnection per device and reports their link state.
+
+    factory builds the connections; it takes the SerialConnection arguments
+    (device, baudrate, on_state, opener), e.g. device.aio.AsyncSerialConnection.
+    """
+
+    def __init__(self, on_state=None, opener=None, baudrate=115200, factory=None):
+        self.on_state = on_state
+        self.opener = opener
+        self.baudrate = baudrate
+        self.factory = factory or SerialConnection
+        self._connections = {}
+        self._lock = threading.Lock()
+
+    def connect(self, device):
+        """Return the connection for device, opening it if needed"""
+        with self._lock:
+            connection = self._connections.get(device)
+            if connection is None:
+                connection = self.factory(device, self.baudrate, self.on_state, self.opener)
+                self._connections[device] = connection
+                connection.start()
+            return connection
+
+    def get(self, device):
+        with self._lock:
+            return self._connections.get(device)
+
+    def devices(self):
+        with self._lock:
+            return list(self._connections)
+
+    def disconnect(self, device):
+        with self._lock:
+            connection = self._connections.pop(device, None)
+        if connection is not None:
+            connection.close()
+
+    def close_all(self):
+        for device in self.devices():
+            self.disconnect(device)
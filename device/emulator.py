@@ -0,0 +1,378 @@
+"""
+MacroPad emulator for working without hardware.
+
+Creates a pseudo-terminal pair standing in for the pad's USB serial port
+and a temporary directory standing in for its CIRCUITPY drive, then
+behaves like the firmware:
+
+- protocol frames on the serial side are answered by a ReferencePad
+- when keysfile.json changes the keymap is reloaded, as CircuitPython's
+  auto-reload would (unless the host turned it off), and a boot banner
+  and a READY frame are sent on the serial port
+- a RELOAD request soft-reloads it the same way
+- a keysfile sent over serial (device.transfer) is saved to the drive
+- optionally, KEY_EVENT frames for random keys are sent at a fixed rate
+
+Run it with
+
+    python -m device.emulator [--rate N] [--app]
+
+and start the app with the MACROPAD_PORT and MACROPAD_DRIVE variables it
+prints (or pass --app to launch main.py with them set); device discovery
+and the drive lookup then pick the emulator up like a real pad.
+"""
+import json
+import os
+import random
+import select
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from device.protocol import encode_frame, encode_key_event, MSG_KEY_EVENT
+from device.reference_pad import ReferencePad
+
+# Printed on the serial port after every (re)load, like code.py's output
+BOOT_BANNER = b"\r\nsoft reboot\r\n\r\ncode.py output:\r\n"
+READY_BANNER = b"MacroPad ready\r\n"
+
+BOOT_OUT = (
+    "Adafruit CircuitPython 9.2.1 on 2024-11-20; Raspberry Pi Pico with rp2040\r\n"
+    "Board ID:raspberry_pi_pico\r\n"
+)
+
+
+class PadEmulator:
+    """
+    One emulated pad: a pty (port) and a CIRCUITPY-like directory (drive_path).
+
+    Args:
+        directory: Directory to use as the drive; a temporary one is created
+            (and removed on stop) when None
+        keysfile_data: Initial keysfile.json content; defaults to an empty layout
+        event_rate: KEY_EVENT frames per second, 0 for none
+        reload_delay: How long keysfile.json must stay unchanged before a
+            reload, like CircuitPython's auto-reload settling time
+        max_pending: Bytes buffered for a host that is not reading before
+            further key events are dropped
+        boot_time: Seconds a reload keeps the pad busy before it is ready
+    """
+
+    def __init__(self, directory=None, keysfile_data=None, event_rate=0, reload_delay=0.1,
+                 max_pending=64 * 1024, boot_time=0.0):
+        self.event_rate = event_rate
+        self.reload_delay = reload_delay
+        self.max_pending = max_pending
+        self.boot_time = boot_time
+        self.reloads = 0
+        self.reloads_suppressed = 0
+        self.events_sent = 0
+        self.events_dropped = 0
+        self.bytes_received = 0
+
+        self._owns_directory = directory is None
+        if directory is None:
+            directory = os.path.join(tempfile.mkdtemp(prefix="macropad-emu-"), "CIRCUITPY")
+        self.drive_path = directory
+        self.keysfile_path = os.path.join(directory, "keysfile.json")
+        self._keysfile_data = keysfile_data
+
+        self.pad = ReferencePad(on_config=self._save_config)
+        self.layout = None
+        self.port = None
+        self._master = None
+        self._slave = None
+        self._outbuf = bytearray()
+        self._out_lock = threading.Lock()
+        self._signature = None
+        self._changed_at = None
+        self._started = time.monotonic()
+        self._stop = threading.Event()
+        self._threads = []
+
+    # Setup -------------------------------------------------------------------
+
+    def _create_drive(self):
+        from utils.layout import Layout
+        os.makedirs(os.path.join(self.drive_path, "lib"), exist_ok=True)
+        with open(os.path.join(self.drive_path, "boot_out.txt"), 'w', encoding='utf-8') as f:
+            f.write(BOOT_OUT)
+        if not os.path.exists(self.keysfile_path):
+            data = self._keysfile_data or Layout().empty_data()
+            with open(self.keysfile_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2)
+
+    def start(self):
+        """Create the drive and the pty and start answering on it"""
+        import pty
+        import tty
+
+        self._create_drive()
+        self._master, self._slave = pty.openpty()
+        tty.setraw(self._slave)
+        os.set_blocking(self._master, False)
+        # Holding the slave open keeps the master readable while the app
+        # closes and reopens the port
+        self.port = os.ttyname(self._slave)
+
+        self._stop.clear()
+        self._load_keymap()
+        self._threads = [threading.Thread(target=self._serve, daemon=True)]
+        if self.event_rate:
+            self._threads.append(threading.Thread(target=self._emit_events, daemon=True))
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout=1)
+        self._threads = []
+        for fd in (self._master, self._slave):
+            if fd is not None:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+        self._master = self._slave = None
+        if self._owns_directory:
+            shutil.rmtree(os.path.dirname(self.drive_path), ignore_errors=True)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    def environment(self):
+        """Environment variables that point the app at this emulator"""
+        return {"MACROPAD_PORT": self.port, "MACROPAD_DRIVE": self.drive_path}
+
+    # Firmware behaviour ------------------------------------------------------
+
+    def uptime_ms(self):
+        return int((time.monotonic() - self._started) * 1000)
+
+    def _keysfile_signature(self):
+        try:
+            st = os.stat(self.keysfile_path)
+            return (st.st_size, st.st_mtime_ns, st.st_ino)
+        except OSError:
+            return None
+
+    def _load_keymap(self):
+        """(Re)load keysfile.json into the pad, as code.py does at boot"""
+        from utils.layout import Layout
+        self._signature = self._keysfile_signature()
+        try:
+            with open(self.keysfile_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            # A half-written file; the next change triggers another reload
+            print(f"Emulator could not load keysfile.json: {e}")
+            return False
+        self.pad.profiles = data.get("profiles", {})
+        self.layout = Layout.from_dict(data)
+        if self.pad.current_profile not in self.pad.profiles:
+            self.pad.current_profile = next(iter(self.pad.profiles), "0")
+        return True
+
+    def _save_config(self, raw):
+        """Save a keysfile received over serial, as the firmware does with the drive locked"""
+        tmp_path = self.keysfile_path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(raw)
+        os.replace(tmp_path, self.keysfile_path)
+        # Written by the pad itself: no auto-reload
+        self._load_keymap()
+
+    def reload(self):
+        """Soft reboot: reload the keymap, print the boot banner and send READY"""
+        self.reloads += 1
+        self._started = time.monotonic()
+        self._write(BOOT_BANNER)
+        if self.boot_time:
+            self._flush_output()
+            time.sleep(self.boot_time)
+        # code.py starts over with CircuitPython's defaults
+        self.pad.autoreload = True
+        self.pad.reload_requested = False
+        self._load_keymap()
+        self._write(READY_BANNER)
+        self._write(self.pad.ready())
+
+    def _check_keysfile(self):
+        """Reload once keysfile.json has changed and then stayed unchanged"""
+        signature = self._keysfile_signature()
+        now = time.monotonic()
+        if signature != self._signature:
+            self._signature = signature
+            self._changed_at = now
+        elif self._changed_at is not None and now - self._changed_at >= self.reload_delay:
+            self._changed_at = None
+            if self.pad.autoreload:
+                self.reload()
+            else:
+                self.reloads_suppressed += 1
+
+    def _write(self, data, droppable=False):
+        """Queue bytes for the host; droppable data is discarded when the host lags"""
+        with self._out_lock:
+            if droppable and len(self._outbuf) + len(data) > self.max_pending:
+                return False
+            self._outbuf += data
+            return True
+
+    def _flush_output(self):
+        with self._out_lock:
+            if not self._outbuf:
+                return
+            try:
+                written = os.write(self._master, self._outbuf)
+            except (BlockingIOError, InterruptedError):
+                return
+            del self._outbuf[:written]
+
+    def _serve(self):
+        while not self._stop.is_set():
+            with self._out_lock:
+                want_write = [self._master] if self._outbuf else []
+            try:
+                readable, writable, _ = select.select([self._master], want_write, [], 0.02)
+            except (OSError, ValueError):
+                return
+            if readable:
+                try:
+                    data = os.read(self._master, 4096)
+                except BlockingIOError:
+                    data = b""
+                except OSError:
+                    return
+                if data:
+                    self.bytes_received += len(data)
+                    reply = self.pad.feed(data)
+                    if reply:
+                        self._write(reply)
+                    if self.pad.reload_requested:
+                        self._flush_output()  # The ACK goes out before the reboot
+                        self.reload()
+            if writable or want_write:
+                self._flush_output()
+            self._check_keysfile()
+
+    def _emit_events(self):
+        """Send a press and release of a random key event_rate times a second"""
+        interval = 1.0 / self.event_rate
+        next_time = time.monotonic()
+        while not self._stop.is_set():
+            next_time += interval
+            delay = next_time - time.monotonic()
+            if delay > 0:
+                if self._stop.wait(delay):
+                    return
+            elif delay < -1:
+                next_time = time.monotonic()  # Fell far behind; do not burst
+
+            key_ids = self.layout.key_ids() if self.layout else ["1"]
+            key_id = random.choice(key_ids)
+            profile_id = self.pad.current_profile
+            uptime = self.uptime_ms()
+            data = (encode_frame(MSG_KEY_EVENT, 0, encode_key_event(profile_id, key_id, True, uptime)) +
+                    encode_frame(MSG_KEY_EVENT, 0, encode_key_event(profile_id, key_id, False, uptime)))
+            if self._write(data, droppable=True):
+                self.events_sent += 1
+            else:
+                self.events_dropped += 1
+
+    def stats(self):
+        return {
+            "reloads": self.reloads,
+            "reloads_suppressed": self.reloads_suppressed,
+            "events_sent": self.events_sent,
+            "events_dropped": self.events_dropped,
+            "requests_handled": self.pad.handled,
+            "bytes_received": self.bytes_received
+        }
+
+
+def load_test(emulator, requests=500, profile_id="0"):
+    """
+    Drive the emulator through the app's device layer: SET_KEY round trips
+    over a SerialConnection while the emulator streams key events.
+
+    Returns:
+        Dictionary with request throughput, key events received and errors
+    """
+    from device.client import ProtocolClient
+    from device.connection import SerialConnection
+
+    events = []
+    connection = SerialConnection(emulator.port)
+    connection.start()
+    client = ProtocolClient(connection)
+    client.add_handler(MSG_KEY_EVENT, events.append)
+    client.start()
+    try:
+        if not connection.wait_connected(2):
+            raise RuntimeError(f"Could not open {emulator.port}")
+        key_ids = emulator.layout.key_ids() if emulator.layout else ["1"]
+        start = time.perf_counter()
+        for i in range(requests):
+            key_id = key_ids[i % len(key_ids)]
+            client.set_key(profile_id, key_id, {"name": f"Load {i}", "key": ["ctrl", "f1"]})
+        elapsed = time.perf_counter() - start
+    finally:
+        client.stop()
+        connection.close()
+
+    return {
+        "requests": requests,
+        "requests_per_s": requests / elapsed if elapsed else 0.0,
+        "key_events_received": len(events),
+        "client": client.stats(),
+        "emulator": emulator.stats()
+    }
+
+
+def main(argv=None):
+    import argparse
+    import subprocess
+
+    parser = argparse.ArgumentParser(prog="python -m device.emulator", description="Emulate a MacroPad on a pty")
+    parser.add_argument("--rate", type=float, default=0, help="synthetic key presses per second")
+    parser.add_argument("--drive", help="directory to use as CIRCUITPY (default: a temporary one)")
+    parser.add_argument("--app", action="store_true", help="run main.py against the emulator")
+    parser.add_argument("--load-test", type=int, metavar="N", help="run N SET_KEY requests through the device layer and exit")
+    args = parser.parse_args(argv)
+
+    emulator = PadEmulator(args.drive, event_rate=args.rate).start()
+    try:
+        if args.load_test:
+            print(json.dumps(load_test(emulator, args.load_test), indent=2))
+            return 0
+
+        env = emulator.environment()
+        for name, value in env.items():
+            print(f"{name}={value}")
+        if args.app:
+            app = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+            return subprocess.call([sys.executable, app], env=dict(os.environ, **env))
+
+        print("Emulator running, press Ctrl+C to stop")
+        try:
+            while True:
+                time.sleep(5)
+                print(emulator.stats())
+        except KeyboardInterrupt:
+            pass
+        return 0
+    finally:
+        emulator.stop()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,302 @@
+"""
+Provision many attached pads with the same keysfile at once.
+
+    python -m device.fleet --list
+    python -m device.fleet keysfile.json [--workers 16]
+    python -m device.fleet --bench 20
+
+Every CIRCUITPY drive found is written in parallel by a bounded pool of
+workers; each copy is written to a temporary file, fsynced, renamed into
+place and read back to check its SHA-256 against the source.
+"""
+import concurrent.futures
+import hashlib
+import json
+import os
+import sys
+import time
+
+KEYSFILE_NAME = "keysfile.json"
+
+
+class ProvisionError(Exception):
+    """A pad could not be provisioned or its copy did not verify"""
+
+
+class Pad:
+    """One attached pad: its drive and, when it could be paired, its serial port"""
+
+    __slots__ = ("drive", "port", "serial_number")
+
+    def __init__(self, drive, port=None, serial_number=None):
+        self.drive = drive
+        self.port = port
+        self.serial_number = serial_number
+
+    @property
+    def name(self):
+        return self.serial_number or os.path.basename(self.drive.rstrip("\\/")) or self.drive
+
+    def __repr__(self):
+        return f"Pad({self.drive!r}, port={self.port!r}, serial={self.serial_number!r})"
+
+
+class ProvisionResult:
+    """Outcome for one pad; truthy when its copy was written and verified"""
+
+    __slots__ = ("pad", "success", "seconds", "error", "digest")
+
+    def __init__(self, pad, success, seconds, error=None, digest=None):
+        self.pad = pad
+        self.success = success
+        self.seconds = seconds
+        self.error = error
+        self.digest = digest
+
+    def __bool__(self):
+        return self.success
+
+    def __repr__(self):
+        return f"ProvisionResult({self.pad.name}, success={self.success}, {self.seconds:.3f} s, error={self.error!r})"
+
+
+def _block_usb_serial(source, sysfs_root="/sys"):
+    """USB serial number of the device behind a block device such as /dev/sdb1 (Linux)"""
+    if not source or not source.startswith("/dev/"):
+        return None
+    path = os.path.realpath(os.path.join(sysfs_root, "class", "block", os.path.basename(source)))
+    while path and path != os.path.dirname(path):
+        if os.path.exists(os.path.join(path, "idVendor")):
+            try:
+                with open(os.path.join(path, "serial"), 'r', encoding='utf-8') as f:
+                    return f.readline().strip()
+            except OSError:
+                return None
+        path = os.path.dirname(path)
+    return None
+
+
+def discover_pads():
+    """
+    Find every attached pad.
+
+    Drives are found by volume label (utils.drive.find_drives) and paired with
+    a serial port through the USB serial number where the OS exposes it
+    (Linux). MACROPAD_DRIVE may list extra drive directories, separated by
+    os.pathsep, e.g. emulators.
+    """
+    from utils.drive import find_drives
+    from device.ports import enumerate_usb_serial
+    from device.registry import PAD_USB_IDS
+
+    try:
+        # Sorted so a pad's data port (the higher USB interface) wins over its console
+        identities = sorted(enumerate_usb_serial(PAD_USB_IDS), key=lambda identity: identity.interface or 0)
+        ports = {identity.serial_number: identity.device for identity in identities if identity.serial_number}
+    except Exception as e:
+        print(f"Error listing serial ports: {e}")
+        ports = {}
+
+    pads = []
+    for mount_point, source in find_drives():
+        serial_number = _block_usb_serial(source)
+        pads.append(Pad(mount_point, ports.get(serial_number), serial_number))
+    for directory in filter(None, os.environ.get("MACROPAD_DRIVE", "").split(os.pathsep)):
+        if os.path.isdir(directory) and all(pad.drive != directory for pad in pads):
+            pads.append(Pad(directory))
+    return pads
+
+
+def _referenced_blobs(data):
+    refs = set()
+    for profile in data.get("profiles", {}).values():
+        for entry in profile.values():
+            if isinstance(entry, dict) and "text_ref" in entry:
+                refs.add(entry["text_ref"])
+    return refs
+
+
+def load_source(path):
+    """
+    Read the keysfile to provision and the text blobs it refers to.
+
+    Returns:
+        (file bytes, {blob name: blob bytes})
+    """
+    with open(path, 'rb') as f:
+        payload = f.read()
+    data = json.loads(payload.decode("utf-8"))
+
+    blobs = {}
+    blob_dir = os.path.join(os.path.dirname(os.path.abspath(path)), "textblobs")
+    for ref in sorted(_referenced_blobs(data)):
+        with open(os.path.join(blob_dir, ref + ".txt"), 'rb') as f:
+            blobs[ref + ".txt"] = f.read()
+    return payload, blobs
+
+
+def _write_file(opener, path, payload):
+    """Write path atomically: temporary file, fsync, rename"""
+    tmp_path = path + ".tmp"
+    with opener(tmp_path, 'wb') as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def provision_pad(pad, payload, blobs=None, opener=None, verify=True):
+    """
+    Copy one keysfile (and its text blobs) to pad and verify the copy.
+
+    Returns:
+        ProvisionResult; failures are reported in it, never raised
+    """
+    opener = opener or open
+    digest = hashlib.sha256(payload).hexdigest()
+    start = time.perf_counter()
+    try:
+        if blobs:
+            blob_dir = os.path.join(pad.drive, "textblobs")
+            os.makedirs(blob_dir, exist_ok=True)
+            for name, blob in blobs.items():
+                # Blobs are content addressed: an existing one is already right
+                if not os.path.exists(os.path.join(blob_dir, name)):
+                    _write_file(opener, os.path.join(blob_dir, name), blob)
+
+        target = os.path.join(pad.drive, KEYSFILE_NAME)
+        _write_file(opener, target, payload)
+
+        if verify:
+            with opener(target, 'rb') as f:
+                written = hashlib.sha256(f.read()).hexdigest()
+            if written != digest:
+                raise ProvisionError(f"Hash mismatch: wrote {digest[:12]}, read back {written[:12]}")
+        return ProvisionResult(pad, True, time.perf_counter() - start, digest=digest)
+    except Exception as e:
+        return ProvisionResult(pad, False, time.perf_counter() - start, error=str(e))
+
+
+def provision(source_path, pads=None, workers=16, verify=True, opener=None, on_result=None):
+    """
+    Provision pads (default: every discovered pad) with the keysfile at source_path.
+
+    Args:
+        workers: Most pads written at the same time
+        on_result: Optional callback(ProvisionResult), called from the worker
+            threads as each pad finishes
+
+    Returns:
+        (list of ProvisionResult in pad order, wall time in seconds)
+    """
+    payload, blobs = load_source(source_path)
+    if pads is None:
+        pads = discover_pads()
+    if not pads:
+        return [], 0.0
+
+    def run(pad):
+        result = provision_pad(pad, payload, blobs, opener, verify)
+        if on_result:
+            try:
+                on_result(result)
+            except Exception as e:
+                print(f"Error reporting provisioning result: {e}")
+        return result
+
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max(1, min(workers, len(pads)))) as pool:
+        results = list(pool.map(run, pads))
+    return results, time.perf_counter() - start
+
+
+def format_results(results, wall):
+    lines = []
+    for result in results:
+        status = "ok" if result else f"FAILED: {result.error}"
+        port = f" [{result.pad.port}]" if result.pad.port else ""
+        lines.append(f"{result.pad.name:24} {result.pad.drive}{port}  {result.seconds * 1000:8.1f} ms  {status}")
+    if results:
+        busy = sum(result.seconds for result in results)
+        ok = sum(1 for result in results if result)
+        lines.append(f"{ok}/{len(results)} pads provisioned in {wall:.3f} s "
+                     f"({busy:.3f} s of device time, {busy / wall if wall else 0:.1f}x parallel)")
+    return "\n".join(lines)
+
+
+def benchmark(count=20, workers=16):
+    """
+    Provision count simulated slow drives (device.storage.SimulatedDrive)
+    serially and in parallel.
+    """
+    import shutil
+    import tempfile
+    from device.storage import SimulatedDrive
+    from utils.layout import Layout
+
+    root = tempfile.mkdtemp(prefix="fleet-bench-")
+    try:
+        source = os.path.join(root, KEYSFILE_NAME)
+        data = Layout().empty_data()
+        for key_id in Layout().key_ids():
+            data["profiles"]["0"][key_id] = {"name": f"Key {key_id}", "key": ["ctrl", "alt", key_id]}
+        with open(source, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+
+        drives = [SimulatedDrive(os.path.join(root, f"CIRCUITPY{i}")) for i in range(count)]
+
+        def opener(path, mode="r", *args, **kwargs):
+            for drive in drives:
+                if drive.contains(path):
+                    return drive.open(path, mode, *args, **kwargs)
+            return open(path, mode, *args, **kwargs)
+
+        pads = [Pad(drive.path) for drive in drives]
+        timings = {}
+        for label, pool_size in (("serial", 1), ("parallel", workers)):
+            results, wall = provision(source, pads, pool_size, opener=opener)
+            timings[label] = wall
+            if not all(results):
+                raise ProvisionError(format_results(results, wall))
+        one = results[0].seconds
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    return {"pads": count, "workers": workers, "one_pad_s": one,
+            "serial_s": timings["serial"], "parallel_s": timings["parallel"]}
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="python -m device.fleet", description="Provision every attached MacroPad")
+    parser.add_argument("keysfile", nargs="?", help="keysfile.json to copy to every pad")
+    parser.add_argument("--workers", type=int, default=16, help="pads written at the same time")
+    parser.add_argument("--no-verify", action="store_true", help="skip reading each copy back")
+    parser.add_argument("--list", action="store_true", help="only list the attached pads")
+    parser.add_argument("--bench", type=int, metavar="N", help="provision N simulated slow drives")
+    args = parser.parse_args(argv)
+
+    if args.bench:
+        result = benchmark(args.bench, args.workers)
+        print(f"{result['pads']} pads: one pad {result['one_pad_s']:.3f} s, serial {result['serial_s']:.3f} s, "
+              f"{result['workers']} workers {result['parallel_s']:.3f} s")
+        return 0
+    if args.list or not args.keysfile:
+        for pad in discover_pads():
+            print(f"{pad.name:24} {pad.drive}  {pad.port or '-'}")
+        return 0
+
+    try:
+        results, wall = provision(args.keysfile, workers=args.workers, verify=not args.no_verify)
+    except (OSError, ValueError) as e:
+        print(f"Error reading {args.keysfile}: {e}")
+        return 1
+    if not results:
+        print("No pads found")
+        return 1
+    print(format_results(results, wall))
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,260 @@
+import os
+import queue
+import socket
+import sys
+import threading
+import time
+
+# Netlink protocol for kernel uevents, from <linux/netlink.h>
+NETLINK_KOBJECT_UEVENT = 15
+KERNEL_UEVENT_GROUP = 1
+
+
+class HotplugEvent:
+    """A device being added or removed"""
+
+    __slots__ = ("action", "subsystem", "devname", "properties")
+
+    def __init__(self, action, subsystem, devname=None, properties=None):
+        self.action = action          # "add", "remove", "change", ...
+        self.subsystem = subsystem    # "tty", "usb", ...
+        self.devname = devname        # e.g. "/dev/ttyACM0"
+        self.properties = properties or {}
+
+    def __repr__(self):
+        return f"HotplugEvent({self.action!r}, {self.subsystem!r}, {self.devname!r})"
+
+
+def parse_uevent(message):
+    """
+    Parse a kernel uevent datagram ("add@/devices/...\\0ACTION=add\\0...").
+
+    Returns:
+        HotplugEvent, or None for messages that are not kernel uevents
+    """
+    parts = message.split(b"\0")
+    if not parts or b"@" not in parts[0]:
+        # libudev re-broadcasts use a binary header; only kernel events are used
+        return None
+
+    properties = {}
+    for part in parts[1:]:
+        key, sep, value = part.partition(b"=")
+        if sep:
+            properties[key.decode("utf-8", "replace")] = value.decode("utf-8", "replace")
+
+    devname = properties.get("DEVNAME")
+    if devname and not devname.startswith("/"):
+        devname = "/dev/" + devname
+    return HotplugEvent(properties.get("ACTION", ""), properties.get("SUBSYSTEM", ""), devname, properties)
+
+
+class NetlinkBackend:
+    """Kernel uevents from a NETLINK_KOBJECT_UEVENT socket (Linux)"""
+
+    def __init__(self):
+        self.sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_KOBJECT_UEVENT)
+        self.sock.bind((0, KERNEL_UEVENT_GROUP))
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def read_events(self, timeout):
+        self.sock.settimeout(timeout)
+        try:
+            message = self.sock.recv(64 * 1024)
+        except (socket.timeout, BlockingIOError):
+            return []
+        event = parse_uevent(message)
+        return [event] if event else []
+
+    def close(self):
+        self.sock.close()
+
+
+class DevInotifyBackend:
+    """tty nodes appearing in and disappearing from /dev, via inotify (Linux)"""
+
+    PREFIXES = ("ttyACM", "ttyUSB")
+
+    def __init__(self, directory="/dev"):
+        from utils.watcher import InotifyBackend
+        self.directory = directory
+        self.inotify = InotifyBackend(directory)
+
+    def fileno(self):
+        return self.inotify.fd
+
+    def read_events(self, timeout):
+        events = []
+        for name in self.inotify.wait(timeout):
+            if name.startswith(self.PREFIXES):
+                path = os.path.join(self.directory, name)
+                action = "add" if os.path.exists(path) else "remove"
+                events.append(HotplugEvent(action, "tty", path))
+        return events
+
+    def close(self):
+        self.inotify.close()
+
+
+class PollingBackend:
+    """Portable fallback: compare the serial port list every interval seconds"""
+
+    def __init__(self, interval=2.0, list_devices=None):
+        if list_devices is None:
+            import serial.tools.list_ports
+
+            def list_devices():
+                return {port.device for port in serial.tools.list_ports.comports()}
+        self.list_devices = list_devices
+        self.interval = interval
+        self._known = self.list_devices()
+
+    def read_events(self, timeout):
+        time.sleep(min(timeout, self.interval))
+        current = self.list_devices()
+        events = [HotplugEvent("add", "tty", device) for device in sorted(current - self._known)]
+        events += [HotplugEvent("remove", "tty", device) for device in sorted(self._known - current)]
+        self._known = current
+        return events
+
+    def close(self):
+        pass
+
+
+class FakeBackend:
+    """Backend driven by push(), for tests and the device emulator"""
+
+    def __init__(self):
+        self._events = queue.Queue()
+
+    def push(self, action, devname, subsystem="tty", properties=None):
+        self._events.put(HotplugEvent(action, subsystem, devname, properties))
+
+    def read_events(self, timeout):
+        try:
+            events = [self._events.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while True:
+            try:
+                events.append(self._events.get_nowait())
+            except queue.Empty:
+                return events
+
+    def close(self):
+        pass
+
+
+def default_backend():
+    """Best available backend: netlink, then inotify on /dev, then polling"""
+    if sys.platform.startswith("linux"):
+        try:
+            return NetlinkBackend()
+        except (OSError, AttributeError) as e:
+            print(f"Netlink uevents unavailable: {e}")
+        try:
+            return DevInotifyBackend()
+        except (OSError, AttributeError) as e:
+            print(f"inotify on /dev unavailable: {e}")
+    return PollingBackend()
+
+
+class HotplugMonitor:
+    """
+    Call callback(events) on a background thread whenever serial devices
+    come or go.
+
+    The thread blocks in the backend, so it uses no CPU while nothing is
+    plugged in or out. Events that arrive within settle seconds of each other
+    (a USB plug produces several) are delivered together in one call.
+
+    Given a device.aio.DeviceLoop, backends with a file descriptor (netlink,
+    inotify) are watched by the loop instead of a thread of their own, and
+    callback is called on the loop thread.
+    """
+
+    def __init__(self, callback, backend=None, subsystems=("tty",), settle=0.02, loop=None):
+        self.callback = callback
+        self.backend = backend
+        self.subsystems = subsystems
+        self.settle = settle
+        self.device_loop = loop
+        self._thread = None
+        self._stop = threading.Event()
+        self._on_loop = False
+        self._pending = []
+        self._flush_handle = None
+
+    def start(self):
+        if self._thread is not None or self._on_loop:
+            return
+        if self.backend is None:
+            self.backend = default_backend()
+        self._stop.clear()
+        if self.device_loop is not None and hasattr(self.backend, "fileno"):
+            self._on_loop = True
+            self.device_loop.call_soon(self._watch_on_loop)
+            return
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._on_loop:
+            self._on_loop = False
+            self.device_loop.call_soon(self._unwatch_on_loop)
+            return
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout=1)
+        self._thread = None
+
+    def _watch_on_loop(self):
+        self.device_loop.loop.add_reader(self.backend.fileno(), self._on_readable)
+
+    def _unwatch_on_loop(self):
+        self.device_loop.loop.remove_reader(self.backend.fileno())
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+        self.backend.close()
+
+    def _on_readable(self):
+        events = self._wanted(self.backend.read_events(0))
+        if not events:
+            return
+        self._pending += events
+        # Restart the settle timer so a burst is delivered in one call
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+        self._flush_handle = self.device_loop.loop.call_later(self.settle, self._flush_on_loop)
+
+    def _flush_on_loop(self):
+        events, self._pending = self._pending, []
+        self._flush_handle = None
+        try:
+            self.callback(events)
+        except Exception as e:
+            print(f"Error handling hotplug event: {e}")
+
+    def _wanted(self, events):
+        return [event for event in events if not self.subsystems or event.subsystem in self.subsystems]
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                events = self._wanted(self.backend.read_events(0.5))
+                if not events:
+                    continue
+                # Let the rest of the burst arrive before dispatching
+                while True:
+                    more = self.backend.read_events(self.settle)
+                    if not more:
+                        break
+                    events += self._wanted(more)
+                try:
+                    self.callback(events)
+                except Exception as e:
+                    print(f"Error handling hotplug event: {e}")
+        finally:
+            self.backend.close()
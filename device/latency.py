@@ -0,0 +1,233 @@
+"""
+Round-trip latency of the serial link to the pad.
+
+LatencyProbe sends a PING (see device.protocol) every interval seconds and
+records the round-trip time in a LatencyHistogram: a fixed set of
+logarithmic buckets, so it never grows however long the app runs.
+Percentiles are interpolated within a bucket. Jitter is the smoothed
+difference between consecutive round trips (as in RTP, RFC 3550).
+
+A slow pad can then be told apart: high but steady times point at USB
+polling or the host, spikes and jitter at the firmware being busy.
+
+    python -m device.latency --emulator --count 500
+    python -m device.latency --port /dev/ttyACM0 --count 100 --interval 0.05
+"""
+import json
+import math
+import sys
+import threading
+import time
+
+from device.protocol import ProtocolError
+
+
+class LatencyHistogram:
+    """
+    Round-trip times in logarithmic buckets.
+
+    Args:
+        low: Smallest time resolved, in seconds; faster samples share the first bucket
+        high: Largest time resolved; slower samples share the last bucket
+        buckets_per_decade: Resolution; each bucket spans about 12% at 20
+    """
+
+    def __init__(self, low=10e-6, high=10.0, buckets_per_decade=20):
+        self.low = low
+        self.buckets_per_decade = buckets_per_decade
+        self.counts = [0] * (int(math.ceil(math.log10(high / low) * buckets_per_decade)) + 1)
+        self.count = 0
+        self.lost = 0
+        self.total = 0.0
+        self.minimum = None
+        self.maximum = None
+        self.jitter = 0.0
+        self.last = None
+        self._lock = threading.Lock()
+
+    def _bucket(self, seconds):
+        if seconds <= self.low:
+            return 0
+        index = int(math.log10(seconds / self.low) * self.buckets_per_decade) + 1
+        return min(index, len(self.counts) - 1)
+
+    def _upper_bound(self, index):
+        return self.low * 10 ** (index / self.buckets_per_decade)
+
+    def add(self, seconds):
+        with self._lock:
+            self.counts[self._bucket(seconds)] += 1
+            self.count += 1
+            self.total += seconds
+            self.minimum = seconds if self.minimum is None else min(self.minimum, seconds)
+            self.maximum = seconds if self.maximum is None else max(self.maximum, seconds)
+            if self.last is not None:
+                self.jitter += (abs(seconds - self.last) - self.jitter) / 16
+            self.last = seconds
+
+    def add_lost(self):
+        with self._lock:
+            self.lost += 1
+
+    def percentile(self, p):
+        """Round-trip time below which p percent of the samples fall, or None"""
+        with self._lock:
+            if not self.count:
+                return None
+            rank = max(1, int(math.ceil(self.count * p / 100.0)))
+            seen = 0
+            for index, count in enumerate(self.counts):
+                seen += count
+                if seen >= rank:
+                    # Interpolate inside the bucket, never outside what was seen
+                    lower = max(self._upper_bound(index - 1) if index else 0.0, self.minimum)
+                    upper = min(self._upper_bound(index), self.maximum)
+                    if upper <= lower:
+                        return lower
+                    return lower + (upper - lower) * (rank - seen + count) / count
+        return self.maximum
+
+    def summary(self):
+        """Percentiles and the rest as a dict, times in milliseconds"""
+        def ms(value):
+            return None if value is None else round(value * 1000, 3)
+
+        p50, p95, p99 = self.percentile(50), self.percentile(95), self.percentile(99)
+        with self._lock:
+            return {
+                "count": self.count,
+                "lost": self.lost,
+                "min_ms": ms(self.minimum),
+                "mean_ms": ms(self.total / self.count if self.count else None),
+                "p50_ms": ms(p50),
+                "p95_ms": ms(p95),
+                "p99_ms": ms(p99),
+                "max_ms": ms(self.maximum),
+                "jitter_ms": ms(self.jitter if self.count > 1 else None),
+            }
+
+
+def format_summary(summary):
+    """One status bar line for a LatencyHistogram.summary()"""
+    if not summary["count"]:
+        return "Latency: -" if not summary["lost"] else f"Latency: no answer ({summary['lost']} lost)"
+    text = (f"Latency: {summary['p50_ms']:.1f} ms (p95 {summary['p95_ms']:.1f}, "
+            f"p99 {summary['p99_ms']:.1f}, jitter {summary['jitter_ms'] or 0:.1f})")
+    if summary["lost"]:
+        text += f", {summary['lost']} lost"
+    return text
+
+
+class LatencyProbe:
+    """
+    Ping the pad every interval seconds from a background thread.
+
+    Args:
+        client: ProtocolClient of the pad
+        interval: Seconds between pings
+        timeout: Seconds after which a ping counts as lost
+        on_sample: Optional callback(histogram) after every ping, from the
+            probe thread
+    """
+
+    def __init__(self, client, interval=1.0, timeout=1.0, histogram=None, on_sample=None):
+        self.client = client
+        self.interval = interval
+        self.timeout = timeout
+        self.histogram = histogram or LatencyHistogram()
+        self.on_sample = on_sample
+        self._stop = threading.Event()
+        self._thread = None
+        self._number = 0
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=self.timeout + 1)
+        self._thread = None
+
+    def ping_once(self):
+        """Send one ping and record the result; returns the round trip or None if lost"""
+        self._number += 1
+        try:
+            seconds = self.client.ping(self._number, self.timeout)
+        except ProtocolError:
+            self.histogram.add_lost()
+            seconds = None
+        else:
+            self.histogram.add(seconds)
+        if self.on_sample:
+            try:
+                self.on_sample(self.histogram)
+            except Exception as e:
+                print(f"Error reporting latency: {e}")
+        return seconds
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.ping_once()
+            self._stop.wait(self.interval)
+
+
+def run_pings(client, count=100, interval=0.0, timeout=1.0):
+    """Send count pings back to back (or interval apart) and return the summary dict"""
+    probe = LatencyProbe(client, interval, timeout)
+    start = time.perf_counter()
+    for i in range(count):
+        probe.ping_once()
+        if interval and i + 1 < count:
+            time.sleep(interval)
+    result = probe.histogram.summary()
+    result["wall_s"] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def main(argv=None):
+    import argparse
+    from device.aio import connection_class, device_loop
+    from device.client import ProtocolClient
+
+    parser = argparse.ArgumentParser(prog="python -m device.latency", description="Measure serial round trips to a MacroPad")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--port", help="serial port of the pad")
+    target.add_argument("--emulator", action="store_true", help="ping a local emulator (device.emulator)")
+    parser.add_argument("--count", type=int, default=100, help="pings to send")
+    parser.add_argument("--interval", type=float, default=0.0, help="seconds between pings")
+    parser.add_argument("--timeout", type=float, default=1.0, help="seconds before a ping counts as lost")
+    args = parser.parse_args(argv)
+
+    emulator = None
+    if args.emulator:
+        from device.emulator import PadEmulator
+        emulator = PadEmulator().start()
+    port = emulator.port if emulator else args.port
+
+    connection = connection_class()(port)
+    connection.start()
+    client = ProtocolClient(connection)
+    try:
+        if not connection.wait_connected(5):
+            print(f"Error: could not open {port}")
+            return 1
+        client.start()
+        result = run_pings(client, args.count, args.interval, args.timeout)
+        result["port"] = port
+        print(json.dumps(result, indent=2))
+        return 0 if result["count"] else 1
+    finally:
+        client.stop()
+        connection.close()
+        device_loop.stop()
+        if emulator:
+            emulator.stop()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+import queue
+import threading
+
+from device.protocol import ProtocolError
+
+
+class LiveSync:
+    """
+    Push key edits to the pad over device.protocol as they are saved.
+
+    While active, every change applied through engine.ProfileBatch (and so
+    update_profile_key) is sent as a SET_KEY frame and takes effect on the
+    pad within milliseconds. The profile store switches to deferred writes,
+    so keysfile.json on CIRCUITPY - and the auto-reload it causes - is
+    written once, write_delay seconds after the last edit.
+
+    Frames are sent from a worker thread, never from the caller. If the pad
+    stops answering, the pending write is saved right away so the edit still
+    reaches the pad through the drive.
+    """
+
+    def __init__(self, client, store=None, write_delay=5.0, resolve_text=None):
+        if store is None:
+            from engine import profile_store as store
+        self.client = client
+        self.store = store
+        self.write_delay = write_delay
+        self.resolve_text = resolve_text
+        self.pushed = 0
+        self.failures = 0
+        self.active = False
+        self._queue = queue.Queue()
+        self._thread = None
+
+    def start(self):
+        """
+        Check that the pad speaks the protocol, then go live.
+
+        Returns:
+            True if live updates are active, False if the pad did not answer
+        """
+        try:
+            self.client.get_hash()
+        except ProtocolError as e:
+            print(f"Live key updates unavailable: {e}")
+            return False
+
+        from engine import add_change_listener
+        self.store.enable_deferred_writes(self.write_delay)
+        add_change_listener(self.on_changes)
+        self.active = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        """Stop pushing and save any deferred write"""
+        if not self.active:
+            return
+        from engine import remove_change_listener
+        self.active = False
+        remove_change_listener(self.on_changes)
+        self._queue.put(None)
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2)
+        try:
+            self.store.disable_deferred_writes()
+        except Exception as e:
+            print(f"Error saving keysfile.json: {e}")
+
+    def on_changes(self, changes):
+        """engine change listener: queue the changed keys for the pad"""
+        if self.active:
+            self._queue.put(list(changes))
+
+    def entry_for_pad(self, entry):
+        """The entry as the pad holds it: it has no blob store, long texts go inline"""
+        if entry is not None and "text_ref" in entry:
+            resolve = self.resolve_text
+            if resolve is None:
+                from engine import get_text_content as resolve
+            entry = dict(entry)
+            entry["text_content"] = resolve(entry)
+            del entry["text_ref"]
+        return entry
+
+    def _run(self):
+        while True:
+            changes = self._queue.get()
+            if changes is None:
+                return
+            try:
+                for profile_id, key_id, entry in changes:
+                    self.client.set_key(profile_id, key_id, self.entry_for_pad(entry))
+                    self.pushed += 1
+            except ProtocolError as e:
+                self.failures += 1
+                print(f"Live key update failed, saving keysfile.json now: {e}")
+                try:
+                    self.store.flush()
+                except Exception as flush_error:
+                    print(f"Error saving keysfile.json: {flush_error}")
@@ -0,0 +1,304 @@
+"""
+Bring the pad's keymap in line with the host's by comparing hash trees.
+
+Both sides hash every key entry, every profile (over its key digests) and
+the whole map (over its profile digests), see device.protocol. sync()
+walks the two trees top down: equal roots end it after one 16-byte answer,
+otherwise only the profiles whose digests differ are opened, and only the
+keys that differ in them are sent. Fixing one key on a 32-profile map
+moves a few hundred bytes instead of the whole keysfile.
+
+The other side is either the pad over serial (SerialTree) or a keysfile
+on disk such as the drive copy (FileTree).
+
+    python -m device.merkle --emulator
+    python -m device.merkle --port /dev/ttyACM0
+    python -m device.merkle --drive /media/user/CIRCUITPY/keysfile.json
+"""
+import json
+import sys
+
+from device.protocol import (
+    HEADER, CRC, encode_set_key, encode_tree_request, decode_tree_node, key_digest, node_digest,
+    EMPTY_DIGEST, TREE_ROOT, TREE_PROFILES, TREE_KEYS, MSG_GET_TREE, MSG_SET_KEY
+)
+
+FRAME_OVERHEAD = HEADER.size + CRC.size
+
+
+class HashTree:
+    """
+    Host-side hash tree of a profiles dict.
+
+    update() rehashes only profiles whose dict is a different object than
+    last time; the ProfileStore copies just the profiles an edit touches,
+    so after one key change one profile is rehashed.
+
+    Args:
+        prepare: Optional function turning a stored entry into the entry the
+            other side holds (e.g. LiveSync.entry_for_pad), applied before hashing
+    """
+
+    def __init__(self, prepare=None):
+        self.prepare = prepare
+        self.rehashed = 0
+        self._profiles = {}
+        self._keys = {}
+        self._digests = {}
+
+    def update(self, profiles):
+        for profile_id, profile in profiles.items():
+            if self._profiles.get(profile_id) is profile:
+                continue
+            keys = {key_id: key_digest(self.entry_for(entry)) for key_id, entry in profile.items()}
+            self._profiles[profile_id] = profile
+            self._keys[profile_id] = keys
+            self._digests[profile_id] = node_digest(keys)
+            self.rehashed += 1
+        for profile_id in set(self._profiles) - set(profiles):
+            del self._profiles[profile_id], self._keys[profile_id], self._digests[profile_id]
+        return self
+
+    def entry_for(self, entry):
+        return self.prepare(entry) if self.prepare and entry is not None else entry
+
+    def children(self):
+        return {profile_id: digest for profile_id, digest in self._digests.items() if digest != EMPTY_DIGEST}
+
+    def root(self):
+        return node_digest(self.children())
+
+    def keys(self, profile_id):
+        return self._keys.get(profile_id, {})
+
+    def entry(self, profile_id, key_id):
+        """The entry as the other side should hold it, None if the host has none"""
+        return self.entry_for(self._profiles.get(profile_id, {}).get(key_id))
+
+
+class SerialTree:
+    """The pad's hash tree, read with GET_TREE and fixed with SET_KEY"""
+
+    def __init__(self, client):
+        self.client = client
+        self.requests = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def _request(self, msg_type, payload):
+        reply = self.client.request(msg_type, payload)
+        self.requests += 1
+        self.bytes_sent += len(payload) + FRAME_OVERHEAD
+        self.bytes_received += len(reply.payload) + FRAME_OVERHEAD
+        return reply.payload
+
+    def root(self):
+        return decode_tree_node(self._request(MSG_GET_TREE, encode_tree_request(TREE_ROOT)))[0]
+
+    def children(self):
+        return decode_tree_node(self._request(MSG_GET_TREE, encode_tree_request(TREE_PROFILES)))[1]
+
+    def keys(self, profile_id):
+        return decode_tree_node(self._request(MSG_GET_TREE, encode_tree_request(TREE_KEYS, profile_id)))[1]
+
+    def apply(self, changes):
+        for profile_id, key_id, entry in changes:
+            self._request(MSG_SET_KEY, encode_set_key(profile_id, key_id, entry))
+
+
+class FileTree:
+    """
+    The hash tree of a keysfile on disk, e.g. the copy on the CIRCUITPY drive.
+
+    Changes are saved through the ProfileStore, so in journal mode only the
+    differing keys are appended instead of rewriting the file.
+    """
+
+    def __init__(self, path, store=None):
+        if store is None:
+            from engine import profile_store as store
+        self.path = path
+        self.store = store
+        self.requests = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self._load()
+
+    def _load(self):
+        self.data = self.store.read(self.path)
+        self.tree = HashTree().update(self.data.get("profiles", {}))
+
+    def root(self):
+        return self.tree.root()
+
+    def children(self):
+        return self.tree.children()
+
+    def keys(self, profile_id):
+        return self.tree.keys(profile_id)
+
+    def apply(self, changes):
+        if not changes:
+            return
+        data = dict(self.data)
+        data["profiles"] = dict(data.get("profiles", {}))
+        for profile_id, key_id, entry in changes:
+            profile = data["profiles"][profile_id] = dict(data["profiles"].get(profile_id, {}))
+            if entry is None:
+                profile.pop(key_id, None)
+            else:
+                profile[key_id] = entry
+            self.bytes_sent += len(json.dumps(entry))
+        self.store.write(self.path, data, list(changes))
+        self._load()
+
+
+class SyncResult:
+    """What sync() found and sent; truthy when both sides ended up equal"""
+
+    __slots__ = ("changes", "in_sync", "requests", "bytes_sent", "bytes_received")
+
+    def __init__(self, changes, in_sync, requests=0, bytes_sent=0, bytes_received=0):
+        self.changes = changes
+        self.in_sync = in_sync
+        self.requests = requests
+        self.bytes_sent = bytes_sent
+        self.bytes_received = bytes_received
+
+    def __bool__(self):
+        return self.in_sync
+
+    def __repr__(self):
+        return (f"SyncResult({len(self.changes)} keys sent, in_sync={self.in_sync}, {self.requests} requests, "
+                f"{self.bytes_sent} bytes sent, {self.bytes_received} received)")
+
+
+def diff(tree, remote):
+    """
+    Walk tree and remote top down.
+
+    Returns:
+        List of (profile_id, key_id, entry) that make remote equal to tree;
+        entry None removes the key
+    """
+    if remote.root() == tree.root():
+        return []
+    host_children = tree.children()
+    remote_children = remote.children()
+    changes = []
+    for profile_id in sorted(set(host_children) | set(remote_children)):
+        if host_children.get(profile_id) == remote_children.get(profile_id):
+            continue
+        host_keys = tree.keys(profile_id)
+        remote_keys = remote.keys(profile_id) if profile_id in remote_children else {}
+        for key_id in sorted(set(host_keys) | set(remote_keys)):
+            if host_keys.get(key_id) != remote_keys.get(key_id):
+                changes.append((profile_id, key_id, tree.entry(profile_id, key_id)))
+    return changes
+
+
+def sync(profiles, remote, tree=None):
+    """
+    Make remote hold the host's profiles, sending only what differs.
+
+    Args:
+        profiles: The host's profiles dict
+        remote: SerialTree or FileTree
+        tree: HashTree to reuse between calls (only changed profiles are rehashed)
+
+    Returns:
+        SyncResult
+    """
+    tree = (tree or HashTree()).update(profiles)
+    changes = diff(tree, remote)
+    if changes:
+        remote.apply(changes)
+    in_sync = not changes or remote.root() == tree.root()
+    return SyncResult([(profile_id, key_id) for profile_id, key_id, _ in changes], in_sync,
+                      remote.requests, remote.bytes_sent, remote.bytes_received)
+
+
+def demo(profile_count=32):
+    """
+    Load a profile_count-profile keymap into an emulated pad, change one key
+    on the host and sync it back.
+    """
+    from device.aio import connection_class, device_loop
+    from device.client import ProtocolClient
+    from device.emulator import PadEmulator
+    from device.transfer import sample_keysfile
+
+    raw = sample_keysfile(profile_count)
+    data = json.loads(raw)
+    emulator = PadEmulator(keysfile_data=data).start()
+    connection = connection_class()(emulator.port)
+    connection.start()
+    client = ProtocolClient(connection)
+    try:
+        if not connection.wait_connected(5):
+            raise OSError(f"Could not open {emulator.port}")
+        client.start()
+        profiles = data["profiles"]
+        tree = HashTree()
+        unchanged = sync(profiles, SerialTree(client), tree)
+
+        profiles = dict(profiles)
+        profiles["17"] = dict(profiles["17"], **{"4": {"name": "Changed", "key": ["ctrl", "shift", "z"]}})
+        changed = sync(profiles, SerialTree(client), tree)
+    finally:
+        client.stop()
+        connection.close()
+        device_loop.stop()
+        emulator.stop()
+    return {
+        "profiles": profile_count,
+        "keysfile_bytes": len(raw),
+        "unchanged": {"requests": unchanged.requests, "bytes": unchanged.bytes_sent + unchanged.bytes_received},
+        "one_key_changed": {"requests": changed.requests, "bytes": changed.bytes_sent + changed.bytes_received,
+                            "keys_sent": changed.changes, "in_sync": changed.in_sync},
+        "profiles_rehashed": tree.rehashed
+    }
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="python -m device.merkle", description="Sync a MacroPad's keymap by hash tree")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--port", help="serial port of the pad")
+    target.add_argument("--drive", help="keysfile to bring in line, e.g. the copy on CIRCUITPY")
+    target.add_argument("--emulator", action="store_true", help="demo against a local emulator")
+    parser.add_argument("--source", help="keysfile holding the wanted keymap (default: the app's)")
+    args = parser.parse_args(argv)
+
+    if args.emulator:
+        print(json.dumps(demo(), indent=2))
+        return 0
+
+    from engine import get_json_path, profile_store
+    source = args.source or get_json_path()
+    profiles = profile_store.read(source).get("profiles", {})
+    if args.drive:
+        result = sync(profiles, FileTree(args.drive))
+    else:
+        from device.aio import connection_class, device_loop
+        from device.client import ProtocolClient
+        connection = connection_class()(args.port)
+        connection.start()
+        client = ProtocolClient(connection)
+        try:
+            if not connection.wait_connected(5):
+                print(f"Error: could not open {args.port}")
+                return 1
+            client.start()
+            result = sync(profiles, SerialTree(client))
+        finally:
+            client.stop()
+            connection.close()
+            device_loop.stop()
+    print(result)
+    return 0 if result else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,272 @@
+import os
+import sys
+
+from device.registry import DeviceIdentity
+
+# Names the kernel's USB serial drivers give their ttys (cdc_acm, usb-serial,
+# xr_usb_serial); other ttys are rejected without touching sysfs
+USB_TTY_PREFIXES = ("ttyACM", "ttyUSB", "ttyXRUSB")
+
+
+def _read_line(*parts):
+    try:
+        with open(os.path.join(*parts), 'r', encoding='utf-8', errors='replace') as f:
+            return f.readline().strip()
+    except OSError:
+        return None
+
+
+def _usb_interface_dir(device_path):
+    """The USB interface directory for a tty's device path, or None if not USB"""
+    # cdc_acm ttys point at the interface, usb-serial ttys at a child of it
+    for candidate in (device_path, os.path.dirname(device_path)):
+        if os.path.exists(os.path.join(candidate, "bInterfaceNumber")):
+            return candidate
+    return None
+
+
+def enumerate_usb_serial_sysfs(usb_ids=None, sysfs_root="/sys", dev_root="/dev"):
+    """
+    List USB serial ports by reading only /sys/class/tty/*/device.
+
+    Virtual consoles and built-in UARTs are skipped by name without any
+    further syscalls, and for USB ports only idVendor/idProduct are read
+    before the usb_ids filter, so the cost stays low on machines with many
+    ttys.
+
+    Args:
+        usb_ids: Optional list of (vid, pid) to keep; pid None matches any
+        sysfs_root: Root of the sysfs tree (a synthetic tree in benchmarks)
+        dev_root: Directory the device nodes live in
+
+    Returns:
+        List of DeviceIdentity records
+    """
+    records = []
+    try:
+        entries = list(os.scandir(os.path.join(sysfs_root, "class", "tty")))
+    except FileNotFoundError:
+        return records
+
+    for entry in entries:
+        if not entry.name.startswith(USB_TTY_PREFIXES):
+            continue
+        device_link = os.path.join(entry.path, "device")
+        try:
+            os.readlink(device_link)
+        except OSError:
+            continue  # Virtual tty without a backing device
+
+        interface_dir = _usb_interface_dir(os.path.realpath(device_link))
+        if interface_dir is None:
+            continue
+        usb_dir = os.path.dirname(interface_dir)
+
+        try:
+            vid = int(_read_line(usb_dir, "idVendor"), 16)
+            pid = int(_read_line(usb_dir, "idProduct"), 16)
+        except (TypeError, ValueError):
+            continue
+        if usb_ids and not any(vid == v and (p is None or pid == p) for v, p in usb_ids):
+            continue
+
+        try:
+            interface = int(_read_line(interface_dir, "bInterfaceNumber"), 16)
+        except (TypeError, ValueError):
+            interface = None
+
+        records.append(DeviceIdentity(
+            vid, pid,
+            _read_line(usb_dir, "serial"),
+            os.path.join(dev_root, entry.name),
+            _read_line(usb_dir, "product") or entry.name,
+            interface
+        ))
+    return records
+
+
+def _override_ports():
+    """
+    Ports named in MACROPAD_PORT (os.pathsep separated), reported as pads.
+
+    Used to point the app at the device emulator's pty.
+    """
+    from device.registry import PAD_USB_IDS
+    vid, pid = PAD_USB_IDS[0]
+    records = []
+    for device in filter(None, os.environ.get("MACROPAD_PORT", "").split(os.pathsep)):
+        if os.path.exists(device):
+            records.append(DeviceIdentity(vid, pid, "emulator-" + os.path.basename(device), device, "MacroPad emulator"))
+    return records
+
+
+def enumerate_usb_serial(usb_ids=None):
+    """
+    List USB serial ports matching usb_ids as DeviceIdentity records.
+
+    Uses the sysfs reader on Linux and pyserial's comports() elsewhere.
+    Ports listed in MACROPAD_PORT come first.
+    """
+    records = _override_ports()
+    if sys.platform.startswith("linux") and os.path.isdir("/sys/class/tty"):
+        return records + enumerate_usb_serial_sysfs(usb_ids)
+
+    import serial.tools.list_ports
+    for port in serial.tools.list_ports.comports():
+        identity = DeviceIdentity.from_port(port)
+        if identity is not None and (not usb_ids or identity.matches(usb_ids)):
+            records.append(identity)
+    return records
+
+
+def build_synthetic_sysfs(root, virtual_ttys=64, uarts=32, usb_ports=4, pads=1, data_ports=False):
+    """
+    Create a fake /sys and /dev under root that looks like a Linux host.
+
+    The layout mirrors the kernel's: /sys/class/tty/<name> links into
+    /sys/devices, USB ttys have a device link to their interface, whose
+    parent holds idVendor/idProduct/serial. With data_ports the pads also
+    get CircuitPython's usb_cdc.data port on interface 2, numbered after
+    all the other USB ttys.
+    """
+    from device.registry import PAD_USB_IDS
+
+    sys_root = os.path.join(root, "sys")
+    dev_root = os.path.join(root, "dev")
+    class_dir = os.path.join(sys_root, "class", "tty")
+    os.makedirs(class_dir)
+    os.makedirs(dev_root)
+
+    def write(path, text):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text + "\n")
+
+    def add_tty(name, tty_dir, device_target=None):
+        os.makedirs(tty_dir)
+        write(os.path.join(tty_dir, "dev"), "4:0")
+        if device_target:
+            os.symlink(device_target, os.path.join(tty_dir, "device"))
+        os.symlink(tty_dir, os.path.join(class_dir, name))
+        write(os.path.join(dev_root, name), "")
+
+    # Virtual consoles: no device link
+    for i in range(virtual_ttys):
+        add_tty(f"tty{i}", os.path.join(sys_root, "devices", "virtual", "tty", f"tty{i}"))
+
+    # Built-in UARTs on a platform device
+    platform_dir = os.path.join(sys_root, "devices", "platform", "serial8250")
+    os.makedirs(platform_dir)
+    os.makedirs(os.path.join(sys_root, "bus", "platform"))
+    os.symlink(os.path.join(sys_root, "bus", "platform"), os.path.join(platform_dir, "subsystem"))
+    for i in range(uarts):
+        add_tty(f"ttyS{i}", os.path.join(platform_dir, "tty", f"ttyS{i}"), platform_dir)
+
+    # USB CDC-ACM devices; the first `pads` of them are MacroPads
+    os.makedirs(os.path.join(sys_root, "bus", "usb"))
+    pad_vid, pad_pid = PAD_USB_IDS[0]
+
+    def add_interface(usb_dir, number, tty_name):
+        interface_dir = os.path.join(usb_dir, f"{os.path.basename(usb_dir)}:1.{number}")
+        os.makedirs(interface_dir)
+        write(os.path.join(interface_dir, "bInterfaceNumber"), f"{number:02x}")
+        write(os.path.join(interface_dir, "interface"), "CDC")
+        os.symlink(os.path.join(sys_root, "bus", "usb"), os.path.join(interface_dir, "subsystem"))
+        add_tty(tty_name, os.path.join(interface_dir, "tty", tty_name), interface_dir)
+
+    for i in range(usb_ports):
+        usb_dir = os.path.join(sys_root, "devices", "pci0000:00", "usb1", f"1-{i + 1}")
+        os.makedirs(usb_dir)
+        vid, pid = (pad_vid, pad_pid) if i < pads else (0x0403, 0x6001)
+        write(os.path.join(usb_dir, "idVendor"), f"{vid:04x}")
+        write(os.path.join(usb_dir, "idProduct"), f"{pid:04x}")
+        write(os.path.join(usb_dir, "serial"), f"SN{i:04d}")
+        write(os.path.join(usb_dir, "product"), "MacroPad" if i < pads else "FT232R USB UART")
+        write(os.path.join(usb_dir, "manufacturer"), "Test")
+        with_data = data_ports and i < pads
+        write(os.path.join(usb_dir, "bNumInterfaces"), " 4" if with_data else " 1")
+        add_interface(usb_dir, 0, f"ttyACM{i}")
+        if with_data:
+            add_interface(usb_dir, 2, f"ttyACM{usb_ports + i}")
+
+    return sys_root, dev_root
+
+
+def _comports_on(root):
+    """Run pyserial's Linux comports() against the synthetic tree under root"""
+    import glob
+    import types
+    from unittest import mock
+    import serial.tools.list_ports_linux as list_ports_linux
+
+    def reroot(path):
+        return root + path if path.startswith(("/sys/", "/dev/")) else path
+
+    fake_path = types.SimpleNamespace(
+        exists=lambda p: os.path.exists(reroot(p)),
+        islink=lambda p: os.path.islink(reroot(p)),
+        realpath=lambda p: os.path.realpath(reroot(p)),
+        join=os.path.join, basename=os.path.basename, dirname=os.path.dirname
+    )
+    fake_os = types.SimpleNamespace(path=fake_path)
+    fake_glob = types.SimpleNamespace(glob=lambda pattern: glob.glob(reroot(pattern)))
+
+    def fake_open(path, *args, **kwargs):
+        return open(reroot(path), *args, **kwargs)
+
+    with mock.patch.object(list_ports_linux, "os", fake_os), \
+            mock.patch.object(list_ports_linux, "glob", fake_glob), \
+            mock.patch.object(list_ports_linux, "open", fake_open, create=True):
+        return list_ports_linux.comports()
+
+
+def benchmark(virtual_ttys=64, uarts=32, usb_ports=4, pads=1, repeat=200):
+    """
+    Time enumerate_usb_serial_sysfs() against pyserial's comports() on the
+    same synthetic sysfs tree.
+
+    Returns:
+        Dictionary with the per-call time of each in milliseconds
+    """
+    import shutil
+    import tempfile
+    import time
+    from device.registry import PAD_USB_IDS
+
+    root = tempfile.mkdtemp(prefix="sysfs-bench-")
+    try:
+        sys_root, dev_root = build_synthetic_sysfs(root, virtual_ttys, uarts, usb_ports, pads)
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            ours = enumerate_usb_serial_sysfs(PAD_USB_IDS, sys_root, dev_root)
+        ours_ms = (time.perf_counter() - start) * 1000 / repeat
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            theirs = _comports_on(root)
+        theirs_ms = (time.perf_counter() - start) * 1000 / repeat
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    return {
+        "ttys": virtual_ttys + uarts + usb_ports,
+        "sysfs_ms": ours_ms,
+        "comports_ms": theirs_ms,
+        "pads_found": len(ours),
+        "comports_found": len(theirs)
+    }
+
+
+if __name__ == "__main__":
+    # Usage: python -m device.ports          list USB serial ports
+    #        python -m device.ports --bench  compare with comports()
+    if "--bench" in sys.argv:
+        for ttys in (16, 64, 256):
+            result = benchmark(virtual_ttys=ttys, uarts=ttys // 2)
+            print(f"{result['ttys']:4d} ttys: sysfs {result['sysfs_ms']:.3f} ms, "
+                  f"comports {result['comports_ms']:.3f} ms "
+                  f"({result['comports_ms'] / result['sysfs_ms']:.1f}x), "
+                  f"pads found {result['pads_found']}")
+    else:
+        for record in enumerate_usb_serial():
+            print(f"{record.device}: {record.key} {record.description}")
@@ -0,0 +1,421 @@
+"""
+Framed binary protocol spoken between the configurator and the pad over
+the USB serial link.
+
+Every message is one frame:
+
+    A5 5A | length (u16 LE) | type (u8) | seq (u8) | payload | crc (u16 LE)
+
+length is the payload length, and crc is CRC-16/CCITT-FALSE over everything
+from length to the end of the payload. The pad answers every request with an
+ACK (or NAK) frame carrying the request's sequence number.
+
+This module only uses struct, json and hashlib so the same file can be
+copied onto the CIRCUITPY drive next to the firmware.
+"""
+import json
+import struct
+
+SYNC = b"\xa5\x5a"
+HEADER = struct.Struct("<2sHBB")  # sync, payload length, type, seq
+CRC = struct.Struct("<H")
+MAX_PAYLOAD = 4096
+
+# Message types
+MSG_ACK = 0x01
+MSG_NAK = 0x02
+MSG_SET_KEY = 0x10
+MSG_SET_PROFILE = 0x11
+MSG_SWITCH_PROFILE = 0x12
+MSG_GET_HASH = 0x13
+MSG_PING = 0x14  # The ACK echoes the payload
+MSG_SET_AUTORELOAD = 0x15
+MSG_RELOAD = 0x16  # Soft reload after the ACK, like Ctrl-D
+MSG_GET_TREE = 0x17
+MSG_TRANSFER_BEGIN = 0x20
+MSG_TRANSFER_CHUNK = 0x21
+MSG_TRANSFER_END = 0x22
+MSG_KEY_EVENT = 0x30  # Unsolicited, pad to host; never acknowledged
+MSG_READY = 0x31  # Unsolicited: keymap loaded after a (re)load, payload its config_hash
+
+MESSAGE_NAMES = {
+    MSG_ACK: "ACK",
+    MSG_NAK: "NAK",
+    MSG_SET_KEY: "SET_KEY",
+    MSG_SET_PROFILE: "SET_PROFILE",
+    MSG_SWITCH_PROFILE: "SWITCH_PROFILE",
+    MSG_GET_HASH: "GET_HASH",
+    MSG_PING: "PING",
+    MSG_SET_AUTORELOAD: "SET_AUTORELOAD",
+    MSG_RELOAD: "RELOAD",
+    MSG_GET_TREE: "GET_TREE",
+    MSG_TRANSFER_BEGIN: "TRANSFER_BEGIN",
+    MSG_TRANSFER_CHUNK: "TRANSFER_CHUNK",
+    MSG_TRANSFER_END: "TRANSFER_END",
+    MSG_KEY_EVENT: "KEY_EVENT",
+    MSG_READY: "READY",
+}
+
+
+class ProtocolError(Exception):
+    """A malformed payload, a NAK from the pad, or no answer at all"""
+
+
+def _crc16_table():
+    table = []
+    for byte in range(256):
+        crc = byte << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else (crc << 1)
+        table.append(crc & 0xFFFF)
+    return table
+
+
+try:
+    from binascii import crc_hqx
+
+    def crc16(data):
+        """CRC-16/CCITT-FALSE (poly 0x1021, init 0xFFFF)"""
+        return crc_hqx(data, 0xFFFF)
+except ImportError:
+    # CircuitPython's binascii has no crc_hqx
+    _CRC16_TABLE = _crc16_table()
+
+    def crc16(data):
+        """CRC-16/CCITT-FALSE (poly 0x1021, init 0xFFFF)"""
+        crc = 0xFFFF
+        for byte in data:
+            crc = ((crc << 8) & 0xFFFF) ^ _CRC16_TABLE[(crc >> 8) ^ byte]
+        return crc
+
+
+class Frame:
+    """One decoded message"""
+
+    __slots__ = ("type", "seq", "payload")
+
+    def __init__(self, msg_type, seq, payload=b""):
+        self.type = msg_type
+        self.seq = seq
+        self.payload = payload
+
+    def __repr__(self):
+        name = MESSAGE_NAMES.get(self.type, hex(self.type))
+        return f"Frame({name}, seq={self.seq}, {len(self.payload)} bytes)"
+
+
+def encode_frame(msg_type, seq, payload=b""):
+    """Return the bytes of one frame"""
+    if len(payload) > MAX_PAYLOAD:
+        raise ProtocolError(f"Payload of {len(payload)} bytes exceeds {MAX_PAYLOAD}")
+    header = HEADER.pack(SYNC, len(payload), msg_type, seq & 0xFF)
+    body = header[2:] + payload
+    return SYNC + body + CRC.pack(crc16(body))
+
+
+class FrameDecoder:
+    """
+    Turn a byte stream into frames.
+
+    feed() accepts data in chunks of any size. Bytes before a sync marker,
+    frames with a bad CRC and impossible lengths are skipped, and decoding
+    resumes at the next sync marker, so line noise or a half-sent frame
+    from before a reset never wedges the stream.
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.crc_errors = 0
+        self.discarded = 0
+
+    def feed(self, data):
+        """Add received bytes and return the list of complete frames"""
+        self.buffer += data
+        frames = []
+        buf = self.buffer
+        while True:
+            start = buf.find(SYNC)
+            if start < 0:
+                # Keep a trailing first sync byte, the second may follow
+                keep = 1 if buf[-1:] == SYNC[:1] else 0
+                self.discarded += len(buf) - keep
+                del buf[:len(buf) - keep]
+                break
+            if start:
+                self.discarded += start
+                del buf[:start]
+            if len(buf) < HEADER.size:
+                break
+
+            _, length, msg_type, seq = HEADER.unpack_from(buf)
+            if length > MAX_PAYLOAD:
+                self.discarded += 1
+                del buf[:1]
+                continue
+            end = HEADER.size + length + CRC.size
+            if len(buf) < end:
+                break
+
+            body = bytes(buf[2:HEADER.size + length])
+            if CRC.unpack_from(buf, end - CRC.size)[0] != crc16(body):
+                self.crc_errors += 1
+                self.discarded += 1
+                del buf[:1]
+                continue
+
+            frames.append(Frame(msg_type, seq, body[HEADER.size - 2:]))
+            del buf[:end]
+        return frames
+
+
+# Payload encoding -----------------------------------------------------------
+
+def canonical_json(value):
+    """
+    Serialize value with sorted keys and no whitespace.
+
+    Written out by hand because CircuitPython's json.dumps has no sort_keys;
+    host and pad must produce identical bytes for config_hash to agree.
+    """
+    if isinstance(value, dict):
+        items = sorted(value.items())
+        return "{" + ",".join(json.dumps(str(k)) + ":" + canonical_json(v) for k, v in items) + "}"
+    if isinstance(value, (list, tuple)):
+        return "[" + ",".join(canonical_json(v) for v in value) + "]"
+    return json.dumps(value)
+
+
+def config_hash(profiles, profile_id=None):
+    """
+    SHA-256 of the canonical JSON of all profiles, or of one profile.
+
+    An unknown profile hashes like an empty one.
+    """
+    import hashlib
+    value = profiles if profile_id is None else profiles.get(profile_id, {})
+    return hashlib.sha256(canonical_json(value).encode("utf-8")).digest()
+
+
+def pack_str(text):
+    raw = text.encode("utf-8")
+    if len(raw) > 255:
+        raise ProtocolError("Identifier longer than 255 bytes")
+    return bytes((len(raw),)) + raw
+
+
+def unpack_str(payload, offset=0):
+    """Return (text, next offset)"""
+    if offset >= len(payload):
+        raise ProtocolError("Truncated payload")
+    length = payload[offset]
+    end = offset + 1 + length
+    if end > len(payload):
+        raise ProtocolError("Truncated payload")
+    try:
+        return bytes(payload[offset + 1:end]).decode("utf-8"), end
+    except UnicodeDecodeError as e:
+        raise ProtocolError(f"Bad identifier: {e}")
+
+
+def _unpack_json(payload, offset):
+    try:
+        return json.loads(bytes(payload[offset:]).decode("utf-8"))
+    except ValueError as e:
+        raise ProtocolError(f"Bad JSON payload: {e}")
+
+
+def encode_set_key(profile_id, key_id, entry):
+    """SET_KEY payload; entry None removes the key"""
+    return pack_str(str(profile_id)) + pack_str(str(key_id)) + canonical_json(entry).encode("utf-8")
+
+
+def decode_set_key(payload):
+    """Return (profile_id, key_id, entry)"""
+    profile_id, offset = unpack_str(payload)
+    key_id, offset = unpack_str(payload, offset)
+    return profile_id, key_id, _unpack_json(payload, offset)
+
+
+def encode_set_profile(profile_id, profile):
+    """SET_PROFILE payload: replaces every key of one profile"""
+    return pack_str(str(profile_id)) + canonical_json(profile).encode("utf-8")
+
+
+def decode_set_profile(payload):
+    """Return (profile_id, profile dict)"""
+    profile_id, offset = unpack_str(payload)
+    profile = _unpack_json(payload, offset)
+    if not isinstance(profile, dict):
+        raise ProtocolError("Profile payload is not an object")
+    return profile_id, profile
+
+
+def encode_profile_id(profile_id=None):
+    """SWITCH_PROFILE / GET_HASH payload; GET_HASH without a profile hashes all"""
+    return b"" if profile_id is None else pack_str(str(profile_id))
+
+
+def decode_profile_id(payload):
+    if not payload:
+        return None
+    return unpack_str(payload)[0]
+
+
+KEY_EVENT = struct.Struct("<BI")  # pressed, pad uptime in ms
+
+
+def encode_key_event(profile_id, key_id, pressed=True, uptime_ms=0):
+    """KEY_EVENT payload: a key went down (pressed) or up on the pad"""
+    return (pack_str(str(profile_id)) + pack_str(str(key_id)) +
+            KEY_EVENT.pack(1 if pressed else 0, uptime_ms & 0xFFFFFFFF))
+
+
+def decode_key_event(payload):
+    """Return (profile_id, key_id, pressed, uptime_ms)"""
+    profile_id, offset = unpack_str(payload)
+    key_id, offset = unpack_str(payload, offset)
+    if len(payload) < offset + KEY_EVENT.size:
+        raise ProtocolError("Truncated payload")
+    pressed, uptime_ms = KEY_EVENT.unpack_from(payload, offset)
+    return profile_id, key_id, bool(pressed), uptime_ms
+
+
+PING = struct.Struct("<IQ")  # probe number, host send time in ns
+
+
+def encode_ping(number, sent_ns):
+    """PING payload; the pad echoes it back unchanged in its ACK"""
+    return PING.pack(number & 0xFFFFFFFF, sent_ns & 0xFFFFFFFFFFFFFFFF)
+
+
+def decode_ping(payload):
+    """Return (number, sent_ns)"""
+    if len(payload) < PING.size:
+        raise ProtocolError("Truncated payload")
+    return PING.unpack_from(payload)
+
+
+# Whole-keysfile transfer: the zlib-compressed file is sent in numbered
+# chunks, each with its own CRC-32. The pad keeps the chunks it has for a
+# transfer id, so a transfer cut off by a disconnect resumes where it was.
+TRANSFER_BEGIN = struct.Struct("<IIIHI")  # transfer id, size, compressed size, chunk size, chunk count
+TRANSFER_CHUNK = struct.Struct("<III")  # transfer id, chunk index, CRC-32 of the chunk
+TRANSFER_ACK = struct.Struct("<I")  # index of the first chunk the pad is still missing
+MAX_CHUNK = MAX_PAYLOAD - TRANSFER_CHUNK.size
+
+
+def encode_transfer_begin(transfer_id, size, compressed_size, chunk_size, chunk_count, digest):
+    """TRANSFER_BEGIN payload; digest is the SHA-256 of the uncompressed file"""
+    return TRANSFER_BEGIN.pack(transfer_id, size, compressed_size, chunk_size, chunk_count) + digest
+
+
+def decode_transfer_begin(payload):
+    """Return (transfer_id, size, compressed_size, chunk_size, chunk_count, digest)"""
+    if len(payload) != TRANSFER_BEGIN.size + 32:
+        raise ProtocolError("Bad TRANSFER_BEGIN payload")
+    return TRANSFER_BEGIN.unpack_from(payload) + (bytes(payload[TRANSFER_BEGIN.size:]),)
+
+
+def encode_transfer_chunk(transfer_id, index, data):
+    from binascii import crc32
+    return TRANSFER_CHUNK.pack(transfer_id, index, crc32(data) & 0xFFFFFFFF) + data
+
+
+def decode_transfer_chunk(payload):
+    """Return (transfer_id, index, data); raises ProtocolError when the chunk CRC does not match"""
+    from binascii import crc32
+    if len(payload) < TRANSFER_CHUNK.size:
+        raise ProtocolError("Truncated payload")
+    transfer_id, index, crc = TRANSFER_CHUNK.unpack_from(payload)
+    data = bytes(payload[TRANSFER_CHUNK.size:])
+    if crc32(data) & 0xFFFFFFFF != crc:
+        raise ProtocolError(f"Chunk {index} failed its CRC")
+    return transfer_id, index, data
+
+
+def decode_transfer_end(payload):
+    """Return the transfer_id of a TRANSFER_END payload"""
+    if len(payload) != TRANSFER_ACK.size:
+        raise ProtocolError("Bad TRANSFER_END payload")
+    return TRANSFER_ACK.unpack_from(payload)[0]
+
+
+# Hash tree of the profiles: a digest per key, per profile (over its key
+# digests) and for the root (over the non-empty profiles' digests). Host
+# and pad compare the tree top down and only exchange the keys that differ.
+DIGEST_SIZE = 16
+TREE_ROOT = 0
+TREE_PROFILES = 1
+TREE_KEYS = 2
+
+
+def _digest(data):
+    import hashlib
+    return hashlib.sha256(data).digest()[:DIGEST_SIZE]
+
+
+def key_digest(entry):
+    return _digest(canonical_json(entry).encode("utf-8"))
+
+
+def node_digest(children):
+    """Digest of a node from its {child id: digest}, in sorted id order"""
+    return _digest(b"".join(pack_str(str(child)) + children[child] for child in sorted(children)))
+
+
+EMPTY_DIGEST = node_digest({})
+
+
+def profile_digests(profile):
+    return {key_id: key_digest(entry) for key_id, entry in profile.items()}
+
+
+def tree_children(profiles):
+    """{profile id: profile digest} of the non-empty profiles; an empty profile equals a missing one"""
+    children = {}
+    for profile_id, profile in profiles.items():
+        digest = node_digest(profile_digests(profile))
+        if digest != EMPTY_DIGEST:
+            children[profile_id] = digest
+    return children
+
+
+def encode_tree_request(level, profile_id=None):
+    """GET_TREE payload: the root digest, the profiles' digests, or one profile's key digests"""
+    return bytes((level,)) + (pack_str(str(profile_id)) if level == TREE_KEYS else b"")
+
+
+def decode_tree_request(payload):
+    """Return (level, profile_id or None)"""
+    if not payload:
+        raise ProtocolError("Truncated payload")
+    level = payload[0]
+    if level == TREE_KEYS:
+        return level, unpack_str(payload, 1)[0]
+    if level not in (TREE_ROOT, TREE_PROFILES):
+        raise ProtocolError(f"Unknown tree level {level}")
+    return level, None
+
+
+def encode_tree_node(digest, children=None):
+    """GET_TREE answer: the node's digest, then each child's id and digest"""
+    parts = [digest]
+    for child in sorted(children or {}):
+        parts.append(pack_str(str(child)) + children[child])
+    return b"".join(parts)
+
+
+def decode_tree_node(payload):
+    """Return (digest, {child id: digest})"""
+    if len(payload) < DIGEST_SIZE:
+        raise ProtocolError("Truncated payload")
+    digest = bytes(payload[:DIGEST_SIZE])
+    children = {}
+    offset = DIGEST_SIZE
+    while offset < len(payload):
+        child, offset = unpack_str(payload, offset)
+        if offset + DIGEST_SIZE > len(payload):
+            raise ProtocolError("Truncated payload")
+        children[child] = bytes(payload[offset:offset + DIGEST_SIZE])
+        offset += DIGEST_SIZE
+    return digest, children
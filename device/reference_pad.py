@@ -0,0 +1,183 @@
+"""
+Reference implementation of the pad side of device.protocol.
+
+It is kept free of threads and host-only modules so it can run unchanged
+in the CircuitPython firmware: the firmware feeds it whatever usb_cdc.data
+returned and writes the reply bytes back. On the host it backs the protocol
+demo and the device emulator.
+"""
+from device.protocol import (
+    FrameDecoder, ProtocolError, encode_frame, config_hash,
+    decode_set_key, decode_set_profile, decode_profile_id,
+    decode_transfer_begin, decode_transfer_chunk, decode_transfer_end, TRANSFER_ACK,
+    decode_tree_request, encode_tree_node, node_digest, profile_digests, tree_children,
+    TREE_ROOT, TREE_PROFILES,
+    MSG_ACK, MSG_NAK, MSG_SET_KEY, MSG_SET_PROFILE, MSG_SWITCH_PROFILE, MSG_GET_HASH, MSG_PING,
+    MSG_SET_AUTORELOAD, MSG_RELOAD, MSG_READY,
+    MSG_TRANSFER_BEGIN, MSG_TRANSFER_CHUNK, MSG_TRANSFER_END, MSG_GET_TREE
+)
+
+
+class ReferencePad:
+    """
+    Apply protocol requests to an in-memory profiles dict.
+
+    Changes take effect immediately; saving them to keysfile.json is left
+    to the host, which writes the file later in one go.
+    """
+
+    def __init__(self, profiles=None, current_profile="0", on_change=None, on_config=None):
+        self.profiles = profiles if profiles is not None else {}
+        self.current_profile = current_profile
+        self.on_change = on_change  # called with (profile_id, key_id or None)
+        self.on_config = on_config  # called with a keysfile received whole, to save it
+        # Firmware state the pad's main loop applies: supervisor.runtime.autoreload,
+        # and supervisor.reload() once the reply to RELOAD has been written
+        self.autoreload = True
+        self.reload_requested = False
+        self.decoder = FrameDecoder()
+        # Transfer in progress: its TRANSFER_BEGIN fields, the chunks received
+        # so far by index and the first index still missing
+        self.transfer = None
+        self.transfer_chunks = {}
+        self.transfer_next = 0
+        self.handled = 0
+        self.errors = 0
+        self.handlers = {
+            MSG_SET_KEY: self._set_key,
+            MSG_SET_PROFILE: self._set_profile,
+            MSG_SWITCH_PROFILE: self._switch_profile,
+            MSG_GET_HASH: self._get_hash,
+            MSG_PING: self._ping,
+            MSG_SET_AUTORELOAD: self._set_autoreload,
+            MSG_RELOAD: self._reload,
+            MSG_TRANSFER_BEGIN: self._transfer_begin,
+            MSG_TRANSFER_CHUNK: self._transfer_chunk,
+            MSG_TRANSFER_END: self._transfer_end,
+            MSG_GET_TREE: self._get_tree,
+        }
+
+    def feed(self, data):
+        """Process received bytes and return the bytes to send back"""
+        reply = b""
+        for frame in self.decoder.feed(data):
+            reply += self.handle(frame)
+        return reply
+
+    def ready(self):
+        """READY frame to send once the keymap is loaded at boot"""
+        return encode_frame(MSG_READY, 0, config_hash(self.profiles))
+
+    def handle(self, frame):
+        """Answer one frame with an ACK or a NAK frame"""
+        handler = self.handlers.get(frame.type)
+        if handler is None:
+            self.errors += 1
+            return encode_frame(MSG_NAK, frame.seq, b"unknown message type")
+        try:
+            result = handler(frame.payload)
+        except (ProtocolError, ValueError, KeyError) as e:
+            self.errors += 1
+            return encode_frame(MSG_NAK, frame.seq, str(e).encode("utf-8"))
+        self.handled += 1
+        return encode_frame(MSG_ACK, frame.seq, result or b"")
+
+    def _changed(self, profile_id, key_id=None):
+        if self.on_change:
+            self.on_change(profile_id, key_id)
+
+    def _set_key(self, payload):
+        profile_id, key_id, entry = decode_set_key(payload)
+        profile = self.profiles.setdefault(profile_id, {})
+        if entry is None:
+            profile.pop(key_id, None)
+        else:
+            profile[key_id] = entry
+        self._changed(profile_id, key_id)
+
+    def _set_profile(self, payload):
+        profile_id, profile = decode_set_profile(payload)
+        self.profiles[profile_id] = profile
+        self._changed(profile_id)
+
+    def _switch_profile(self, payload):
+        profile_id = decode_profile_id(payload)
+        if profile_id not in self.profiles:
+            raise ProtocolError(f"Profile {profile_id} not found")
+        self.current_profile = profile_id
+        self._changed(profile_id)
+
+    def _get_hash(self, payload):
+        return config_hash(self.profiles, decode_profile_id(payload))
+
+    def _ping(self, payload):
+        return bytes(payload)
+
+    def _set_autoreload(self, payload):
+        if not payload:
+            raise ProtocolError("Truncated payload")
+        self.autoreload = bool(payload[0])
+
+    def _reload(self, payload):
+        self.reload_requested = True
+
+    def _transfer_begin(self, payload):
+        begin = decode_transfer_begin(payload)
+        if begin != self.transfer:
+            # A different file: start over. The same one resumes.
+            self.transfer = begin
+            self.transfer_chunks = {}
+            self.transfer_next = 0
+        return TRANSFER_ACK.pack(self.transfer_next)
+
+    def _transfer_chunk(self, payload):
+        transfer_id, index, data = decode_transfer_chunk(payload)
+        if self.transfer is None or transfer_id != self.transfer[0]:
+            raise ProtocolError("No such transfer")
+        chunk_size, count = self.transfer[3], self.transfer[4]
+        if index >= count or len(data) > chunk_size:
+            raise ProtocolError(f"Chunk {index} out of range")
+        self.transfer_chunks[index] = data
+        while self.transfer_next in self.transfer_chunks:
+            self.transfer_next += 1
+        return TRANSFER_ACK.pack(self.transfer_next)
+
+    def _transfer_end(self, payload):
+        import hashlib
+        import json
+        import zlib
+        if self.transfer is None or decode_transfer_end(payload) != self.transfer[0]:
+            raise ProtocolError("No such transfer")
+        _, size, compressed_size, _, count, digest = self.transfer
+        if self.transfer_next < count:
+            raise ProtocolError(f"Chunk {self.transfer_next} missing")
+        compressed = b"".join(self.transfer_chunks[i] for i in range(count))
+        self.transfer = None
+        self.transfer_chunks = {}
+        self.transfer_next = 0
+        try:
+            raw = zlib.decompress(compressed)
+        except Exception as e:
+            raise ProtocolError(f"Could not decompress: {e}")
+        if len(compressed) != compressed_size or len(raw) != size or hashlib.sha256(raw).digest() != digest:
+            raise ProtocolError("Received file does not match its hash")
+        data = json.loads(raw.decode("utf-8"))
+        profiles = data.get("profiles", {}) if isinstance(data, dict) else None
+        if not isinstance(profiles, dict) or not all(isinstance(profile, dict) for profile in profiles.values()):
+            raise ProtocolError("Received file is not a keysfile")
+        self.profiles = profiles
+        if self.current_profile not in self.profiles:
+            self.current_profile = next(iter(self.profiles), "0")
+        if self.on_config:
+            self.on_config(raw)
+        return config_hash(self.profiles)
+
+    def _get_tree(self, payload):
+        level, profile_id = decode_tree_request(payload)
+        if level == TREE_ROOT:
+            return encode_tree_node(node_digest(tree_children(self.profiles)))
+        if level == TREE_PROFILES:
+            children = tree_children(self.profiles)
+            return encode_tree_node(node_digest(children), children)
+        children = profile_digests(self.profiles.get(profile_id, {}))
+        return encode_tree_node(node_digest(children), children)
@@ -0,0 +1,171 @@
+import json
+import os
+import threading
+import time
+
+# USB ids a MacroPad can enumerate with: (vid, pid), pid None matches any.
+# Only CircuitPython's own ids: 0x239A:0x80F4 is CircuitPython on the
+# Raspberry Pi Pico, 0x239A:0x8108 on the Adafruit MacroPad RP2040. The
+# Raspberry Pi vendor id 0x2E8A is left out on purpose, it is shared by the
+# Debug Probe and by Picos running MicroPython or the SDK's stdio.
+PAD_USB_IDS = [(0x239A, 0x80F4), (0x239A, 0x8108)]
+
+
+class DeviceIdentity:
+    """USB identity of a serial port, as reported once by the OS (sysfs on Linux)"""
+
+    __slots__ = ("vid", "pid", "serial_number", "device", "description", "interface")
+
+    def __init__(self, vid, pid, serial_number=None, device=None, description="", interface=None):
+        self.vid = vid
+        self.pid = pid
+        self.serial_number = serial_number
+        self.device = device
+        self.description = description
+        self.interface = interface  # USB interface number of the tty, None if unknown
+
+    @classmethod
+    def from_port(cls, port):
+        """Build an identity from a ListPortInfo-like object (None if not USB)"""
+        if getattr(port, "vid", None) is None or getattr(port, "pid", None) is None:
+            return None
+        return cls(port.vid, port.pid, getattr(port, "serial_number", None),
+                   port.device, getattr(port, "description", ""), _interface_from_location(getattr(port, "location", None)))
+
+    @property
+    def key(self):
+        """Stable id of the physical device, independent of its port name"""
+        return f"{self.vid:04x}:{self.pid:04x}:{self.serial_number or ''}"
+
+    def matches(self, usb_ids):
+        return any(self.vid == vid and (pid is None or self.pid == pid) for vid, pid in usb_ids)
+
+    def __repr__(self):
+        return f"DeviceIdentity({self.key}, {self.device}, interface={self.interface})"
+
+
+def _interface_from_location(location):
+    """USB interface number from a pyserial location such as "1-1.4:1.2", or None"""
+    try:
+        return int(location.rsplit(":", 1)[1].split(".")[1])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+class DeviceRegistry:
+    """
+    Remembers which USB devices are MacroPads.
+
+    Ports are matched on USB VID/PID first, so unrelated USB-serial adapters
+    are never opened. A matching device is probe-opened only the first time
+    its identity (VID/PID/serial number) is seen; after that it is recognised
+    from the cache, which is saved to cache_path so it survives restarts.
+    """
+
+    def __init__(self, cache_path=None, usb_ids=None, probe=None):
+        self.cache_path = cache_path
+        self.usb_ids = usb_ids or PAD_USB_IDS
+        self.probe = probe or probe_port
+        self.probes = 0
+        self.unconfirmed = []  # Matching ports whose probe failed in the last find_pads()
+        self._lock = threading.Lock()
+        self._known = self._load()
+
+    def _load(self):
+        if not self.cache_path:
+            return {}
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"Error loading device cache: {e}")
+            return {}
+
+    def _save(self):
+        if not self.cache_path:
+            return
+        try:
+            with open(self.cache_path, 'w', encoding='utf-8') as f:
+                json.dump(self._known, f, indent=2)
+        except Exception as e:
+            print(f"Error saving device cache: {e}")
+
+    def is_known(self, identity):
+        return identity.key in self._known
+
+    def identify(self, identity):
+        """
+        Return True if identity is a MacroPad, probing its port only if it
+        has never been seen before.
+        """
+        if not identity.matches(self.usb_ids):
+            return False
+        with self._lock:
+            if identity.key in self._known:
+                return True
+
+        # New device: confirm the port opens before trusting it. A failed
+        # probe is not cached, so a busy port is retried on the next check.
+        self.probes += 1
+        if not self.probe(identity.device):
+            return False
+        with self._lock:
+            self._known[identity.key] = {
+                "description": identity.description,
+                "first_seen": time.strftime("%Y-%m-%d %H:%M:%S")
+            }
+            self._save()
+        return True
+
+    def find_pads(self, ports):
+        """
+        Return the identities of all MacroPads among ports, one per pad.
+
+        A pad with usb_cdc.data enabled has two ttys with the same identity:
+        the REPL console and the data port. The data port is the one with
+        the higher USB interface number, and is the one kept, so protocol
+        frames never reach the console.
+        """
+        pads = {}
+        unconfirmed = []
+        for port in ports:
+            identity = port if isinstance(port, DeviceIdentity) else DeviceIdentity.from_port(port)
+            if identity is None or not identity.matches(self.usb_ids):
+                continue
+            if not self.identify(identity):
+                unconfirmed.append(identity)
+                continue
+            current = pads.get(identity.key)
+            if current is None or (identity.interface or 0) > (current.interface or 0):
+                pads[identity.key] = identity
+        # A port can fail its probe just because udev has not set it up yet
+        self.unconfirmed = [identity for identity in unconfirmed if identity.key not in pads]
+        return list(pads.values())
+
+    def forget(self, identity=None):
+        """Drop one identity (or all) from the cache"""
+        with self._lock:
+            if identity is None:
+                self._known.clear()
+            else:
+                self._known.pop(identity.key, None)
+            self._save()
+
+
+def probe_port(device):
+    """Open and close a serial port to check that it is usable"""
+    import serial
+    try:
+        ser = serial.Serial(device, 9600, timeout=1)
+        ser.close()
+        return True
+    except Exception:
+        return False
+
+
+def default_cache_path():
+    """devices.json next to the application"""
+    from engine import get_app_dir
+    return os.path.join(get_app_dir(), "devices.json")
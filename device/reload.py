@@ -0,0 +1,199 @@
+"""
+One soft reload of the pad per save, instead of CircuitPython's auto-reload.
+
+Every write to CIRCUITPY makes CircuitPython restart code.py once the drive
+has been idle for a moment; a save that writes several files, or several
+saves in a row, can restart the pad more than once and nobody knows when
+it is back. While ReloadPipeline runs:
+
+- the first keysfile write of a burst turns the pad's auto-reload off
+  (SET_AUTORELOAD), so the writes themselves never restart it
+- once no write has happened for settle seconds, one RELOAD is sent
+- the pad answers with a READY frame carrying the config_hash of the map
+  it loaded, which is checked against the saved keysfile
+- if the reload fails or READY never comes, auto-reload is turned back on
+
+Each burst is reported as a ReloadResult with the time from the reload
+request, and from the last write, until the pad was ready. The reload
+starts code.py over, which turns auto-reload back on, so a pad left by a
+crashed app behaves as usual.
+"""
+import queue
+import threading
+import time
+
+from device.protocol import ProtocolError, config_hash, MSG_READY
+
+
+class ReloadResult:
+    """Outcome of one burst of saves; truthy when the pad came back with the saved map"""
+
+    __slots__ = ("writes", "time_to_ready", "save_to_ready", "in_sync", "error")
+
+    def __init__(self, writes, time_to_ready=None, save_to_ready=None, in_sync=False, error=None):
+        self.writes = writes
+        self.time_to_ready = time_to_ready
+        self.save_to_ready = save_to_ready
+        self.in_sync = in_sync
+        self.error = error
+
+    def __bool__(self):
+        return self.error is None and self.in_sync
+
+    def __repr__(self):
+        if self.error:
+            return f"ReloadResult({self.writes} writes, error={self.error!r})"
+        return (f"ReloadResult({self.writes} writes, ready {self.time_to_ready * 1000:.1f} ms after the reload, "
+                f"{self.save_to_ready * 1000:.1f} ms after the save, in_sync={self.in_sync})")
+
+
+class ReloadPipeline:
+    """
+    Replace auto-reloads with one explicit reload per burst of keysfile writes.
+
+    Args:
+        client: ProtocolClient of the pad
+        store: ProfileStore whose saved data the pad must end up running
+            (default engine.profile_store)
+        settle: Seconds without writes that end a burst
+        ready_timeout: Seconds to wait for READY after RELOAD
+        on_result: Optional callback(ReloadResult), from the pipeline thread
+    """
+
+    def __init__(self, client, store=None, settle=0.3, ready_timeout=5.0, on_result=None):
+        if store is None:
+            from engine import profile_store as store
+        self.client = client
+        self.store = store
+        self.settle = settle
+        self.ready_timeout = ready_timeout
+        self.on_result = on_result
+        self.supported = True
+        self.reloads = 0
+        self.writes = 0
+        self.failures = 0
+        self.last_result = None
+        self._queue = queue.Queue()
+        self._thread = None
+        self._ready = threading.Event()
+        self._ready_hash = None
+        self._burst_path = None
+        self._burst_writes = 0
+        self._writing = 0
+        self._last_write = None
+
+    def start(self):
+        from engine import add_save_listener
+        if self._thread is not None:
+            return
+        self.client.add_handler(MSG_READY, self._on_ready)
+        add_save_listener(self.on_save)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop watching writes; a burst still waiting to settle is reloaded now"""
+        from engine import remove_save_listener
+        if self._thread is None:
+            return
+        remove_save_listener(self.on_save)
+        self._queue.put(None)
+        if self._thread is not threading.current_thread():
+            self._thread.join(timeout=self.ready_timeout + 2)
+        self._thread = None
+        self.client.remove_handler(MSG_READY, self._on_ready)
+
+    def on_save(self, path, finished):
+        """engine save listener: only queue, the store lock is held"""
+        self._queue.put((path, finished, time.monotonic()))
+
+    def _on_ready(self, frame):
+        self._ready_hash = bytes(frame.payload)
+        self._ready.set()
+
+    def _run(self):
+        while True:
+            timeout = None
+            if self._burst_path is not None and not self._writing:
+                timeout = max(0.0, self._last_write + self.settle - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                self._reload()
+                continue
+            if item is None:
+                if self._burst_path is not None:
+                    self._reload()
+                return
+
+            path, finished, at = item
+            if not self.supported:
+                continue
+            if not finished:
+                self._writing += 1
+                if self._burst_path is None:
+                    self._burst_path = path
+                    self._burst_writes = 0
+                    self._set_autoreload(False)
+            else:
+                self._writing = max(0, self._writing - 1)
+                self._burst_writes += 1
+                self.writes += 1
+                self._last_write = at
+
+    def _set_autoreload(self, enabled):
+        try:
+            self.client.set_autoreload(enabled)
+        except ProtocolError as e:
+            # Firmware without the command: leave reloading to CircuitPython
+            print(f"Pad cannot turn off auto-reload, leaving it on: {e}")
+            self.supported = False
+            self._burst_path = None
+
+    def _reload(self):
+        path, writes = self._burst_path, self._burst_writes
+        self._burst_path = None
+        self._ready.clear()
+        self._ready_hash = None
+        start = time.monotonic()
+        try:
+            self.client.reload()
+            if not self._ready.wait(self.ready_timeout):
+                raise ProtocolError(f"Pad not ready {self.ready_timeout:.0f} s after reloading")
+        except ProtocolError as e:
+            self.failures += 1
+            # Without the reload nothing turns auto-reload back on; later
+            # writes to the drive would never reach the pad
+            try:
+                self.client.set_autoreload(True)
+            except ProtocolError as restore_error:
+                print(f"Could not turn the pad's auto-reload back on: {restore_error}")
+            self._report(ReloadResult(writes, error=str(e)))
+            return
+        ready = time.monotonic()
+        self.reloads += 1
+
+        try:
+            saved = self.store.read(path).get("profiles", {})
+            in_sync = config_hash(saved) == self._ready_hash
+        except Exception as e:
+            print(f"Error reading {path}: {e}")
+            in_sync = False
+        last_write = self._last_write if self._last_write is not None else start
+        self._report(ReloadResult(writes, ready - start, ready - last_write, in_sync))
+
+    def _report(self, result):
+        self.last_result = result
+        if self.on_result:
+            try:
+                self.on_result(result)
+            except Exception as e:
+                print(f"Error reporting pad reload: {e}")
+
+    def stats(self):
+        return {
+            "writes": self.writes,
+            "reloads": self.reloads,
+            "failures": self.failures,
+            "supported": self.supported
+        }
@@ -0,0 +1,309 @@
+"""
+Stand-in for the pad's CIRCUITPY mass-storage drive with its costs modelled.
+
+Writes to the real drive are slow (small FAT writes over USB mass storage)
+and every one of them makes CircuitPython auto-reload the pad. SimulatedDrive
+is a plain local directory that adds those costs back, so the number of
+reloads and the wall time of each save flow can be measured and compared
+without hardware:
+
+    with SimulatedDrive() as drive:          # get_json_path() now points here
+        with drive.measure("save key"):
+            update_profile_key("0", "1", ["ctrl", "c"], "Copy")
+    print(drive.format_report())
+
+python -m device.storage runs the ConfigPanel save flows against it in
+each ProfileStore mode and prints the table.
+"""
+import builtins
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+# Modules whose file writes can land on the drive
+WRITER_MODULES = ("engine", "utils.journal", "utils.device_export", "utils.blobs")
+
+_WRITE_MODES = set("wax+")
+
+
+class _SlowFile:
+    """File object wrapper that charges the drive's costs as it is used"""
+
+    def __init__(self, f, drive, path):
+        self._f = f
+        self._drive = drive
+        self._path = path
+        self._closed = False
+        self._size = 0
+
+    def write(self, data):
+        # Python buffers small writes; the cost is charged per block on close
+        self._size += len(data)
+        return self._f.write(data)
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._f.close()
+        self._drive._file_written(self._path, self._size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def __iter__(self):
+        return iter(self._f)
+
+    def __getattr__(self, name):
+        return getattr(self._f, name)
+
+
+class SimulatedDrive:
+    """
+    A directory that behaves like a slow CIRCUITPY drive.
+
+    Args:
+        directory: Directory to use; a temporary one is created (and removed
+            on uninstall) when None
+        write_latency: Seconds charged per block_size block written
+        block_size: Flash erase/program unit the drive writes in
+        bytes_per_second: Write throughput, charged on top of the block cost
+        fsync_cost: Seconds charged per written file for committing the FAT
+            and directory entry to flash
+        reload_delay: Writes closer together than this cause one reload, like
+            CircuitPython's auto-reload settling time
+        reload_time: How long the pad is unavailable per reload; accounted
+            in the report, not slept
+    """
+
+    def __init__(self, directory=None, write_latency=0.02, block_size=4096, bytes_per_second=200 * 1024,
+                 fsync_cost=0.15, reload_delay=0.5, reload_time=1.5):
+        self._owns_directory = directory is None
+        if directory is None:
+            directory = os.path.join(tempfile.mkdtemp(prefix="circuitpy-sim-"), "CIRCUITPY")
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.abspath(directory)
+        self.write_latency = write_latency
+        self.block_size = block_size
+        self.bytes_per_second = bytes_per_second
+        self.fsync_cost = fsync_cost
+        self.reload_delay = reload_delay
+        self.reload_time = reload_time
+
+        self.blocks = 0
+        self.bytes_written = 0
+        self.files_written = 0
+        self.reloads = 0
+        self.stall_seconds = 0.0
+        self.measurements = []
+
+        self._last_write_at = None
+        self._lock = threading.Lock()
+        self._patched = {}
+        self._previous_override = None
+
+    # File access -------------------------------------------------------------
+
+    def contains(self, path):
+        try:
+            path = os.path.abspath(os.fspath(path))
+        except TypeError:
+            return False  # A file descriptor
+        return path == self.path or path.startswith(self.path + os.sep)
+
+    def open(self, file, mode="r", *args, **kwargs):
+        """open() replacement: files written on the drive get a _SlowFile"""
+        f = builtins.open(file, mode, *args, **kwargs)
+        if _WRITE_MODES & set(mode) and self.contains(file):
+            return _SlowFile(f, self, os.path.abspath(file))
+        return f
+
+    def _stall(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds)
+            with self._lock:
+                self.stall_seconds += seconds
+
+    def _file_written(self, path, size):
+        blocks = max(1, -(-size // self.block_size))
+        self._stall(blocks * self.write_latency + size / self.bytes_per_second + self.fsync_cost)
+        now = time.monotonic()
+        with self._lock:
+            self.blocks += blocks
+            self.bytes_written += size
+            self.files_written += 1
+            # The host's write restarts CircuitPython's reload countdown
+            if self._last_write_at is None or now - self._last_write_at >= self.reload_delay:
+                self.reloads += 1
+            self._last_write_at = now
+
+    # Installation ------------------------------------------------------------
+
+    def install(self):
+        """Route the app's writes through the drive and point get_json_path() at it"""
+        import importlib
+        import engine
+
+        for name in WRITER_MODULES:
+            module = importlib.import_module(name)
+            self._patched[name] = module.__dict__.get("open")
+            module.open = self.open
+
+        self._previous_override = engine.drive_resolver.override
+        engine.drive_resolver.set_override(self.path)
+        engine.profile_store.invalidate()
+        return self
+
+    def uninstall(self):
+        import engine
+
+        engine.profile_store.flush()
+        for name, previous in self._patched.items():
+            module = sys.modules[name]
+            if previous is None:
+                module.__dict__.pop("open", None)
+            else:
+                module.open = previous
+        self._patched = {}
+        engine.drive_resolver.set_override(self._previous_override)
+        engine.profile_store.invalidate()
+        if self._owns_directory:
+            shutil.rmtree(os.path.dirname(self.path), ignore_errors=True)
+
+    def __enter__(self):
+        return self.install()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.uninstall()
+        return False
+
+    # Measurement -------------------------------------------------------------
+
+    def counters(self):
+        with self._lock:
+            return {
+                "blocks": self.blocks,
+                "bytes": self.bytes_written,
+                "files": self.files_written,
+                "reloads": self.reloads,
+                "stall_s": self.stall_seconds
+            }
+
+    def idle(self, seconds):
+        """Let seconds pass for the reload model without sleeping (user think time)"""
+        with self._lock:
+            if self._last_write_at is not None:
+                self._last_write_at -= seconds
+
+    def measure(self, name):
+        """Context manager recording the wall time and drive activity of a flow"""
+        return _Measurement(self, name)
+
+    def format_report(self):
+        lines = [f"{'flow':36} {'wall s':>8} {'stall s':>8} {'files':>6} {'KB':>8} {'reloads':>8} {'outage s':>9}"]
+        for m in self.measurements:
+            lines.append(f"{m['name']:36} {m['wall_s']:8.3f} {m['stall_s']:8.3f} {m['files']:6d} "
+                         f"{m['bytes'] / 1024:8.1f} {m['reloads']:8d} {m['reloads'] * self.reload_time:9.1f}")
+        return "\n".join(lines)
+
+
+class _Measurement:
+    def __init__(self, drive, name):
+        self.drive = drive
+        self.name = name
+
+    def __enter__(self):
+        # Start every flow from a settled pad
+        self.drive._last_write_at = None
+        self.before = self.drive.counters()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self.start
+        after = self.drive.counters()
+        result = {key: after[key] - self.before[key] for key in after}
+        result["name"] = self.name
+        result["wall_s"] = wall
+        self.drive.measurements.append(result)
+        return False
+
+
+def run_flows(drive, mode):
+    """
+    Run the ConfigPanel save flows once in a ProfileStore mode.
+
+    Modes: "write-through" (default), "journal", "device-export", "deferred".
+    Deferred writes are flushed at the end of each flow, as their timer would.
+    """
+    import engine
+    from engine import profile_store, update_profile_key, ProfileBatch, set_layout
+    from utils.layout import Layout
+
+    store_modes = {
+        "journal": (profile_store.enable_journal, profile_store.disable_journal),
+        # The master copy goes beside the simulated drive, not into the app directory
+        "device-export": (lambda: profile_store.enable_device_export(
+            os.path.join(os.path.dirname(drive.path), "keysfile.master.json")), profile_store.disable_device_export),
+        "deferred": (lambda: profile_store.enable_deferred_writes(60), profile_store.disable_deferred_writes),
+    }
+    enable, disable = store_modes.get(mode, (None, None))
+    if enable:
+        enable()
+
+    def flow(name, action):
+        with drive.measure(f"{mode}: {name}"):
+            action()
+            if mode == "deferred":
+                profile_store.flush()
+
+    text = "Kind regards,\nThe MacroPad team\n" * 20
+    try:
+        engine.get_json_path()  # Creates the default keysfile outside the measurements
+        # ConfigPanel.save_config: one shortcut
+        flow("save shortcut", lambda: update_profile_key("0", "1", ["ctrl", "c"], "Copy", {"software": None}))
+        # Pressing Save again without changing anything
+        flow("save shortcut unchanged", lambda: update_profile_key("0", "1", ["ctrl", "c"], "Copy", {"software": None}))
+        # ConfigPanel.save_text_config: a text macro
+        flow("save text macro", lambda: update_profile_key(
+            "0", "2", ["text_input"], "Signature",
+            {"software": None, "text_type": "paragraph", "text_content": text}))
+        # Filling a profile key by key, saving after each with a couple of
+        # seconds of (simulated) think time in between
+        def one_by_one():
+            for k in range(1, 10):
+                update_profile_key("1", str(k), ["ctrl", "f" + str(k)], f"F{k}")
+                drive.idle(2.0)
+        flow("save 9 keys one by one", one_by_one)
+
+        def batch():
+            with ProfileBatch() as b:
+                for k in range(1, 10):
+                    b.set_key("2", str(k), ["alt", str(k)], f"Alt {k}")
+        flow("save 9 keys as a batch", batch)
+        flow("change layout", lambda: set_layout(Layout(4, 4, 6)))
+        flow("change layout unchanged", lambda: set_layout(Layout(4, 4, 6)))
+    finally:
+        if disable:
+            disable()
+
+
+if __name__ == "__main__":
+    # Usage: python -m device.storage [mode ...]
+    modes = sys.argv[1:] or ["write-through", "journal", "device-export", "deferred"]
+    for mode in modes:
+        with SimulatedDrive() as drive:
+            run_flows(drive, mode)
+            print(drive.format_report())
+            print()
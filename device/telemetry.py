@@ -0,0 +1,103 @@
+"""
+Keypresses reported by the pad, for showing them live on the keypad.
+
+The pad sends a KEY_EVENT frame (see device.protocol) whenever a key goes
+down or up. KeyTelemetry keeps the most recent ones in a fixed-size ring
+buffer, so a pad sending faster than the UI draws costs a bounded amount of
+memory and the oldest events are simply overwritten.
+
+The UI is not told about every event: the listener is called once when the
+buffer goes from drained to holding new events, and drain() hands over
+everything received since, so the redraw rate is set by the reader.
+"""
+import collections
+import threading
+import time
+
+from device.protocol import ProtocolError, decode_key_event, MSG_KEY_EVENT
+
+
+class KeyEvent:
+    """One key going down or up on the pad"""
+
+    __slots__ = ("profile_id", "key_id", "pressed", "uptime_ms", "received")
+
+    def __init__(self, profile_id, key_id, pressed, uptime_ms=0, received=None):
+        self.profile_id = profile_id
+        self.key_id = key_id
+        self.pressed = pressed
+        self.uptime_ms = uptime_ms
+        self.received = time.monotonic() if received is None else received
+
+    def __repr__(self):
+        return f"KeyEvent({self.profile_id}/{self.key_id} {'down' if self.pressed else 'up'} at {self.uptime_ms} ms)"
+
+
+class KeyTelemetry:
+    """
+    Ring buffer of the pad's key events.
+
+    Args:
+        capacity: Events kept; older ones are overwritten
+        on_pending: Optional callback() run on the receiving thread when
+            events arrive and the previous ones have been drained
+    """
+
+    def __init__(self, capacity=1024, on_pending=None):
+        self.on_pending = on_pending
+        self.received = 0
+        self.overwritten = 0
+        self.decode_errors = 0
+        self._events = collections.deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self._notified = False
+        self._client = None
+
+    def attach(self, client):
+        """Receive the KEY_EVENT frames arriving on a ProtocolClient"""
+        self.detach()
+        self._client = client
+        client.add_handler(MSG_KEY_EVENT, self.on_frame)
+
+    def detach(self):
+        if self._client is not None:
+            self._client.remove_handler(MSG_KEY_EVENT, self.on_frame)
+            self._client = None
+
+    def on_frame(self, frame):
+        try:
+            profile_id, key_id, pressed, uptime_ms = decode_key_event(frame.payload)
+        except ProtocolError:
+            self.decode_errors += 1
+            return
+        self.add(KeyEvent(profile_id, key_id, pressed, uptime_ms))
+
+    def add(self, event):
+        with self._lock:
+            if len(self._events) == self._events.maxlen:
+                self.overwritten += 1
+            self._events.append(event)
+            self.received += 1
+            notify = not self._notified
+            self._notified = True
+        if notify and self.on_pending:
+            try:
+                self.on_pending()
+            except Exception as e:
+                print(f"Error reporting key events: {e}")
+
+    def drain(self):
+        """Return and forget the buffered events, oldest first"""
+        with self._lock:
+            events = list(self._events)
+            self._events.clear()
+            self._notified = False
+        return events
+
+    def stats(self):
+        return {
+            "received": self.received,
+            "overwritten": self.overwritten,
+            "decode_errors": self.decode_errors,
+            "buffered": len(self._events)
+        }
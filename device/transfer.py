@@ -0,0 +1,222 @@
+"""
+Send a whole keysfile to the pad over the serial link.
+
+For pads whose CIRCUITPY drive is disabled (storage.disable_usb_drive() in
+boot.py), the serial port is the only way in. The file is zlib-compressed
+and split into chunks of chunk_size bytes, each carrying its own CRC-32 on
+top of the frame CRC. Up to window chunks are in flight before the first
+ACK is needed, so the link's round trip is paid once per window rather
+than once per chunk.
+
+The transfer id is derived from the file's SHA-256 and the pad keeps the
+chunks it received, so sending the same file again after a disconnect
+resumes at the first chunk the pad is missing.
+
+    python -m device.transfer --emulator [keysfile.json]
+    python -m device.transfer --port /dev/ttyACM0 keysfile.json
+"""
+import collections
+import hashlib
+import json
+import struct
+import sys
+import time
+import zlib
+
+from device.protocol import (
+    ProtocolError, encode_transfer_begin, encode_transfer_chunk, TRANSFER_ACK, MAX_CHUNK,
+    MSG_TRANSFER_BEGIN, MSG_TRANSFER_CHUNK, MSG_TRANSFER_END
+)
+
+
+class TransferResult:
+    """Outcome of one send: sizes, timing and the config_hash the pad reported"""
+
+    __slots__ = ("size", "compressed_size", "chunks", "resumed_from", "seconds", "retransmits", "config_hash")
+
+    def __init__(self, size, compressed_size, chunks, resumed_from, seconds, retransmits, config_hash):
+        self.size = size
+        self.compressed_size = compressed_size
+        self.chunks = chunks
+        self.resumed_from = resumed_from
+        self.seconds = seconds
+        self.retransmits = retransmits
+        self.config_hash = config_hash
+
+    @property
+    def ratio(self):
+        """Uncompressed size / compressed size"""
+        return self.size / self.compressed_size if self.compressed_size else 0.0
+
+    @property
+    def kb_per_s(self):
+        """Keysfile KB delivered per second"""
+        return self.size / 1024 / self.seconds if self.seconds else 0.0
+
+    def to_dict(self):
+        return {
+            "size": self.size,
+            "compressed_size": self.compressed_size,
+            "ratio": round(self.ratio, 2),
+            "chunks": self.chunks,
+            "resumed_from": self.resumed_from,
+            "seconds": round(self.seconds, 4),
+            "kb_per_s": round(self.kb_per_s, 1),
+            "retransmits": self.retransmits,
+            "config_hash": self.config_hash.hex()
+        }
+
+    def __repr__(self):
+        return (f"TransferResult({self.size} bytes as {self.compressed_size} ({self.ratio:.1f}x), "
+                f"{self.chunks} chunks from {self.resumed_from}, {self.kb_per_s:.1f} KB/s)")
+
+
+class ConfigTransfer:
+    """
+    One keysfile prepared for sending.
+
+    Args:
+        raw: The keysfile bytes
+        chunk_size: Compressed bytes per chunk
+        window: Chunks sent before waiting for the oldest ACK
+        level: zlib compression level
+    """
+
+    def __init__(self, raw, chunk_size=1024, window=8, level=9):
+        if not 1 <= chunk_size <= MAX_CHUNK:
+            raise ValueError(f"Chunk size must be between 1 and {MAX_CHUNK}")
+        self.raw = bytes(raw)
+        self.compressed = zlib.compress(self.raw, level)
+        self.digest = hashlib.sha256(self.raw).digest()
+        self.transfer_id = struct.unpack("<I", self.digest[:4])[0]
+        self.chunk_size = chunk_size
+        self.window = max(1, window)
+        self.chunk_count = max(1, -(-len(self.compressed) // chunk_size))
+
+    @classmethod
+    def from_path(cls, path, **kwargs):
+        with open(path, 'rb') as f:
+            return cls(f.read(), **kwargs)
+
+    def chunk(self, index):
+        return self.compressed[index * self.chunk_size:(index + 1) * self.chunk_size]
+
+    def send(self, client, on_progress=None):
+        """
+        Send the file, resuming where the pad's copy of this transfer stopped.
+
+        Args:
+            client: ProtocolClient of the pad
+            on_progress: Optional callback(chunks acknowledged, chunk count)
+
+        Returns:
+            TransferResult
+
+        Raises:
+            ProtocolError when the pad rejects the file or stops answering;
+            calling send() again resumes
+        """
+        start = time.perf_counter()
+        retransmits = client.retransmits
+        reply = client.request(MSG_TRANSFER_BEGIN, encode_transfer_begin(
+            self.transfer_id, len(self.raw), len(self.compressed), self.chunk_size, self.chunk_count, self.digest))
+        resumed_from = TRANSFER_ACK.unpack_from(reply.payload)[0]
+
+        next_index = resumed_from
+        in_flight = collections.deque()
+        try:
+            while next_index < self.chunk_count or in_flight:
+                while next_index < self.chunk_count and len(in_flight) < self.window:
+                    payload = encode_transfer_chunk(self.transfer_id, next_index, self.chunk(next_index))
+                    in_flight.append((next_index, client.send_request(MSG_TRANSFER_CHUNK, payload)))
+                    next_index += 1
+                index, pending = in_flight.popleft()
+                client.wait_reply(pending)
+                if on_progress:
+                    on_progress(index + 1, self.chunk_count)
+        finally:
+            for _, pending in in_flight:
+                client.cancel(pending)
+
+        config_hash = client.request(MSG_TRANSFER_END, TRANSFER_ACK.pack(self.transfer_id)).payload
+        return TransferResult(len(self.raw), len(self.compressed), self.chunk_count - resumed_from, resumed_from,
+                              time.perf_counter() - start, client.retransmits - retransmits, bytes(config_hash))
+
+
+def send_keysfile(client, path=None, on_progress=None, **kwargs):
+    """Send the app's keysfile (default get_json_path(), saved first) over client"""
+    from engine import get_json_path, profile_store
+    profile_store.flush()
+    return ConfigTransfer.from_path(path or get_json_path(), **kwargs).send(client, on_progress)
+
+
+def sample_keysfile(profile_count=32):
+    """A keysfile with every key of profile_count profiles set, some as text macros"""
+    from utils.layout import Layout
+    layout = Layout(3, 3, profile_count)
+    data = layout.empty_data()
+    for profile_id in data["profiles"]:
+        for key_id in layout.key_ids():
+            if key_id == "9":
+                entry = {"name": "Signature", "key": ["text_input"], "text_type": "paragraph",
+                         "text_content": f"Regards,\nProfile {profile_id}\n" * 8}
+            else:
+                entry = {"name": f"Macro {profile_id}.{key_id}", "key": ["ctrl", "alt", "f" + key_id]}
+            data["profiles"][profile_id][key_id] = entry
+    return json.dumps(data, indent=2).encode("utf-8")
+
+
+def main(argv=None):
+    import argparse
+    from device.aio import connection_class, device_loop
+    from device.client import ProtocolClient
+
+    parser = argparse.ArgumentParser(prog="python -m device.transfer", description="Send a keysfile to a MacroPad over serial")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--port", help="serial port of the pad")
+    target.add_argument("--emulator", action="store_true", help="send to a local emulator (device.emulator)")
+    parser.add_argument("keysfile", nargs="?", help="file to send (default: a generated 32-profile keysfile)")
+    parser.add_argument("--chunk-size", type=int, default=1024, help="compressed bytes per chunk")
+    parser.add_argument("--window", type=int, default=8, help="chunks in flight before waiting for an ACK")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.keysfile:
+            transfer = ConfigTransfer.from_path(args.keysfile, chunk_size=args.chunk_size, window=args.window)
+        else:
+            transfer = ConfigTransfer(sample_keysfile(), chunk_size=args.chunk_size, window=args.window)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        return 1
+
+    emulator = None
+    if args.emulator:
+        from device.emulator import PadEmulator
+        emulator = PadEmulator().start()
+    port = emulator.port if emulator else args.port
+
+    connection = connection_class()(port)
+    connection.start()
+    client = ProtocolClient(connection)
+    try:
+        if not connection.wait_connected(5):
+            print(f"Error: could not open {port}")
+            return 1
+        client.start()
+        result = transfer.send(client).to_dict()
+        result["port"] = port
+        print(json.dumps(result, indent=2))
+        return 0
+    except ProtocolError as e:
+        print(f"Error: {e}")
+        return 1
+    finally:
+        client.stop()
+        connection.close()
+        device_loop.stop()
+        if emulator:
+            emulator.stop()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,50 +1,707 @@
 import json
 import os
 import sys
+import threading
 from tkinter import messagebox
 
-def get_json_path():
-    """Always use the keysfile.json from the O: drive"""
-    # Define the path to keysfile.json on the O: drive
-    o_drive_path = "O:\\keysfile.json"
-    
-    # Check if the O: drive is accessible
-    if os.path.exists("O:\\"):
-        # Create the file if it doesn't exist
-        if not os.path.exists(o_drive_path):
+from device.protocol import key_digest
+from utils.drive import DriveResolver
+from utils.layout import Layout
+
+
+class ProfileStore:
+    """
+    Process-wide in-memory cache of the parsed keysfile.json.
+
+    The file is only re-read when its size, mtime or inode change, so repeated
+    loads (profile switches, key selection, keypad refreshes) are a memory
+    lookup instead of a read from the CIRCUITPY drive. The returned data is
+    shared and must be treated as read-only; copy it before modifying.
+
+    With enable_journal() edits are appended to a KeysfileJournal instead of
+    rewriting the whole file, and the journal is compacted in the background
+    once it passes its size threshold.
+
+    With enable_device_export() the file on the device is written minified
+    and a pretty master copy is kept on the host (see utils.device_export).
+
+    With enable_text_blobs() long text macros are stored once in a
+    utils.blobs.BlobStore beside the keysfile and referenced by hash.
+
+    With enable_deferred_writes() writes only update the cached copy and the
+    file is saved once writes have stopped for the given delay, for when the
+    pad already received the change over the serial link (see device.live).
+
+    key_digests() keeps a canonical content hash of every cached key, so a
+    save that would write back what is already stored is skipped.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._path = None
+        self._signature = None
+        self._data = None
+        self.hits = 0
+        self.misses = 0
+        self.journal = None
+        self._compact_thread = None
+        self.device_export = False
+        self.master_path = None
+        self.text_blob_threshold = None
+        self._blob_stores = {}
+        self._model_source = None
+        self._model = {}
+        self._model_profiles = {}
+        self.write_delay = None
+        self.deferred = 0
+        self._dirty_path = None
+        self._dirty_data = None
+        self._write_timer = None
+        self._hash_tree = None
+        self.writes_skipped = 0
+
+    def _signature_for(self, path):
+        """Return the stat tuple(s) used to detect file changes"""
+        st = os.stat(path)
+        signature = (st.st_size, st.st_mtime_ns, st.st_ino)
+        if self.journal:
+            return (signature, self.journal.signature(path))
+        return signature
+
+    def read(self, path):
+        """Return the parsed JSON at path, re-reading only if the file changed"""
+        with self._lock:
+            if path == self._dirty_path:
+                # Not saved yet: the pending data is the content of path
+                self.hits += 1
+                return self._dirty_data
+            signature = self._signature_for(path)
+            if self._data is not None and path == self._path and signature == self._signature:
+                self.hits += 1
+                return self._data
+
+            self.misses += 1
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if self.journal:
+                self.journal.replay(path, data)
+            self._path = path
+            self._signature = signature
+            self._data = data
+            return data
+
+    def read_bindings(self, path):
+        """
+        Return the profiles at path as utils.bindings.Profile objects.
+
+        The model is rebuilt only for profiles whose dict changed since the
+        last call, so it stays in step with the cache at little cost.
+        """
+        from utils.bindings import parse_profiles
+        with self._lock:
+            data = self.read(path)
+            if data is self._model_source:
+                return self._model
+
+            profiles = data.get("profiles", {})
+            stale = {profile_id: profile for profile_id, profile in profiles.items()
+                     if self._model_profiles.get(profile_id) is not profile}
+            parsed, errors = parse_profiles(stale)
+            for error in errors:
+                print(f"Invalid binding: {error}")
+
+            model = {}
+            for profile_id in profiles:
+                model[profile_id] = parsed[profile_id] if profile_id in parsed else self._model.get(profile_id)
+            # Profiles that failed validation entirely are left out
+            self._model = {p: profile for p, profile in model.items() if profile is not None}
+            self._model_profiles = dict(profiles)
+            self._model_source = data
+            return self._model
+
+    def write(self, path, data, changes=None):
+        """
+        Write data to path and keep it as the cached copy.
+
+        Args:
+            path: Path of keysfile.json
+            data: The complete new JSON data
+            changes: Optional list of (profile_id, key_id, entry) tuples that
+                turn the current file into data. In journal mode only these
+                are appended to the journal instead of rewriting the file.
+        """
+        with self._lock:
+            if self.write_delay is not None and os.path.exists(path):
+                self._defer(path, data)
+                return
+
+            if self._dirty_path == path:
+                self._cancel_deferred()
+                self._dirty_path = None
+                self._dirty_data = None
+            _notify_save(path, False)
             try:
-                # Create a default empty structure
-                default_data = {"profiles": {}}
-                for i in range(6):  # 6 profiles (0-5)
-                    default_data["profiles"][str(i)] = {}
-                    for j in range(1, 10):  # 9 keys (1-9)
-                        default_data["profiles"][str(i)][str(j)] = {}
-                
-                # Create directory if it doesn't exist
-                os.makedirs(os.path.dirname(o_drive_path), exist_ok=True)
-                
-                # Write default JSON
-                with open(o_drive_path, 'w', encoding='utf-8') as f:
-                    json.dump(default_data, f, indent=2)
+                if self.journal and changes is not None:
+                    self.journal.append(path, changes)
+                else:
+                    self._dump(path, data)
+                    if self.journal:
+                        # The snapshot now holds everything the journal did
+                        self.journal.clear(path)
+            finally:
+                _notify_save(path, True)
+            self._path = path
+            self._signature = self._signature_for(path)
+            self._data = data
+
+        if self.journal and self.journal.needs_compaction(path):
+            self._compact_in_background(path)
+
+    def _defer(self, path, data):
+        """Park data as the pending content of path and (re)start the write timer"""
+        if self._dirty_path and self._dirty_path != path:
+            try:
+                self.flush(self._dirty_path)
             except Exception as e:
-                print(f"Error creating default keysfile.json: {e}")
-        return o_drive_path
-    else:
-        # O: drive isn't available, show an error message
-        print("O: drive not accessible. Please make sure the drive is connected.")
+                # Only one write can be pending; the other file is out of reach
+                print(f"Error saving pending write to {self._dirty_path}, dropping it: {e}")
+                self._dirty_path = None
+                self._dirty_data = None
+        self._dirty_path = path
+        self._dirty_data = data
+        self.deferred += 1
+
+        self._cancel_deferred()
+        self._write_timer = threading.Timer(self.write_delay, self._write_deferred)
+        self._write_timer.daemon = True
+        self._write_timer.start()
+
+    def _cancel_deferred(self):
+        if self._write_timer is not None:
+            self._write_timer.cancel()
+            self._write_timer = None
+
+    def _write_deferred(self):
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"Error saving deferred keysfile write: {e}")
+
+    def _dump(self, path, data):
+        """Write a full snapshot of data to path in the configured format"""
+        if self.device_export:
+            from utils import device_export
+            device_export.export(data, path, self.master_path)
+        else:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2)
+
+    def key_digests(self, data, profile_id):
+        """
+        Canonical content hashes {key id: digest} of one profile of data,
+        the cached copy returned by read().
+
+        Only profiles whose cached dict changed since the last call are
+        rehashed (see device.merkle.HashTree).
+        """
+        from device.merkle import HashTree
+        with self._lock:
+            if self._hash_tree is None:
+                self._hash_tree = HashTree()
+            return self._hash_tree.update(data.get("profiles", {})).keys(profile_id)
+
+    def enable_text_blobs(self, threshold=256):
+        """Store text payloads of threshold bytes or more in a BlobStore"""
+        with self._lock:
+            self.text_blob_threshold = threshold
+            self._blob_stores = {}
+
+    def disable_text_blobs(self):
+        """Store new text payloads inline again (existing references still resolve)"""
+        with self._lock:
+            self.text_blob_threshold = None
+            self._blob_stores = {}
+
+    def blob_store(self, path):
+        """Return the BlobStore kept in a textblobs folder beside path"""
+        from utils.blobs import BlobStore
+        with self._lock:
+            if path not in self._blob_stores:
+                directory = os.path.join(os.path.dirname(path), "textblobs")
+                self._blob_stores[path] = BlobStore(directory, self.text_blob_threshold or 0)
+            return self._blob_stores[path]
+
+    def enable_device_export(self, master_path=None):
+        """Write the device copy minified and keep a pretty copy at master_path"""
+        with self._lock:
+            self.device_export = True
+            self.master_path = master_path or get_master_path()
+
+    def disable_device_export(self):
+        with self._lock:
+            self.device_export = False
+
+    def enable_deferred_writes(self, delay=5.0):
+        """Save the file delay seconds after the last write instead of on every write"""
+        with self._lock:
+            self.write_delay = delay
+
+    def disable_deferred_writes(self):
+        """Save any pending write now and write through again"""
+        with self._lock:
+            self.write_delay = None
+            self.flush()
+
+    def pending_write(self):
+        """Path of the keysfile with a deferred write not yet saved, or None"""
+        with self._lock:
+            return self._dirty_path
+
+    def enable_journal(self, compact_threshold=16 * 1024):
+        """Switch to journal mode, see utils.journal.KeysfileJournal"""
+        from utils.journal import KeysfileJournal
+        with self._lock:
+            self.journal = KeysfileJournal(compact_threshold)
+            self.invalidate()
+
+    def disable_journal(self):
+        """Fold any pending journal into the snapshot and leave journal mode"""
+        self.flush()
+        with self._lock:
+            self.journal = None
+            self.invalidate()
+
+    def flush(self, path=None):
+        """Save a deferred write and compact the journal so the device-visible file is up to date"""
+        with self._lock:
+            if self._dirty_path and (path is None or path == self._dirty_path):
+                # On failure the write stays pending and the error goes to the caller
+                dirty_path, data = self._dirty_path, self._dirty_data
+                self._cancel_deferred()
+                _notify_save(dirty_path, False)
+                try:
+                    self._dump(dirty_path, data)
+                    if self.journal:
+                        self.journal.clear(dirty_path)
+                finally:
+                    _notify_save(dirty_path, True)
+                self._dirty_path = None
+                self._dirty_data = None
+                self._path = dirty_path
+                self._signature = self._signature_for(dirty_path)
+                self._data = data
+
+            path = path or self._path
+            if not self.journal or not path or not self.journal.size(path):
+                return
+            data = self.read(path)
+            _notify_save(path, False)
+            try:
+                self.journal.compact(path, data, self._dump)
+            finally:
+                _notify_save(path, True)
+            self._signature = self._signature_for(path)
+
+    def _compact_in_background(self, path):
+        """Run _compact() on a worker thread unless one is already running"""
+        if self._compact_thread and self._compact_thread.is_alive():
+            return
+
+        def compact():
+            try:
+                self._compact(path)
+            except Exception as e:
+                print(f"Error compacting keysfile journal: {e}")
+
+        self._compact_thread = threading.Thread(target=compact, daemon=True)
+        self._compact_thread.start()
+
+    def _compact(self, path):
+        """
+        Compact the journal of path while reads and writes go on.
+
+        The snapshot is written without holding the lock (the cached data is
+        never modified in place); only swapping it in and trimming the
+        records it holds happen under the lock. If the file was rewritten in
+        the meantime the snapshot is thrown away.
+        """
+        with self._lock:
+            size = self.journal.size(path) if self.journal else 0
+            if not size:
+                return
+            data = self.read(path)
+            journal = self.journal
+            st = os.stat(path)
+            snapshot = (st.st_size, st.st_mtime_ns, st.st_ino)
+
+        _notify_save(path, False)
         try:
-            messagebox.showerror("Drive Error", 
-                                "O: drive not accessible.\nPlease make sure the drive is connected.")
-        except:
+            tmp_path = journal.write_snapshot(path, data, self._dump)
+            with self._lock:
+                st = os.stat(path)
+                if (journal is not self.journal or journal.size(path) < size
+                        or (st.st_size, st.st_mtime_ns, st.st_ino) != snapshot):
+                    os.remove(tmp_path)
+                    return
+                journal.install(path, tmp_path, size)
+                if self._path == path:
+                    self._signature = self._signature_for(path)
+        finally:
+            _notify_save(path, True)
+
+    def invalidate(self):
+        """Drop the cached copy so the next read goes to disk"""
+        with self._lock:
+            # A pending deferred write is kept, it only exists in memory
+            self._path = None
+            self._signature = None
+            self._data = None
+
+    def stats(self):
+        """Return the cache hit/miss counters"""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "deferred": self.deferred,
+                    "skipped": self.writes_skipped}
+
+
+# Shared store used by load_profiles and update_profile_key
+profile_store = ProfileStore()
+
+# Cached CIRCUITPY drive lookup; see utils.drive.DriveResolver. MACROPAD_DRIVE
+# points it at another directory, e.g. the device emulator's
+drive_resolver = DriveResolver(override=os.environ.get("MACROPAD_DRIVE"))
+
+# Keysfile paths already checked for existence, and whether the missing
+# drive warning was shown since the drive was last seen
+_checked_keysfiles = set()
+_drive_warning_shown = False
+
+def _on_drive_changed(path):
+    """Reset per-drive state when the drive appears or goes away"""
+    global _drive_warning_shown
+    _checked_keysfiles.clear()
+    if path:
+        _drive_warning_shown = False
+
+drive_resolver.add_listener(_on_drive_changed)
+
+# Callbacks told about every applied key change, see add_change_listener
+_change_listeners = []
+
+def add_change_listener(callback):
+    """Call callback(changes) with the (profile_id, key_id, entry) tuples of each applied batch"""
+    if callback not in _change_listeners:
+        _change_listeners.append(callback)
+
+def remove_change_listener(callback):
+    if callback in _change_listeners:
+        _change_listeners.remove(callback)
+
+def _notify_changes(changes):
+    for callback in list(_change_listeners):
+        try:
+            callback(changes)
+        except Exception as e:
+            print(f"Error in keysfile change listener: {e}")
+
+# Callbacks told before and after every write of a keysfile to disk
+_save_listeners = []
+
+def add_save_listener(callback):
+    """
+    Call callback(path, finished) with finished False just before the store
+    writes path and True once it is done (or failed). Called with the store
+    lock often held, so callbacks must only record the event and return.
+    """
+    if callback not in _save_listeners:
+        _save_listeners.append(callback)
+
+def remove_save_listener(callback):
+    if callback in _save_listeners:
+        _save_listeners.remove(callback)
+
+def _notify_save(path, finished):
+    for callback in list(_save_listeners):
+        try:
+            callback(path, finished)
+        except Exception as e:
+            print(f"Error in keysfile save listener: {e}")
+
+# Callbacks that show warnings to the user, see add_warning_listener
+_warning_listeners = []
+
+def add_warning_listener(callback):
+    """
+    Call callback(title, message) for warnings meant for the user. It may be
+    called from any thread, so a GUI must hand the warning to its own thread.
+    """
+    if callback not in _warning_listeners:
+        _warning_listeners.append(callback)
+
+def remove_warning_listener(callback):
+    if callback in _warning_listeners:
+        _warning_listeners.remove(callback)
+
+def _warn(title, message):
+    listeners = list(_warning_listeners)
+    if not listeners and threading.current_thread() is threading.main_thread():
+        # No GUI registered: show it directly, Tk is only safe on this thread
+        try:
+            messagebox.showerror(title, message)
+        except Exception:
             # If running without GUI
             pass
+    for callback in listeners:
+        try:
+            callback(title, message)
+        except Exception as e:
+            print(f"Error in warning listener: {e}")
+
+def get_json_path():
+    """Use the keysfile.json on the CIRCUITPY drive, or a local copy when it is missing"""
+    global _drive_warning_shown
+    drive_path = drive_resolver.path
+    
+    # Check if the drive is accessible
+    if drive_path:
+        keysfile_path = os.path.join(drive_path, "keysfile.json")
+        # Create the file if it doesn't exist (checked once per drive mount)
+        if keysfile_path not in _checked_keysfiles:
+            _checked_keysfiles.add(keysfile_path)
+            if not os.path.exists(keysfile_path):
+                try:
+                    # Create a default empty structure (3x3 keys, 6 profiles);
+                    # key entries are only added once they are configured
+                    default_data = Layout().empty_data()
+                    
+                    # Write default JSON
+                    profile_store.write(keysfile_path, default_data)
+                except Exception as e:
+                    print(f"Error creating default keysfile.json: {e}")
+        return keysfile_path
+    else:
+        # Drive isn't available, show an error message once until it comes back
+        if not _drive_warning_shown:
+            _drive_warning_shown = True
+            print(f"{drive_resolver.label} drive not accessible. Please make sure the drive is connected.")
+            # Saves and pad syncs call this from worker threads; the listener shows it on the Tk thread
+            _warn("Drive Error", f"{drive_resolver.label} drive not accessible.\nPlease make sure the drive is connected.")
             
         # Return a path to a local copy as fallback
-        if getattr(sys, 'frozen', False):
-            base_dir = os.path.dirname(sys.executable)
+        return os.path.join(get_app_dir(), "keysfile.json")
+
+def get_app_dir():
+    """Directory of the executable (frozen) or of this source file"""
+    if getattr(sys, 'frozen', False):
+        return os.path.dirname(sys.executable)
+    return os.path.dirname(os.path.abspath(__file__))
+
+def get_master_path():
+    """Path of the human-readable host master copy of keysfile.json"""
+    return os.path.join(get_app_dir(), "keysfile.master.json")
+
+def _env_flag(environ, name):
+    return environ.get(name, "") not in ("", "0")
+
+def configure_from_environment(environ=None):
+    """
+    Turn on the opt-in storage modes of profile_store named in the environment.
+
+    MACROPAD_JOURNAL=1 appends edits to a journal beside keysfile.json
+    instead of rewriting it (see ProfileStore.enable_journal).
+    MACROPAD_DEVICE_EXPORT=1 writes the device copy minified and keeps a
+    pretty master copy on the host (see ProfileStore.enable_device_export).
+    MACROPAD_TEXT_BLOBS=1 stores long text macros once in a textblobs folder
+    beside keysfile.json; a number instead of 1 sets the size in bytes from
+    which a text is moved out (see ProfileStore.enable_text_blobs).
+    """
+    environ = os.environ if environ is None else environ
+    if _env_flag(environ, "MACROPAD_JOURNAL"):
+        profile_store.enable_journal()
+    if _env_flag(environ, "MACROPAD_DEVICE_EXPORT"):
+        profile_store.enable_device_export()
+    if _env_flag(environ, "MACROPAD_TEXT_BLOBS"):
+        threshold = environ["MACROPAD_TEXT_BLOBS"]
+        if threshold == "1":
+            profile_store.enable_text_blobs()
+        elif threshold.isdigit():
+            profile_store.enable_text_blobs(int(threshold))
         else:
-            base_dir = os.path.dirname(__file__)
-        return os.path.join(base_dir, "keysfile.json")
+            print(f"Ignoring MACROPAD_TEXT_BLOBS={threshold}: expected 1 or a size in bytes")
+
+def _build_key_entry(old_entry, new_keys, name=None, extra_data=None):
+    """
+    Build the new dict for a key from its previous entry and an update.
+
+    Only the basic fields of the previous configuration are kept, the rest is
+    reset before extra_data is applied. old_entry is never modified.
+    """
+    if old_entry is None:
+        # Create new key entry if it doesn't exist
+        entry = {"name": name or "Custom Shortcut", "key": []}
+    else:
+        # If key exists, keep only the basic fields to reset previous configuration
+        entry = {
+            "name": old_entry.get("name", "Custom Shortcut"),
+            "key": old_entry.get("key", [])
+        }
+
+    # Update the key combination
+    entry["key"] = new_keys
+
+    # Update the name if provided
+    if name:
+        entry["name"] = name
+
+    # Add any extra data fields
+    if extra_data:
+        for key, value in extra_data.items():
+            if value is None:
+                # If value is None, remove this field if it exists
+                entry.pop(key, None)
+            else:
+                # Otherwise set or update the field
+                entry[key] = value
+
+    return entry
+
+
+class BatchResult:
+    """Outcome of a ProfileBatch; truthy when the batch was applied (written or nothing to write)"""
+
+    def __init__(self, success, changed=None, error=None):
+        self.success = success
+        self.changed = changed or []  # (profile, key) pairs whose entry changed
+        self.error = error
+
+    def __bool__(self):
+        return self.success
+
+    @property
+    def unchanged(self):
+        """True when every staged key already held its new entry and nothing was written"""
+        return self.success and not self.changed
+
+    def __repr__(self):
+        return f"BatchResult(success={self.success}, changed={self.changed}, error={self.error!r})"
+
+
+class ProfileBatch:
+    """
+    Stage many key updates and apply them with one read and one write.
+
+    Usage:
+        with ProfileBatch() as batch:
+            batch.set_key("0", "1", ["ctrl", "c"], "Copy")
+            batch.set_key("1", "1", ["ctrl", "v"], "Paste")
+        print(batch.result.changed)
+
+    The batch is applied when the with block exits without an exception. It is
+    all-or-nothing: if any staged profile is neither in the file nor in its
+    layout nothing is written. When every staged entry hashes the same as
+    the stored one the file is not written at all (result.unchanged).
+    """
+
+    def __init__(self, keysfile_path=None):
+        self.keysfile_path = keysfile_path
+        self._updates = []
+        self.result = None
+
+    def set_key(self, profile_index, key_index, new_keys, name=None, extra_data=None):
+        """Stage an update, same arguments as update_profile_key"""
+        self._updates.append((str(profile_index), str(key_index), new_keys, name, extra_data))
+
+    def __len__(self):
+        return len(self._updates)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.apply()
+        return False
+
+    def apply(self):
+        """Apply all staged updates and return a BatchResult"""
+        keysfile_path = self.keysfile_path or get_json_path()
+        try:
+            with profile_store._lock:
+                cached = profile_store.read(keysfile_path)
+
+                # Copy only the containers we touch, the cached dict is shared
+                data = dict(cached)
+                data["profiles"] = dict(cached["profiles"])
+                copied = set()
+                touched = []
+                changed = []
+                journal_changes = []
+                blobs_touched = False
+
+                layout = Layout.from_dict(cached)
+                for profile_str, key_str, new_keys, name, extra_data in self._updates:
+                    if profile_str not in data["profiles"] and not layout.has_profile(profile_str):
+                        print(f"Profile {profile_str} not found")
+                        self.result = BatchResult(False, error=f"Profile {profile_str} not found")
+                        return self.result
+
+                    if profile_str not in copied:
+                        # Profiles in the layout are created on first use
+                        data["profiles"][profile_str] = dict(data["profiles"].get(profile_str, {}))
+                        copied.add(profile_str)
+
+                    profile = data["profiles"][profile_str]
+                    old_entry = profile.get(key_str)
+                    entry = _build_key_entry(old_entry, new_keys, name, extra_data)
+                    if profile_store.text_blob_threshold is not None:
+                        entry = profile_store.blob_store(keysfile_path).externalize(entry)
+                    profile[key_str] = entry
+                    if "text_ref" in entry or "text_ref" in (old_entry or {}):
+                        blobs_touched = True
+
+                    if (profile_str, key_str) not in touched:
+                        touched.append((profile_str, key_str))
+
+                # Compare each key's final entry with the stored one by content hash
+                for profile_str, key_str in touched:
+                    entry = data["profiles"][profile_str][key_str]
+                    if key_digest(entry) != profile_store.key_digests(cached, profile_str).get(key_str):
+                        changed.append((profile_str, key_str))
+                        journal_changes.append((profile_str, key_str, entry))
+
+                if not journal_changes:
+                    # Saving what is already stored: skip the flash write and the reload
+                    if touched:
+                        profile_store.writes_skipped += 1
+                    if blobs_touched:
+                        profile_store.blob_store(keysfile_path).gc(cached["profiles"])
+                    self._updates = []
+                    self.result = BatchResult(True)
+                    return self.result
+
+                # Save the updated JSON
+                profile_store.write(keysfile_path, data, journal_changes)
+
+                # Drop text blobs no key refers to any more
+                if blobs_touched:
+                    profile_store.blob_store(keysfile_path).gc(data["profiles"])
+
+            self._updates = []
+            self.result = BatchResult(True, changed)
+
+        except Exception as e:
+            print(f"Error updating keysfile.json: {e}")
+            self.result = BatchResult(False, error=str(e))
+            return self.result
+
+        # Outside the lock: listeners may block on the serial link
+        if journal_changes:
+            _notify_changes(journal_changes)
+        return self.result
+
+
+# Returned by update_profile_key when the key already had the new configuration
+UNCHANGED = "unchanged"
 
 def update_profile_key(profile_index, key_index, new_keys, name=None, extra_data=None):
     """
@@ -56,68 +713,105 @@ def update_profile_key(profile_index, key_index, new_keys, name=None, extra_data
         new_keys: List of key combinations (e.g., ["ctrl", "s"])
         name: Optional name for the shortcut
         extra_data: Dictionary of additional data (e.g., {"software": "notepad"})
+    
+    Returns:
+        True when the key was written, UNCHANGED (also truthy) when the key
+        already had this configuration and nothing was written, False on error
     """
+    batch = ProfileBatch()
+    batch.set_key(profile_index, key_index, new_keys, name, extra_data)
+    result = batch.apply()
+    if not result:
+        return False
+    if result.unchanged:
+        return UNCHANGED
+
+    print(f"Updated key {key_index} in profile {profile_index}")
+    return True
+
+def load_profiles():
+    """Load all profiles from keysfile.json (served from profile_store when unchanged)"""
     keysfile_path = get_json_path()
     try:
-        # Load the current JSON data
-        with open(keysfile_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        profile_str = str(profile_index)  # Convert to string if it's an int
-        key_str = str(key_index)  # Convert to string if it's an int
-        
-        # Check if profile exists
-        if profile_str not in data["profiles"]:
-            print(f"Profile {profile_str} not found")
-            return False
-            
-        # Check if key exists in profile
-        if key_str not in data["profiles"][profile_str]:
-            # Create new key entry if it doesn't exist
-            data["profiles"][profile_str][key_str] = {"name": name or "Custom Shortcut", "key": []}
-        else:
-            # If key exists, keep only the basic fields to reset previous configuration
-            data["profiles"][profile_str][key_str] = {
-                "name": data["profiles"][profile_str][key_str].get("name", "Custom Shortcut"),
-                "key": data["profiles"][profile_str][key_str].get("key", [])
-            }
-        
-        # Update the key combination
-        data["profiles"][profile_str][key_str]["key"] = new_keys
-        
-        # Update the name if provided
-        if name:
-            data["profiles"][profile_str][key_str]["name"] = name
-            
-        # Add any extra data fields
-        if extra_data:
-            for key, value in extra_data.items():
-                if value is None:
-                    # If value is None, remove this field if it exists
-                    if key in data["profiles"][profile_str][key_str]:
-                        del data["profiles"][profile_str][key_str][key]
-                else:
-                    # Otherwise set or update the field
-                    data["profiles"][profile_str][key_str][key] = value
-            
-        # Save the updated JSON
-        with open(keysfile_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2)
-            
-        print(f"Updated key {key_str} in profile {profile_str}")
+        data = profile_store.read(keysfile_path)
+        return data["profiles"]
+    except Exception as e:
+        print(f"Error loading profiles: {e}")
+        return {}
+
+def get_text_content(entry):
+    """Return the text of a text key entry, following a text_ref into the blob store"""
+    if "text_ref" in entry:
+        return profile_store.blob_store(get_json_path()).get(entry["text_ref"])
+    return entry.get("text_content", "")
+
+def get_layout():
+    """Return the Layout (key grid and profile count) described by keysfile.json"""
+    keysfile_path = get_json_path()
+    try:
+        return Layout.from_dict(profile_store.read(keysfile_path))
+    except Exception as e:
+        print(f"Error loading layout: {e}")
+        return Layout()
+
+def set_layout(layout):
+    """
+    Store a new Layout in keysfile.json
+    
+    Existing key entries are kept, even outside the new grid, so shrinking
+    the layout never loses configuration.
+
+    Returns:
+        True when saved, UNCHANGED when the file already had this layout
+        (nothing is written), False on error
+    """
+    keysfile_path = get_json_path()
+    try:
+        with profile_store._lock:
+            data = dict(profile_store.read(keysfile_path))
+            if data.get("layout") == layout.to_dict():
+                profile_store.writes_skipped += 1
+                return UNCHANGED
+            data["layout"] = layout.to_dict()
+            profile_store.write(keysfile_path, data)
+        print(f"Layout set to {layout.rows}x{layout.cols} keys, {layout.profile_count} profiles")
         return True
-        
     except Exception as e:
-        print(f"Error updating keysfile.json: {e}")
+        print(f"Error updating layout: {e}")
         return False
 
-def load_profiles():
-    """Load all profiles from keysfile.json"""
+def load_bindings():
+    """Load all profiles as typed bindings (see utils.bindings), keyed by profile id"""
     keysfile_path = get_json_path()
     try:
-        with open(keysfile_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        return data["profiles"]
+        return profile_store.read_bindings(keysfile_path)
     except Exception as e:
         print(f"Error loading profiles: {e}")
-        return {}
\ No newline at end of file
+        return {}
+
+def export_keymap(output_path=None):
+    """
+    Compile the profiles into the binary keymap (see utils.keymap) and write it
+    
+    Args:
+        output_path: Where to write the keymap; defaults to keymap.bin beside keysfile.json
+    
+    Returns:
+        True on success, False if a binding could not be compiled or written
+    """
+    from utils.keymap import compile_keymap, KeymapError
+    
+    if output_path is None:
+        output_path = os.path.join(os.path.dirname(get_json_path()), "keymap.bin")
+    try:
+        blob = compile_keymap(load_profiles(), get_text_content)
+        with open(output_path, 'wb') as f:
+            f.write(blob)
+        print(f"Wrote {len(blob)} byte keymap to {output_path}")
+        return True
+    except KeymapError as e:
+        print(f"Error compiling keymap: {e}")
+        return False
+    except Exception as e:
+        print(f"Error writing keymap: {e}")
+        return False
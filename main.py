@@ -1,4 +1,5 @@
 import tkinter as tk
+from tkinter import messagebox
 
 # Define COLORS globally to avoid circular import
 COLORS = {
@@ -18,7 +19,10 @@ from components.profiles_section import ProfilesSection
 from components.keypad_section import KeypadSection
 from components.config_panel_simplified import ConfigPanel
 from components.status_bar import StatusBar
-from engine import load_profiles
+from components.provision_dialog import ProvisionDialog
+from engine import load_profiles, profile_store, get_json_path, drive_resolver, add_warning_listener, remove_warning_listener, configure_from_environment, export_keymap
+from device.aio import device_loop, TkBridge
+from utils.watcher import KeysfileWatcher
 
 class MacroPadConfigurator:
     def __init__(self, root):
@@ -31,6 +35,11 @@ class MacroPadConfigurator:
         self.selected_profile = "0"  # Default profile
         self.selected_key = None
         
+        # Delivers results from the device loop and watcher threads to Tk in batches
+        self.bridge = TkBridge(self.root)
+        # engine warnings can come from any thread; show them on this one
+        add_warning_listener(self.show_warning)
+        
         # Create UI layout
         self.create_ui()
         
@@ -52,14 +61,74 @@ class MacroPadConfigurator:
 
         # Status Bar
         self.status_bar = StatusBar(self.root, self)
+
+        # Devices menu
+        menubar = tk.Menu(self.root)
+        devices_menu = tk.Menu(menubar, tearoff=0)
+        devices_menu.add_command(label="Provision Pads...", command=self.open_provision_dialog)
+        devices_menu.add_command(label="Sync Pad Keymap", command=lambda: self.status_bar.loop.run_blocking(self.status_bar.sync_pad, True))
+        devices_menu.add_command(label="Send Config Over Serial", command=self.status_bar.send_config)
+        devices_menu.add_command(label="Export Binary Keymap", command=self.export_keymap)
+        menubar.add_cascade(label="Devices", menu=devices_menu)
+        self.root.config(menu=menubar)
+
+        # Pick up edits made to keysfile.json outside this app
+        self.keysfile_watcher = KeysfileWatcher(
+            get_json_path(),
+            lambda changed: self.bridge.post(self.refresh_keypad, changed)
+        )
+        self.keysfile_watcher.start()
+        drive_resolver.add_listener(self.on_drive_changed)
     
+    def show_warning(self, title, message):
+        """engine warning listener, any thread."""
+        self.bridge.post(messagebox.showerror, title, message)
+
+    def on_drive_changed(self, path):
+        """Drive listener, runs on the resolver thread; get_json_path() may show a dialog, so hand over to Tk"""
+        self.bridge.post_latest("drive", self.follow_keysfile)
+
+    def follow_keysfile(self):
+        """Watch the keysfile of the drive now in use."""
+        self.keysfile_watcher.set_path(get_json_path())
+
     def on_close(self):
         """Handle window close event.""" 
         # Stop status bar thread
         self.status_bar.stop()
+        # Stop watching keysfile.json
+        drive_resolver.remove_listener(self.on_drive_changed)
+        remove_warning_listener(self.show_warning)
+        self.keysfile_watcher.stop()
+        # Let queued saves finish, then stop the device I/O loop
+        device_loop.stop()
+        # Fold any journaled edits into keysfile.json so the device sees them
+        try:
+            profile_store.flush()
+        except Exception as e:
+            print(f"Error saving keysfile.json on exit: {e}")
         # Close the window
         self.root.destroy()
         
+    def open_provision_dialog(self):
+        """Open the window that copies a keysfile to every attached pad."""
+        ProvisionDialog(self.root, self)
+        
+    def export_keymap(self):
+        """Write keymap.bin beside keysfile.json on the file I/O worker."""
+        self.status_bar.update_status("Exporting keymap...")
+        future = device_loop.run_file_io(export_keymap)
+
+        def done(future):
+            try:
+                success = future.result()
+            except Exception as e:
+                print(f"Error exporting keymap: {e}")
+                success = False
+            message = "Keymap written to keymap.bin" if success else "Keymap export failed, see the console for details"
+            self.bridge.post(self.status_bar.update_status, message)
+        future.add_done_callback(done)
+
     def set_selected_profile(self, profile_index):
         """Set the currently selected profile."""
         self.selected_profile = profile_index
@@ -75,12 +144,21 @@ class MacroPadConfigurator:
         if hasattr(self, 'config_panel') and hasattr(self.config_panel, 'update_save_buttons'):
             self.config_panel.update_save_buttons()
         
-    def refresh_keypad(self):
-        """Refresh the keypad display based on current profile"""
+    def refresh_keypad(self, changed=None):
+        """
+        Refresh the keypad display based on current profile
+        
+        Args:
+            changed: Optional set of (profile_id, key_id) pairs that changed;
+                the keypad is only redrawn if the current profile is among them
+        """
+        if changed is not None and not any(profile_id == self.selected_profile for profile_id, _ in changed):
+            return
         if hasattr(self, 'keypad_section'):
             self.keypad_section.update_keys(self.selected_profile)
 
 if __name__ == "__main__":
+    configure_from_environment()
     root = tk.Tk()
     app = MacroPadConfigurator(root)
     root.mainloop()
\ No newline at end of file
@@ -0,0 +1,26 @@
+import os
+
+import pytest
+
+import engine
+from utils.layout import Layout
+
+
+@pytest.fixture
+def keysfile(tmp_path):
+    """A fresh keysfile.json on a drive directory the app is pointed at; the shared store starts empty"""
+    drive = tmp_path / "CIRCUITPY"
+    drive.mkdir()
+    path = str(drive / "keysfile.json")
+    engine.profile_store.write(path, Layout().empty_data())
+    previous = engine.drive_resolver.override
+    engine.drive_resolver.set_override(str(drive))
+    engine.profile_store.invalidate()
+    yield path
+    engine.drive_resolver.set_override(previous)
+    engine.profile_store.invalidate()
+
+
+def file_signature(path):
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
@@ -0,0 +1,180 @@
+"""Hotplug events from FakeBackend through HotplugMonitor to the pad registry and StatusBar.check_connection"""
+import threading
+
+import pytest
+
+import components.status_bar as status_bar
+from components.status_bar import StatusBar
+from device.hotplug import FakeBackend, HotplugMonitor
+from device.ports import build_synthetic_sysfs, enumerate_usb_serial_sysfs
+from device.registry import DeviceRegistry, PAD_USB_IDS
+
+
+class Recorder:
+    """Callback that collects every call and lets a test wait for the next one"""
+
+    def __init__(self):
+        self.calls = []
+        self.event = threading.Event()
+
+    def __call__(self, events):
+        self.calls.append(events)
+        self.event.set()
+
+    def wait(self, timeout=2.0):
+        assert self.event.wait(timeout)
+        self.event.clear()
+
+
+def test_burst_is_delivered_in_one_call():
+    backend = FakeBackend()
+    received = Recorder()
+    monitor = HotplugMonitor(received, backend=backend, settle=0.05)
+    monitor.start()
+    try:
+        backend.push("add", "/dev/ttyACM0")
+        backend.push("add", "/dev/bus/usb/001/004", subsystem="usb")
+        backend.push("add", "/dev/ttyACM1")
+        received.wait()
+    finally:
+        monitor.stop()
+
+    assert len(received.calls) == 1
+    assert [(event.action, event.devname) for event in received.calls[0]] == [
+        ("add", "/dev/ttyACM0"), ("add", "/dev/ttyACM1")]
+
+
+def test_failed_probe_is_not_cached(tmp_path):
+    sys_root, dev_root = build_synthetic_sysfs(str(tmp_path / "root"), 0, 0, usb_ports=2, pads=1)
+    ports = enumerate_usb_serial_sysfs(PAD_USB_IDS, sys_root, dev_root)
+    ready = []
+    cache = str(tmp_path / "devices.json")
+    registry = DeviceRegistry(cache, probe=lambda device: bool(ready))
+
+    assert registry.find_pads(ports) == []
+    assert [identity.device for identity in registry.unconfirmed] == [ports[0].device]
+
+    ready.append(True)
+    assert [pad.device for pad in registry.find_pads(ports)] == [ports[0].device]
+    assert registry.unconfirmed == []
+
+    # Known from the cache from now on, without opening the port
+    again = DeviceRegistry(cache, probe=lambda device: pytest.fail("probed a known pad"))
+    assert len(again.find_pads(ports)) == 1
+
+
+class FakeLoop:
+    def __init__(self):
+        self.timers = []
+
+    def run_blocking(self, func, *args):
+        func(*args)
+
+    def call_later(self, delay, callback, *args):
+        self.timers.append((delay, callback, args))
+
+    def fire_timers(self):
+        timers, self.timers = self.timers, []
+        for _, callback, args in timers:
+            callback(*args)
+
+
+class FakeConnections:
+    def __init__(self):
+        self.connected = set()
+
+    def devices(self):
+        return list(self.connected)
+
+    def connect(self, device):
+        self.connected.add(device)
+
+    def disconnect(self, device):
+        self.connected.discard(device)
+
+    def close_all(self):
+        self.connected.clear()
+
+
+class FakeBridge:
+    def post_latest(self, key, callback, *args):
+        pass
+
+
+@pytest.fixture
+def bar(tmp_path, monkeypatch):
+    """A StatusBar without its widgets, on a synthetic sysfs with one pad (console and data port)"""
+    sys_root, dev_root = build_synthetic_sysfs(str(tmp_path), 0, 0, usb_ports=2, pads=1, data_ports=True)
+    plugged = []
+    monkeypatch.setattr(status_bar, "enumerate_usb_serial",
+                        lambda usb_ids: enumerate_usb_serial_sysfs(usb_ids, sys_root, dev_root) if plugged else [])
+
+    bar = StatusBar.__new__(StatusBar)
+    bar.stop_thread = False
+    bar.ready = []
+    bar.registry = DeviceRegistry(probe=lambda device: bool(bar.ready))
+    bar.probe_retries = 0
+    bar.probe_retry_pending = False
+    bar.loop = FakeLoop()
+    bar.connections = FakeConnections()
+    bar.bridge = FakeBridge()
+    bar.plugged = plugged
+    bar.data_port = dev_root + "/ttyACM2"
+    return bar
+
+
+def deliver(backend, action, devname):
+    """Push one event and wait until the monitor has handled it"""
+    received = Recorder()
+    monitor = HotplugMonitor(received, backend=backend, settle=0.01)
+    monitor.start()
+    try:
+        backend.push(action, devname)
+        received.wait()
+    finally:
+        monitor.stop()
+    return received.calls[0]
+
+
+def test_plug_before_udev_is_ready_is_retried(bar):
+    backend = FakeBackend()
+    bar.plugged.append(True)
+    bar.on_hotplug(deliver(backend, "add", bar.data_port))
+
+    # The port was not usable yet: nothing connected, a retry is scheduled
+    assert bar.connections.devices() == []
+    assert [delay for delay, _, _ in bar.loop.timers] == [StatusBar.PROBE_RETRY_DELAYS[0]]
+
+    bar.loop.fire_timers()
+    assert bar.connections.devices() == []
+    assert [delay for delay, _, _ in bar.loop.timers] == [StatusBar.PROBE_RETRY_DELAYS[1]]
+
+    bar.ready.append(True)
+    bar.loop.fire_timers()
+    assert bar.connections.devices() == [bar.data_port]
+    assert bar.loop.timers == []
+    assert bar.probe_retries == 0
+
+
+def test_retries_stop_after_the_last_delay(bar):
+    bar.plugged.append(True)
+    bar.check_connection()
+    for _ in range(len(StatusBar.PROBE_RETRY_DELAYS) + 2):
+        bar.loop.fire_timers()
+    assert bar.loop.timers == []
+    assert bar.probe_retries == len(StatusBar.PROBE_RETRY_DELAYS)
+
+    # A new plug event starts over
+    bar.on_hotplug(deliver(FakeBackend(), "add", bar.data_port))
+    assert len(bar.loop.timers) == 1
+
+
+def test_unplug_closes_the_session(bar):
+    bar.ready.append(True)
+    bar.plugged.append(True)
+    bar.on_hotplug(deliver(FakeBackend(), "add", bar.data_port))
+    assert bar.connections.devices() == [bar.data_port]
+
+    bar.plugged.clear()
+    bar.on_hotplug(deliver(FakeBackend(), "remove", bar.data_port))
+    assert bar.connections.devices() == []
@@ -0,0 +1,45 @@
+"""USB serial enumeration from a synthetic sysfs tree and pad port selection"""
+import pytest
+
+from device.ports import build_synthetic_sysfs, enumerate_usb_serial_sysfs
+from device.registry import DeviceIdentity, DeviceRegistry, PAD_USB_IDS
+
+
+@pytest.fixture
+def sysfs(tmp_path):
+    return build_synthetic_sysfs(str(tmp_path), virtual_ttys=4, uarts=2, usb_ports=3, pads=1, data_ports=True)
+
+
+def test_pad_interfaces_are_recorded(sysfs):
+    sys_root, dev_root = sysfs
+    records = sorted(enumerate_usb_serial_sysfs(PAD_USB_IDS, sys_root, dev_root), key=lambda r: r.device)
+
+    assert [(r.device.rsplit("/", 1)[1], r.interface) for r in records] == [("ttyACM0", 0), ("ttyACM3", 2)]
+    assert records[0].key == records[1].key
+
+
+def test_find_pads_prefers_the_data_port(sysfs):
+    sys_root, dev_root = sysfs
+    registry = DeviceRegistry(probe=lambda device: True)
+    # Whatever order the OS lists them in
+    for records in (enumerate_usb_serial_sysfs(PAD_USB_IDS, sys_root, dev_root),
+                    enumerate_usb_serial_sysfs(PAD_USB_IDS, sys_root, dev_root)[::-1]):
+        pads = registry.find_pads(records)
+        assert len(pads) == 1
+        assert pads[0].device.endswith("ttyACM3")
+        assert pads[0].interface == 2
+
+
+def test_console_only_pad_is_still_found(tmp_path):
+    sys_root, dev_root = build_synthetic_sysfs(str(tmp_path), virtual_ttys=0, uarts=0, usb_ports=2, pads=1)
+    pads = DeviceRegistry(probe=lambda device: True).find_pads(enumerate_usb_serial_sysfs(PAD_USB_IDS, sys_root, dev_root))
+
+    assert [pad.device.rsplit("/", 1)[1] for pad in pads] == ["ttyACM0"]
+
+
+def test_interface_from_pyserial_location():
+    class Port:
+        vid, pid, serial_number, device, description = 0x239A, 0x8108, "SN1", "COM5", "MacroPad"
+        location = "1-1.4:1.2"
+
+    assert DeviceIdentity.from_port(Port()).interface == 2
@@ -0,0 +1,95 @@
+"""ProfileBatch: all-or-nothing updates and the no-op save skip"""
+import json
+
+import pytest
+
+import engine
+from engine import ProfileBatch, UNCHANGED, profile_store, update_profile_key
+from tests.conftest import file_signature
+
+
+def stored(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_batch_writes_once(keysfile):
+    with ProfileBatch() as batch:
+        batch.set_key("0", "1", ["ctrl", "c"], "Copy")
+        batch.set_key("1", "1", ["ctrl", "v"], "Paste")
+
+    assert batch.result
+    assert batch.result.changed == [("0", "1"), ("1", "1")]
+    profiles = stored(keysfile)["profiles"]
+    assert profiles["0"]["1"] == {"name": "Copy", "key": ["ctrl", "c"]}
+    assert profiles["1"]["1"] == {"name": "Paste", "key": ["ctrl", "v"]}
+
+
+def test_unknown_profile_rolls_back_the_whole_batch(keysfile):
+    before = stored(keysfile)
+    signature = file_signature(keysfile)
+
+    batch = ProfileBatch()
+    batch.set_key("0", "1", ["ctrl", "c"], "Copy")
+    batch.set_key("99", "1", ["ctrl", "v"], "Paste")
+    result = batch.apply()
+
+    assert not result
+    assert "99" in result.error
+    assert file_signature(keysfile) == signature
+    assert stored(keysfile) == before
+    assert "1" not in profile_store.read(keysfile)["profiles"]["0"]
+
+
+def test_failed_write_leaves_cache_and_file_alone(keysfile, monkeypatch):
+    before = stored(keysfile)
+
+    def fail(path, data):
+        raise OSError("drive went away")
+    monkeypatch.setattr(profile_store, "_dump", fail)
+    batch = ProfileBatch()
+    batch.set_key("0", "1", ["ctrl", "c"], "Copy")
+    result = batch.apply()
+
+    assert not result
+    assert "drive went away" in result.error
+    assert stored(keysfile) == before
+    assert "1" not in profile_store.read(keysfile)["profiles"]["0"]
+
+
+def test_exception_in_with_block_applies_nothing(keysfile):
+    signature = file_signature(keysfile)
+    with pytest.raises(RuntimeError):
+        with ProfileBatch() as batch:
+            batch.set_key("0", "1", ["ctrl", "c"], "Copy")
+            raise RuntimeError("cancelled")
+
+    assert batch.result is None
+    assert file_signature(keysfile) == signature
+
+
+def test_saving_the_same_key_again_is_skipped(keysfile):
+    assert update_profile_key("0", "1", ["ctrl", "c"], "Copy") is True
+    signature = file_signature(keysfile)
+    skipped = profile_store.stats()["skipped"]
+
+    assert update_profile_key("0", "1", ["ctrl", "c"], "Copy") == UNCHANGED
+    assert file_signature(keysfile) == signature
+    assert profile_store.stats()["skipped"] == skipped + 1
+
+
+def test_change_then_revert_in_one_batch_is_skipped(keysfile):
+    update_profile_key("0", "1", ["ctrl", "c"], "Copy")
+    signature = file_signature(keysfile)
+    changes = []
+    engine.add_change_listener(changes.append)
+    try:
+        with ProfileBatch() as batch:
+            batch.set_key("0", "1", ["ctrl", "x"], "Cut")
+            batch.set_key("0", "1", ["ctrl", "c"], "Copy")
+    finally:
+        engine.remove_change_listener(changes.append)
+
+    assert batch.result.unchanged
+    assert changes == []
+    assert file_signature(keysfile) == signature
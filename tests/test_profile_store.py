@@ -0,0 +1,157 @@
+"""ProfileStore: stat-based cache invalidation and the keysfile journal"""
+import copy
+import json
+import os
+
+import pytest
+
+import engine
+from engine import ProfileStore
+from utils.layout import Layout
+
+
+def entry(name, *keys):
+    return {"name": name, "key": list(keys)}
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = str(tmp_path / "keysfile.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(Layout().empty_data(), f)
+    return path
+
+
+def edited(data, profile_id, key_id, value):
+    data = copy.deepcopy(data)
+    data["profiles"][profile_id][key_id] = value
+    return data
+
+
+def test_repeated_reads_hit_the_cache(path):
+    store = ProfileStore()
+    first = store.read(path)
+    assert store.read(path) is first
+    assert store.stats()["misses"] == 1
+    assert store.stats()["hits"] == 1
+
+
+def test_external_write_of_the_same_size_is_picked_up(path):
+    store = ProfileStore()
+    store.write(path, edited(store.read(path), "0", "1", entry("Aaaa", "a")))
+    st = os.stat(path)
+
+    # Another program rewrites the file with content of the same length
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read().replace("Aaaa", "Bbbb")
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    assert os.path.getsize(path) == st.st_size
+
+    assert store.read(path)["profiles"]["0"]["1"]["name"] == "Bbbb"
+
+
+def test_journal_is_replayed_after_a_crash(path):
+    store = ProfileStore()
+    store.enable_journal()
+    data = edited(store.read(path), "0", "1", entry("Copy", "ctrl", "c"))
+    store.write(path, data, [("0", "1", data["profiles"]["0"]["1"])])
+    # The edit is only in the journal; the snapshot was not compacted
+    with open(path, 'r', encoding='utf-8') as f:
+        assert "1" not in json.load(f)["profiles"]["0"]
+
+    restarted = ProfileStore()
+    restarted.enable_journal()
+    assert restarted.read(path)["profiles"]["0"]["1"] == entry("Copy", "ctrl", "c")
+
+
+def test_torn_trailing_record_is_ignored(path):
+    store = ProfileStore()
+    store.enable_journal()
+    data = edited(store.read(path), "0", "1", entry("Copy", "ctrl", "c"))
+    store.write(path, data, [("0", "1", data["profiles"]["0"]["1"])])
+    with open(store.journal.journal_path(path), 'a', encoding='utf-8') as f:
+        f.write('{"p":"0","k":"2","v":{"na')
+
+    restarted = ProfileStore()
+    restarted.enable_journal()
+    profiles = restarted.read(path)["profiles"]
+    assert profiles["0"]["1"] == entry("Copy", "ctrl", "c")
+    assert "2" not in profiles["0"]
+
+
+def test_flush_compacts_the_journal(path):
+    store = ProfileStore()
+    store.enable_journal()
+    data = edited(store.read(path), "0", "1", entry("Copy", "ctrl", "c"))
+    store.write(path, data, [("0", "1", data["profiles"]["0"]["1"])])
+
+    store.flush(path)
+
+    assert not os.path.exists(store.journal.journal_path(path))
+    with open(path, 'r', encoding='utf-8') as f:
+        assert json.load(f)["profiles"]["0"]["1"] == entry("Copy", "ctrl", "c")
+    assert store.read(path)["profiles"]["0"]["1"] == entry("Copy", "ctrl", "c")
+
+
+def test_compaction_keeps_records_appended_while_it_runs(path):
+    store = ProfileStore()
+    store.enable_journal()
+    first = edited(store.read(path), "0", "1", entry("Copy", "ctrl", "c"))
+    store.write(path, first, [("0", "1", first["profiles"]["0"]["1"])])
+
+    journal = store.journal
+    write_snapshot = journal.write_snapshot
+
+    def slow_snapshot(snapshot_path, data, dump=None):
+        # An edit lands while the snapshot is being written
+        second = edited(store.read(path), "0", "2", entry("Paste", "ctrl", "v"))
+        store.write(path, second, [("0", "2", second["profiles"]["0"]["2"])])
+        return write_snapshot(snapshot_path, data, dump)
+    journal.write_snapshot = slow_snapshot
+    store._compact(path)
+    journal.write_snapshot = write_snapshot
+
+    with open(path, 'r', encoding='utf-8') as f:
+        snapshot = json.load(f)["profiles"]["0"]
+    assert snapshot["1"] == entry("Copy", "ctrl", "c")
+    assert "2" not in snapshot
+    assert journal.size(path) > 0
+
+    restarted = ProfileStore()
+    restarted.enable_journal()
+    profiles = restarted.read(path)["profiles"]["0"]
+    assert profiles["1"] == entry("Copy", "ctrl", "c")
+    assert profiles["2"] == entry("Paste", "ctrl", "v")
+
+
+def test_journal_is_enabled_from_the_environment():
+    engine.configure_from_environment({"MACROPAD_JOURNAL": "0"})
+    assert engine.profile_store.journal is None
+    engine.configure_from_environment({"MACROPAD_JOURNAL": "1"})
+    try:
+        assert engine.profile_store.journal is not None
+    finally:
+        engine.profile_store.disable_journal()
+
+
+def test_device_export_is_enabled_from_the_environment():
+    engine.configure_from_environment({})
+    assert not engine.profile_store.device_export
+    engine.configure_from_environment({"MACROPAD_DEVICE_EXPORT": "1"})
+    try:
+        assert engine.profile_store.device_export
+        assert engine.profile_store.master_path == engine.get_master_path()
+    finally:
+        engine.profile_store.disable_device_export()
+
+
+def test_text_blobs_are_enabled_from_the_environment():
+    engine.configure_from_environment({"MACROPAD_TEXT_BLOBS": "1"})
+    try:
+        assert engine.profile_store.text_blob_threshold == 256
+        engine.configure_from_environment({"MACROPAD_TEXT_BLOBS": "1024"})
+        assert engine.profile_store.text_blob_threshold == 1024
+    finally:
+        engine.profile_store.disable_text_blobs()
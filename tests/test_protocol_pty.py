@@ -0,0 +1,98 @@
+"""device.protocol over a pty pair: ProtocolClient on one end, ReferencePad on the other"""
+import os
+import pty
+import threading
+import time
+import tty
+
+import pytest
+
+from device.client import ProtocolClient, _serve_reference_pad
+from device.connection import SerialConnection
+from device.protocol import (
+    SYNC, config_hash, encode_frame, encode_set_key, FrameDecoder, MSG_ACK, MSG_GET_HASH, MSG_SET_KEY
+)
+from device.reference_pad import ReferencePad
+
+
+@pytest.fixture
+def link():
+    master, slave = pty.openpty()
+    tty.setraw(slave)
+    pad = ReferencePad({"0": {}})
+    stop = threading.Event()
+    server = threading.Thread(target=_serve_reference_pad, args=(master, pad, stop), daemon=True)
+    server.start()
+
+    connection = SerialConnection(os.ttyname(slave))
+    connection.start()
+    client = ProtocolClient(connection)
+    client.start()
+    assert connection.wait_connected(2)
+    yield client, pad, connection
+    client.stop()
+    connection.close()
+    stop.set()
+    server.join(timeout=1)
+    os.close(slave)
+    os.close(master)
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_set_key_and_hash_round_trip(link):
+    client, pad, _ = link
+    entry = {"name": "Copy", "key": ["ctrl", "c"]}
+
+    reply = client.request(MSG_SET_KEY, encode_set_key("0", "1", entry))
+
+    assert reply.type == MSG_ACK
+    assert pad.profiles["0"]["1"] == entry
+    assert client.get_hash() == config_hash({"0": {"1": entry}})
+    assert client.request(MSG_GET_HASH).type == MSG_ACK
+
+
+def test_corrupted_frame_is_dropped(link):
+    client, pad, connection = link
+    frame = bytearray(encode_frame(MSG_SET_KEY, 200, encode_set_key("0", "1", {"name": "Bad", "key": ["a"]})))
+    frame[-1] ^= 0xFF
+    connection.send(bytes(frame))
+
+    assert wait_for(lambda: pad.decoder.crc_errors == 1)
+    assert "1" not in pad.profiles["0"]
+    # The link still works afterwards
+    client.set_key("0", "2", {"name": "Good", "key": ["b"]})
+    assert pad.profiles["0"]["2"]["name"] == "Good"
+
+
+def test_resync_after_noise_and_truncated_frame(link):
+    client, pad, connection = link
+    truncated = encode_frame(MSG_SET_KEY, 201, encode_set_key("0", "3", {"name": "Cut", "key": ["c"]}))[:-5]
+    connection.send(b"\x00\xff\x13noise" + truncated)
+
+    entry = {"name": "After", "key": ["ctrl", "z"]}
+    client.set_key("0", "4", entry)
+
+    assert pad.profiles["0"]["4"] == entry
+    assert "3" not in pad.profiles["0"]
+    assert pad.decoder.discarded > 0
+    assert client.get_hash() == config_hash(pad.profiles)
+
+
+def test_decoder_resyncs_on_split_input():
+    frames = [encode_frame(MSG_SET_KEY, seq, encode_set_key("0", str(seq), {"key": ["a"]})) for seq in range(1, 4)]
+    stream = b"junk" + frames[0] + frames[1][:7] + SYNC + frames[2]
+    decoder = FrameDecoder()
+
+    received = []
+    for i in range(0, len(stream), 3):
+        received.extend(decoder.feed(stream[i:i + 3]))
+
+    assert [frame.seq for frame in received] == [1, 3]
@@ -0,0 +1,214 @@
+"""
+Typed model of the profiles stored in keysfile.json.
+
+Each key entry becomes one small __slots__ object tagged with a kind, so code
+that displays or sends bindings can dispatch on binding.kind instead of
+probing the dict for "text_type", "software" or "key". to_dict() gives back
+the same dict the binding was built from.
+"""
+
+KIND_EMPTY = "empty"
+KIND_COMBO = "combo"
+KIND_TEXT = "text"
+KIND_SOFTWARE = "software"
+
+TEXT_TYPES = ("single", "paragraph")
+
+
+class Binding:
+    """Base class; fields not understood by the model are kept in extra"""
+
+    __slots__ = ("name", "keys", "extra")
+    kind = KIND_EMPTY
+
+    def __init__(self, name=None, keys=None, extra=None):
+        self.name = name
+        self.keys = keys
+        self.extra = extra
+
+    def _fields(self):
+        """Kind-specific fields in the order the engine writes them"""
+        return {}
+
+    def to_dict(self):
+        entry = {}
+        if self.name is not None:
+            entry["name"] = self.name
+        if self.keys is not None:
+            entry["key"] = self.keys
+        entry.update(self._fields())
+        if self.extra:
+            entry.update(self.extra)
+        return entry
+
+    def display_name(self, key_id):
+        return self.name if self.name is not None else f"Key {key_id}"
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+class EmptyBinding(Binding):
+    """A key slot with nothing assigned (an empty dict in the file)"""
+
+    __slots__ = ()
+    kind = KIND_EMPTY
+
+
+class ComboBinding(Binding):
+    """Presses a key combination, e.g. ["ctrl", "s"]"""
+
+    __slots__ = ()
+    kind = KIND_COMBO
+
+
+class TextBinding(Binding):
+    """
+    Types a single line or a paragraph of text.
+
+    text_content is None when the entry has none (it may use a text_ref
+    instead); to_dict() then leaves the field out, as it was stored.
+    """
+
+    __slots__ = ("text_type", "text_content")
+    kind = KIND_TEXT
+
+    def __init__(self, name=None, keys=None, extra=None, text_type="single", text_content=None):
+        super().__init__(name, keys, extra)
+        self.text_type = text_type
+        self.text_content = text_content
+
+    def _fields(self):
+        fields = {"text_type": self.text_type}
+        if self.text_content is not None:
+            fields["text_content"] = self.text_content
+        return fields
+
+
+class SoftwareBinding(Binding):
+    """Launches a program, optionally with a modifier held"""
+
+    __slots__ = ("software",)
+    kind = KIND_SOFTWARE
+
+    def __init__(self, name=None, keys=None, extra=None, software=""):
+        super().__init__(name, keys, extra)
+        self.software = software
+
+    @property
+    def software_name(self):
+        """Executable name without directory or extension"""
+        return self.software.replace("/", "\\").split("\\")[-1].split(".")[0]
+
+    def _fields(self):
+        return {"software": self.software}
+
+
+class Profile:
+    """The bindings of one profile, keyed by key id string"""
+
+    __slots__ = ("profile_id", "keys")
+
+    def __init__(self, profile_id, keys=None):
+        self.profile_id = profile_id
+        self.keys = keys if keys is not None else {}
+
+    def get(self, key_id, default=None):
+        return self.keys.get(key_id, default)
+
+    def __contains__(self, key_id):
+        return key_id in self.keys
+
+    def __iter__(self):
+        return iter(self.keys)
+
+    def to_dict(self):
+        return {key_id: binding.to_dict() for key_id, binding in self.keys.items()}
+
+
+def binding_from_dict(entry, errors=None, where=""):
+    """
+    Build the binding for one key entry, validating it on the way.
+
+    Problems are appended to errors (if given) as strings; the binding is still
+    built so that nothing is lost on the way back to JSON.
+    """
+    def error(message):
+        if errors is not None:
+            errors.append(f"{where}{message}")
+
+    if not isinstance(entry, dict):
+        error("entry is not an object")
+        return EmptyBinding(extra={"value": entry})
+    if not entry:
+        return EmptyBinding()
+
+    extra = {}
+    name = keys = text_type = text_content = software = None
+    for field, value in entry.items():
+        if field == "name":
+            if not isinstance(value, str):
+                error("name must be a string")
+            name = value
+        elif field == "key":
+            if not isinstance(value, list) or not all(isinstance(k, str) for k in value):
+                error("key must be a list of strings")
+            keys = value
+        elif field == "text_type":
+            if value not in TEXT_TYPES:
+                error(f"unknown text_type {value!r}")
+            text_type = value
+        elif field == "text_content":
+            if not isinstance(value, str):
+                error("text_content must be a string")
+            text_content = value
+        elif field == "software":
+            if not isinstance(value, str):
+                error("software must be a string")
+            software = value
+        else:
+            extra[field] = value
+    extra = extra or None
+
+    if text_type is not None:
+        # Long texts may live in a blob store and be referenced by text_ref
+        if text_content is None and "text_ref" not in (extra or {}):
+            error("text binding without text_content")
+        if software is not None:
+            extra = dict(extra or {}, software=software)
+        return TextBinding(name, keys, extra, text_type, text_content)
+    if text_content is not None:
+        extra = dict(extra or {}, text_content=text_content)
+    if software is not None:
+        return SoftwareBinding(name, keys, extra, software)
+    if keys or name is not None:
+        return ComboBinding(name, keys, extra)
+    return EmptyBinding(name, keys, extra)
+
+
+def parse_profiles(profiles):
+    """
+    Validate and convert the "profiles" dict in a single pass.
+
+    Returns:
+        Tuple of (dict of profile id to Profile, list of error strings)
+    """
+    errors = []
+    model = {}
+    for profile_id, profile in profiles.items():
+        if not isinstance(profile, dict):
+            errors.append(f"Profile {profile_id}: not an object")
+            continue
+        model[profile_id] = Profile(profile_id, {
+            key_id: binding_from_dict(entry, errors, f"Profile {profile_id}, key {key_id}: ")
+            for key_id, entry in profile.items()
+        })
+    return model, errors
+
+
+def profiles_to_dict(model):
+    """Convert a parse_profiles() model back to the JSON "profiles" dict"""
+    return {profile_id: profile.to_dict() for profile_id, profile in model.items()}
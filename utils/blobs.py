@@ -0,0 +1,94 @@
+import hashlib
+import os
+
+
+class BlobStore:
+    """
+    Content-addressed storage for large text macro payloads.
+
+    Each text is written once to <directory>/<hash>.txt, where hash is the
+    first 16 hex digits of its SHA-256, and key entries refer to it with
+    "text_ref" instead of carrying "text_content" inline. Binding the same
+    paragraph to several keys therefore stores it once, and keysfile.json
+    stays small. Blobs no longer referenced by any key are removed by gc().
+    """
+
+    HASH_LENGTH = 16
+
+    def __init__(self, directory, threshold=256):
+        self.directory = directory
+        self.threshold = threshold
+        self._cache = {}
+
+    @classmethod
+    def hash_text(cls, text):
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()[:cls.HASH_LENGTH]
+
+    def blob_path(self, ref):
+        return os.path.join(self.directory, ref + ".txt")
+
+    def put(self, text):
+        """Store text (if it is not stored already) and return its reference"""
+        ref = self.hash_text(text)
+        if ref not in self._cache:
+            path = self.blob_path(ref)
+            if not os.path.exists(path):
+                os.makedirs(self.directory, exist_ok=True)
+                with open(path, 'w', encoding='utf-8', newline='') as f:
+                    f.write(text)
+            self._cache[ref] = text
+        return ref
+
+    def get(self, ref):
+        """Return the text stored under ref"""
+        if ref not in self._cache:
+            with open(self.blob_path(ref), 'r', encoding='utf-8', newline='') as f:
+                self._cache[ref] = f.read()
+        return self._cache[ref]
+
+    def externalize(self, entry):
+        """
+        Return entry with a long text_content moved into the store.
+
+        Short texts stay inline; entry itself is not modified.
+        """
+        text = entry.get("text_content")
+        if not isinstance(text, str) or len(text.encode("utf-8")) < self.threshold:
+            return entry
+        entry = dict(entry)
+        del entry["text_content"]
+        entry["text_ref"] = self.put(text)
+        return entry
+
+    def resolve(self, entry):
+        """Return the text of a key entry, whether inline or stored here"""
+        if "text_ref" in entry:
+            return self.get(entry["text_ref"])
+        return entry.get("text_content", "")
+
+    def gc(self, profiles):
+        """
+        Delete blobs that no key in profiles refers to.
+
+        Returns:
+            Number of blobs removed
+        """
+        referenced = {
+            entry["text_ref"]
+            for profile in profiles.values()
+            for entry in profile.values()
+            if isinstance(entry, dict) and "text_ref" in entry
+        }
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return 0
+
+        removed = 0
+        for name in names:
+            ref, ext = os.path.splitext(name)
+            if ext == ".txt" and ref not in referenced:
+                os.remove(os.path.join(self.directory, name))
+                self._cache.pop(ref, None)
+                removed += 1
+        return removed
@@ -0,0 +1,108 @@
+import json
+import sys
+import time
+
+
+def pretty_dumps(data):
+    """Human-readable form used for the host master copy"""
+    return json.dumps(data, indent=2)
+
+
+def prune_empty(data):
+    """
+    Return a copy of data without empty key placeholders.
+
+    Profiles are always kept (even when empty) so the profile list stays the
+    same; only keys whose entry is {} are dropped, the device treats a missing
+    key the same way.
+    """
+    pruned = dict(data)
+    pruned["profiles"] = {
+        profile_id: {key_id: entry for key_id, entry in profile.items() if entry}
+        for profile_id, profile in data.get("profiles", {}).items()
+    }
+    return pruned
+
+
+def compact_dumps(data):
+    """Minified, key-sorted form written to the CIRCUITPY drive"""
+    return json.dumps(prune_empty(data), separators=(",", ":"), sort_keys=True)
+
+
+def parse_time(text, repeat=20):
+    """Return the average json.loads time for text in milliseconds"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        json.loads(text)
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def size_report(data):
+    """
+    Compare the pretty and compact encodings of data.
+
+    Returns:
+        Dictionary with total sizes and parse times, plus a per-profile
+        breakdown of bytes saved
+    """
+    pretty = pretty_dumps(data)
+    compact = compact_dumps(data)
+    pruned = prune_empty(data)
+
+    profiles = {}
+    for profile_id, profile in data.get("profiles", {}).items():
+        pretty_size = len(json.dumps(profile, indent=2).encode("utf-8"))
+        compact_size = len(json.dumps(pruned["profiles"][profile_id],
+                                      separators=(",", ":"), sort_keys=True).encode("utf-8"))
+        profiles[profile_id] = {
+            "pretty": pretty_size,
+            "compact": compact_size,
+            "saved": pretty_size - compact_size
+        }
+
+    return {
+        "pretty_bytes": len(pretty.encode("utf-8")),
+        "compact_bytes": len(compact.encode("utf-8")),
+        "pretty_parse_ms": parse_time(pretty),
+        "compact_parse_ms": parse_time(compact),
+        "profiles": profiles
+    }
+
+
+def export(data, device_path, master_path=None):
+    """
+    Write the compact device copy and, optionally, the pretty host master copy.
+
+    Args:
+        data: The complete keysfile data
+        device_path: Path of keysfile.json on the device drive
+        master_path: Path of the human-readable copy kept on the host
+    """
+    if master_path:
+        with open(master_path, 'w', encoding='utf-8') as f:
+            f.write(pretty_dumps(data))
+    with open(device_path, 'w', encoding='utf-8') as f:
+        f.write(compact_dumps(data))
+
+
+def format_report(report):
+    """Render a size_report() result as text"""
+    lines = [
+        f"Pretty:  {report['pretty_bytes']} bytes, parse {report['pretty_parse_ms']:.3f} ms",
+        f"Compact: {report['compact_bytes']} bytes, parse {report['compact_parse_ms']:.3f} ms",
+        f"Saved:   {report['pretty_bytes'] - report['compact_bytes']} bytes"
+    ]
+    for profile_id in sorted(report["profiles"], key=lambda p: (len(p), p)):
+        sizes = report["profiles"][profile_id]
+        lines.append(f"  Profile {profile_id}: {sizes['pretty']} -> {sizes['compact']} "
+                     f"bytes (saved {sizes['saved']})")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    # Usage: python -m utils.device_export path/to/keysfile.json
+    if len(sys.argv) != 2:
+        print("Usage: python -m utils.device_export <keysfile.json>")
+        sys.exit(1)
+    with open(sys.argv[1], 'r', encoding='utf-8') as f:
+        print(format_report(size_report(json.load(f))))
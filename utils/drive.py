@@ -0,0 +1,221 @@
+import os
+import select
+import sys
+import threading
+
+
+def _unescape_mount_field(field):
+    """Undo the octal escapes (\\040 for space etc.) used in mountinfo"""
+    out = []
+    i = 0
+    while i < len(field):
+        if field[i] == "\\" and field[i + 1:i + 4].isdigit():
+            out.append(chr(int(field[i + 1:i + 4], 8)))
+            i += 4
+        else:
+            out.append(field[i])
+            i += 1
+    return "".join(out)
+
+
+def parse_mountinfo(text):
+    """
+    Parse /proc/self/mountinfo.
+
+    Returns:
+        List of (mount point, filesystem type, source device) tuples
+    """
+    mounts = []
+    for line in text.splitlines():
+        fields = line.split()
+        if "-" not in fields:
+            continue
+        sep = fields.index("-")
+        if len(fields) < sep + 3 or len(fields) < 5:
+            continue
+        mount_point = _unescape_mount_field(fields[4])
+        fstype = fields[sep + 1]
+        source = _unescape_mount_field(fields[sep + 2])
+        mounts.append((mount_point, fstype, source))
+    return mounts
+
+
+def _windows_volume_label(root):
+    import ctypes
+    buf = ctypes.create_unicode_buffer(261)
+    if ctypes.windll.kernel32.GetVolumeInformationW(root, buf, len(buf), None, None, None, None, 0):
+        return buf.value
+    return None
+
+
+def find_drives(label="CIRCUITPY", mountinfo_path="/proc/self/mountinfo", volumes_dir="/Volumes"):
+    """
+    Find every mounted drive carrying label, for when several pads are attached.
+
+    Desktops mount the second and later drives as CIRCUITPY1, "CIRCUITPY 1"
+    and so on, so any mount point whose name starts with label counts.
+
+    Returns:
+        List of (mount point, source device or None) tuples
+    """
+    drives = []
+    if sys.platform.startswith("linux") and os.path.exists(mountinfo_path):
+        try:
+            with open(mountinfo_path, 'r', encoding='utf-8') as f:
+                mounts = parse_mountinfo(f.read())
+        except OSError as e:
+            print(f"Error reading mount table: {e}")
+            return drives
+        for mount_point, fstype, source in mounts:
+            if os.path.basename(mount_point).startswith(label):
+                drives.append((mount_point, source))
+    elif sys.platform == "darwin":
+        try:
+            names = sorted(os.listdir(volumes_dir))
+        except OSError:
+            names = []
+        drives = [(os.path.join(volumes_dir, name), None) for name in names if name.startswith(label)]
+    elif os.name == "nt":
+        import string
+        for letter in string.ascii_uppercase:
+            root = f"{letter}:\\"
+            if os.path.exists(root) and _windows_volume_label(root) == label:
+                drives.append((root, None))
+    return drives
+
+
+class DriveResolver:
+    """
+    Cached lookup of the CIRCUITPY drive.
+
+    On Linux the drive is found by volume label in /proc/self/mountinfo (via
+    /dev/disk/by-label, or a mount point named after the label) and a
+    background thread waits for the kernel to signal a mount table change
+    before resolving again. Elsewhere the configured drive letter is checked
+    on a slow background poll. Reading .path is only an attribute read.
+
+    Listeners added with add_listener() are called with the new drive path
+    (or None) from the watcher thread whenever it changes.
+
+    override names a plain directory to use instead of the real drive, such
+    as the one created by the device emulator (python -m device.emulator).
+    """
+
+    def __init__(self, label="CIRCUITPY", windows_drive="O:\\", poll_interval=2.0,
+                 mountinfo_path="/proc/self/mountinfo", by_label_dir="/dev/disk/by-label",
+                 override=None):
+        self.label = label
+        self.override = override
+        self.windows_drive = windows_drive
+        self.poll_interval = poll_interval
+        self.mountinfo_path = mountinfo_path
+        self.by_label_dir = by_label_dir
+        self._path = None
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._thread = None
+        self._stop = threading.Event()
+
+    @property
+    def path(self):
+        """Mount point of the drive, or None when it is not connected"""
+        if self._thread is None:
+            self.start()
+        return self._path
+
+    def start(self):
+        """Resolve once and start watching for changes"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._path = self.resolve()
+            if self.override:
+                target = self._poll_loop
+            elif sys.platform.startswith("linux") and os.path.exists(self.mountinfo_path):
+                target = self._watch_mountinfo
+            else:
+                target = self._poll_loop
+            self._thread = threading.Thread(target=target, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def set_override(self, path):
+        """Use path instead of the real drive (None goes back to the real one)"""
+        self.override = path
+        self.refresh()
+
+    def add_listener(self, callback):
+        """Register callback(path) to be called when the drive appears or goes away"""
+        if callback not in self._listeners:
+            self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def resolve(self):
+        """Find the drive now, bypassing the cache"""
+        if self.override:
+            return self.override if os.path.isdir(self.override) else None
+        if sys.platform.startswith("linux") and os.path.exists(self.mountinfo_path):
+            return self._resolve_linux()
+        return self.windows_drive if os.path.exists(self.windows_drive) else None
+
+    def _resolve_linux(self):
+        try:
+            with open(self.mountinfo_path, 'r', encoding='utf-8') as f:
+                mounts = parse_mountinfo(f.read())
+        except OSError as e:
+            print(f"Error reading mount table: {e}")
+            return None
+
+        label_device = None
+        label_link = os.path.join(self.by_label_dir, self.label)
+        if os.path.lexists(label_link):
+            label_device = os.path.realpath(label_link)
+
+        for mount_point, fstype, source in mounts:
+            if label_device and os.path.realpath(source) == label_device:
+                return mount_point
+        for mount_point, fstype, source in mounts:
+            if os.path.basename(mount_point) == self.label:
+                return mount_point
+        return None
+
+    def refresh(self):
+        """Resolve again and notify listeners if the drive changed"""
+        new_path = self.resolve()
+        with self._lock:
+            if new_path == self._path:
+                return
+            self._path = new_path
+        for callback in list(self._listeners):
+            try:
+                callback(new_path)
+            except Exception as e:
+                print(f"Error in drive listener: {e}")
+
+    def _watch_mountinfo(self):
+        """Block until the kernel reports a mount table change (POLLPRI/POLLERR)"""
+        try:
+            f = open(self.mountinfo_path, 'r', encoding='utf-8')
+        except OSError:
+            self._poll_loop()
+            return
+
+        with f:
+            f.read()
+            poller = select.poll()
+            poller.register(f.fileno(), select.POLLERR | select.POLLPRI)
+            while not self._stop.is_set():
+                # Wake up periodically only to honour stop()
+                if poller.poll(1000):
+                    f.seek(0)
+                    f.read()
+                    self.refresh()
+
+    def _poll_loop(self):
+        while not self._stop.wait(self.poll_interval):
+            self.refresh()
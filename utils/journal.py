@@ -0,0 +1,157 @@
+import json
+import os
+
+
+class KeysfileJournal:
+    """
+    Append-only edit log kept beside keysfile.json.
+
+    Each record is one JSON line holding a profile id, a key id and the full
+    new entry for that key (or null when the key was removed), so an edit
+    costs a few dozen bytes instead of a rewrite of the whole config. Readers
+    replay the log over the last compacted snapshot; compaction writes a fresh
+    snapshot and empties the log once it grows past compact_threshold bytes.
+
+    Note that the device itself only reads the snapshot, so edits reach the
+    pad when the journal is compacted (see ProfileStore.flush).
+    """
+
+    SUFFIX = ".journal"
+
+    def __init__(self, compact_threshold=16 * 1024):
+        self.compact_threshold = compact_threshold
+
+    def journal_path(self, path):
+        """Return the sidecar log path for a keysfile path"""
+        return path + self.SUFFIX
+
+    def signature(self, path):
+        """Return (size, mtime, inode) of the log, or None when there is no log"""
+        try:
+            st = os.stat(self.journal_path(path))
+        except FileNotFoundError:
+            return None
+        return (st.st_size, st.st_mtime_ns, st.st_ino)
+
+    def size(self, path):
+        """Return the current size of the log in bytes"""
+        try:
+            return os.path.getsize(self.journal_path(path))
+        except FileNotFoundError:
+            return 0
+
+    def needs_compaction(self, path):
+        return self.size(path) >= self.compact_threshold
+
+    def append(self, path, changes):
+        """
+        Append records to the log.
+
+        Args:
+            path: Path of the keysfile the log belongs to
+            changes: Iterable of (profile_id, key_id, entry) tuples; entry is
+                the complete new key dict or None to remove the key
+        """
+        lines = []
+        for profile_id, key_id, entry in changes:
+            record = {"p": str(profile_id), "k": str(key_id), "v": entry}
+            lines.append(json.dumps(record, separators=(",", ":")) + "\n")
+        if not lines:
+            return 0
+
+        payload = "".join(lines)
+        with open(self.journal_path(path), 'a', encoding='utf-8') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        return len(payload)
+
+    def replay(self, path, data):
+        """Apply the log on top of a snapshot dict in place and return it"""
+        try:
+            f = open(self.journal_path(path), 'r', encoding='utf-8')
+        except FileNotFoundError:
+            return data
+
+        profiles = data.setdefault("profiles", {})
+        with f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A torn trailing record from an interrupted write
+                    print("Ignoring damaged journal record")
+                    continue
+                profile = profiles.setdefault(record["p"], {})
+                if record["v"] is None:
+                    profile.pop(record["k"], None)
+                else:
+                    profile[record["k"]] = record["v"]
+        return data
+
+    def compact(self, path, data, dump=None):
+        """
+        Fold the log into a fresh snapshot.
+
+        The snapshot is replaced atomically before the log is emptied, and
+        replaying a record twice is harmless, so a crash in between loses
+        nothing.
+
+        Args:
+            path: Path of keysfile.json
+            data: The replayed data to write as the new snapshot
+            dump: Optional dump(path, data) used to write the snapshot
+        """
+        self.install(path, self.write_snapshot(path, data, dump))
+
+    def write_snapshot(self, path, data, dump=None):
+        """
+        Write data as the next snapshot of path without replacing it yet.
+
+        Returns:
+            The temporary path to hand to install()
+        """
+        tmp_path = path + ".tmp"
+        if dump:
+            dump(tmp_path, data)
+        else:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2)
+        with open(tmp_path, 'rb+') as f:
+            os.fsync(f.fileno())
+        return tmp_path
+
+    def install(self, path, tmp_path, upto=None):
+        """
+        Replace the snapshot with tmp_path and drop the records it holds.
+
+        Args:
+            upto: Size the log had when the snapshot was taken; records
+                appended after it are kept. None drops the whole log.
+        """
+        os.replace(tmp_path, path)
+        if upto is None:
+            self.clear(path)
+            return
+        journal_path = self.journal_path(path)
+        try:
+            with open(journal_path, 'rb') as f:
+                f.seek(upto)
+                rest = f.read()
+        except FileNotFoundError:
+            return
+        if not rest:
+            self.clear(path)
+            return
+        with open(journal_path + ".tmp", 'wb') as f:
+            f.write(rest)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(journal_path + ".tmp", journal_path)
+
+    def clear(self, path):
+        """Remove the log, e.g. after a full snapshot write"""
+        try:
+            os.remove(self.journal_path(path))
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,211 @@
+import struct
+
+# HID modifier bits (byte 0 of a keyboard report)
+MODIFIERS = {
+    "ctrl": 0x01,
+    "shift": 0x02,
+    "alt": 0x04,
+    "windows": 0x08,
+}
+
+# HID Keyboard/Keypad page (0x07) usage codes for the key names produced by
+# the config tabs (lower-cased)
+KEYCODES = {
+    "enter": 0x28, "escape": 0x29, "backspace": 0x2A, "tab": 0x2B, "space": 0x2C,
+    "-": 0x2D, "=": 0x2E, "[": 0x2F, "]": 0x30, "\\": 0x31, ";": 0x33, "'": 0x34,
+    "`": 0x35, ",": 0x36, ".": 0x37, "/": 0x38, "caps lock": 0x39,
+    "print screen": 0x46, "scroll lock": 0x47, "pause/break": 0x48, "insert": 0x49,
+    "home": 0x4A, "page up": 0x4B, "delete": 0x4C, "end": 0x4D, "page down": 0x4E,
+    "right": 0x4F, "left": 0x50, "down": 0x51, "up": 0x52, "decimal": 0x63,
+}
+KEYCODES.update({chr(c): 0x04 + c - ord("a") for c in range(ord("a"), ord("z") + 1)})
+KEYCODES.update({str(n): 0x1E + n - 1 for n in range(1, 10)})
+KEYCODES["0"] = 0x27
+KEYCODES.update({f"f{n}": 0x3A + n - 1 for n in range(1, 13)})
+KEYCODES.update({f"f{n}": 0x68 + n - 13 for n in range(13, 25)})
+
+# Symbols typed with shift held, mapped to their unshifted key
+SHIFTED = {
+    "!": "1", "@": "2", "#": "3", "$": "4", "%": "5", "^": "6", "&": "7",
+    "*": "8", "(": "9", ")": "0", "_": "-", "+": "=", "{": "[", "}": "]",
+    "|": "\\", ":": ";", '"': "'", "<": ",", ">": ".", "?": "/",
+}
+
+# HID Consumer page (0x0C) usage codes for the media keys
+CONSUMER_CODES = {
+    "volume up": 0xE9,
+    "volume down": 0xEA,
+    "mute": 0xE2,
+    "play/pause": 0xCD,
+    "stop": 0xB7,
+    "next track": 0xB5,
+    "previous track": 0xB6,
+}
+
+# Record kinds
+KIND_EMPTY = 0
+KIND_COMBO = 1
+KIND_TEXT_SINGLE = 2
+KIND_TEXT_PARAGRAPH = 3
+KIND_SOFTWARE = 4
+
+MAGIC = b"MPKM"
+VERSION = 1
+MAX_KEYCODES = 6
+
+# magic, version, profile count, keys per profile, reserved,
+# text table offset, text table size
+HEADER = struct.Struct("<4sBBBBII")
+# profile, key, kind, modifier bits, 6 keycodes, consumer usage,
+# name offset, name length, payload offset, payload length
+RECORD = struct.Struct("<BBBB6sHIIII")
+
+
+class KeymapError(ValueError):
+    """Raised when a binding cannot be compiled to HID codes"""
+
+
+def resolve_keys(names):
+    """
+    Resolve a list of key names to HID codes.
+
+    Returns:
+        Tuple of (modifier bits, list of keyboard usage codes, consumer usage)
+
+    Raises:
+        KeymapError: If a name is unknown or the combination does not fit
+    """
+    modifiers = 0
+    keycodes = []
+    consumer = 0
+    for raw_name in names:
+        name = raw_name.lower()
+        if name in MODIFIERS:
+            modifiers |= MODIFIERS[name]
+        elif name in KEYCODES:
+            keycodes.append(KEYCODES[name])
+        elif name in SHIFTED:
+            modifiers |= MODIFIERS["shift"]
+            keycodes.append(KEYCODES[SHIFTED[name]])
+        elif name in CONSUMER_CODES:
+            if consumer:
+                raise KeymapError("Only one media key is allowed per binding")
+            consumer = CONSUMER_CODES[name]
+        else:
+            raise KeymapError(f"Unknown key name {raw_name!r}")
+
+    if len(keycodes) > MAX_KEYCODES:
+        raise KeymapError(f"At most {MAX_KEYCODES} keys can be pressed at once")
+    return modifiers, keycodes, consumer
+
+
+class _TextTable:
+    """UTF-8 string table; identical strings are stored once"""
+
+    def __init__(self):
+        self.data = bytearray()
+        self.offsets = {}
+
+    def add(self, text):
+        if not text:
+            return 0, 0
+        encoded = text.encode("utf-8")
+        if encoded not in self.offsets:
+            self.offsets[encoded] = len(self.data)
+            self.data += encoded
+        return self.offsets[encoded], len(encoded)
+
+
+def _compile_entry(profile_num, key_num, entry, table, resolve_text=None):
+    """Pack one key entry into a record"""
+    name_offset, name_length = table.add(entry.get("name", ""))
+    payload = ""
+    keys = entry.get("key", [])
+
+    if "text_type" in entry:
+        kind = KIND_TEXT_SINGLE if entry["text_type"] == "single" else KIND_TEXT_PARAGRAPH
+        payload = resolve_text(entry) if resolve_text else entry.get("text_content", "")
+        keys = []
+    elif "software" in entry:
+        kind = KIND_SOFTWARE
+        payload = entry["software"]
+    elif keys:
+        kind = KIND_COMBO
+    else:
+        kind = KIND_EMPTY
+
+    modifiers, keycodes, consumer = resolve_keys(keys)
+    payload_offset, payload_length = table.add(payload)
+    return RECORD.pack(profile_num, key_num, kind, modifiers, bytes(keycodes).ljust(MAX_KEYCODES, b"\0"),
+                       consumer, name_offset, name_length, payload_offset, payload_length)
+
+
+def compile_keymap(profiles, resolve_text=None):
+    """
+    Compile the profiles dict into the binary keymap format.
+
+    resolve_text(entry), if given, returns the text of a text key entry; it
+    is needed when texts are kept in a blob store (see utils.blobs).
+
+    The file is a header, a dense table of fixed-width records (one per
+    profile/key slot, so the device finds a key at
+    HEADER.size + (profile * keys_per_profile + key - 1) * RECORD.size),
+    followed by a table of UTF-8 names, texts and software paths.
+
+    Raises:
+        KeymapError: If any binding uses an unknown key name
+    """
+    profile_nums = [int(p) for p in profiles]
+    key_nums = [int(k) for profile in profiles.values() for k in profile]
+    profile_count = max(profile_nums) + 1 if profile_nums else 0
+    keys_per_profile = max(key_nums) if key_nums else 0
+    if profile_count > 255 or keys_per_profile > 255:
+        raise KeymapError("Too many profiles or keys for the binary keymap")
+
+    table = _TextTable()
+    records = bytearray()
+    for profile_num in range(profile_count):
+        profile = profiles.get(str(profile_num), {})
+        for key_num in range(1, keys_per_profile + 1):
+            entry = profile.get(str(key_num)) or {}
+            try:
+                records += _compile_entry(profile_num, key_num, entry, table, resolve_text)
+            except KeymapError as e:
+                raise KeymapError(f"Profile {profile_num}, key {key_num}: {e}") from None
+
+    text_offset = HEADER.size + len(records)
+    header = HEADER.pack(MAGIC, VERSION, profile_count, keys_per_profile, 0, text_offset, len(table.data))
+    return bytes(header + records + table.data)
+
+
+def read_key(blob, profile_num, key_num):
+    """
+    Look up one key in a compiled keymap without parsing the rest.
+
+    Returns:
+        Dictionary with kind, modifiers, keycodes, consumer, name and payload,
+        or None when the slot is outside the keymap
+    """
+    magic, version, profile_count, keys_per_profile, _, text_offset, _ = HEADER.unpack_from(blob, 0)
+    if magic != MAGIC or version != VERSION:
+        raise KeymapError("Not a compiled keymap")
+    if not (0 <= profile_num < profile_count and 1 <= key_num <= keys_per_profile):
+        return None
+
+    index = profile_num * keys_per_profile + key_num - 1
+    (_, _, kind, modifiers, keycodes, consumer,
+     name_offset, name_length, payload_offset, payload_length) = RECORD.unpack_from(
+        blob, HEADER.size + index * RECORD.size)
+
+    def text(offset, length):
+        start = text_offset + offset
+        return bytes(blob[start:start + length]).decode("utf-8")
+
+    return {
+        "kind": kind,
+        "modifiers": modifiers,
+        "keycodes": [code for code in keycodes if code],
+        "consumer": consumer,
+        "name": text(name_offset, name_length),
+        "payload": text(payload_offset, payload_length),
+    }
@@ -0,0 +1,96 @@
+class Layout:
+    """
+    Shape of the pad: a rows x cols key grid and a number of profiles.
+
+    Stored as the "layout" object in keysfile.json. Key ids are "1" to
+    rows * cols numbered row by row, profile ids are "0" to profile_count - 1.
+    Files without a layout describe the original 3 x 3 pad with 6 profiles.
+    """
+
+    __slots__ = ("rows", "cols", "profile_count", "names")
+
+    DEFAULT_ROWS = 3
+    DEFAULT_COLS = 3
+    DEFAULT_PROFILES = 6
+    MAX_KEYS = 255
+    MAX_PROFILES = 255
+
+    # Names of the profiles shipped with the original pad
+    DEFAULT_PROFILE_NAMES = {
+        "0": "Default", 
+        "1": "VSCode", 
+        "2": "OBS", 
+        "3": "Software", 
+        "4": "Windows", 
+        "5": "Photoshop"
+    }
+
+    def __init__(self, rows=DEFAULT_ROWS, cols=DEFAULT_COLS, profile_count=DEFAULT_PROFILES, names=None):
+        if rows < 1 or cols < 1 or rows * cols > self.MAX_KEYS:
+            raise ValueError(f"Invalid key grid {rows}x{cols}")
+        if not 1 <= profile_count <= self.MAX_PROFILES:
+            raise ValueError(f"Invalid profile count {profile_count}")
+        self.rows = rows
+        self.cols = cols
+        self.profile_count = profile_count
+        self.names = names or {}
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a layout from keysfile data, falling back to the defaults"""
+        layout = data.get("layout") or {}
+        return cls(
+            int(layout.get("rows", cls.DEFAULT_ROWS)),
+            int(layout.get("cols", cls.DEFAULT_COLS)),
+            int(layout.get("profiles", cls.DEFAULT_PROFILES)),
+            layout.get("names")
+        )
+
+    def to_dict(self):
+        layout = {"rows": self.rows, "cols": self.cols, "profiles": self.profile_count}
+        if self.names:
+            layout["names"] = self.names
+        return layout
+
+    @property
+    def key_count(self):
+        return self.rows * self.cols
+
+    def key_ids(self):
+        return [str(i) for i in range(1, self.key_count + 1)]
+
+    def profile_ids(self, existing=()):
+        """
+        Profile ids in numeric order; ids present in the file but outside
+        the layout (existing) are listed too so nothing becomes unreachable.
+        """
+        ids = {str(i) for i in range(self.profile_count)} | set(existing)
+        return sorted(ids, key=lambda p: (not p.isdigit(), int(p) if p.isdigit() else 0, p))
+
+    def profile_name(self, profile_id):
+        """Display name of a profile: custom name, shipped name, or a numbered one"""
+        return self.names.get(profile_id) or self.DEFAULT_PROFILE_NAMES.get(profile_id, f"Profile {profile_id}")
+
+    def has_profile(self, profile_id):
+        return str(profile_id).isdigit() and int(profile_id) < self.profile_count
+
+    def has_key(self, key_id):
+        return str(key_id).isdigit() and 1 <= int(key_id) <= self.key_count
+
+    def position(self, key_id):
+        """Return the (row, col) of a key id"""
+        return divmod(int(key_id) - 1, self.cols)
+
+    def empty_data(self):
+        """A new sparse keysfile for this layout: no key entries are materialized"""
+        return {
+            "layout": self.to_dict(),
+            "profiles": {str(i): {} for i in range(self.profile_count)}
+        }
+
+    def __eq__(self, other):
+        return isinstance(other, Layout) and (self.rows, self.cols, self.profile_count, self.names) == \
+            (other.rows, other.cols, other.profile_count, other.names)
+
+    def __repr__(self):
+        return f"Layout(rows={self.rows}, cols={self.cols}, profile_count={self.profile_count})"
@@ -41,6 +41,7 @@ class ModernKeyButton(tk.Canvas):
         self.command = command
         self.hovered = False
         self.selected = False
+        self.pressed = False  # Held down on the pad itself
         self.width = width
         self.height = height
         
@@ -158,6 +159,13 @@ class ModernKeyButton(tk.Canvas):
             # Reset shadow
             self.itemconfig(self.shadow_id, fill="#222222")
     
+    def set_pressed(self, pressed):
+        """Light the button while its key is held down on the pad"""
+        if pressed == self.pressed:
+            return
+        self.pressed = pressed
+        self._restore_after_click()
+
     def on_enter(self, event):
         """Handle mouse enter event with smoother hover effect"""
         if not self.hovered and not self.selected:
@@ -202,7 +210,11 @@ class ModernKeyButton(tk.Canvas):
     def _restore_after_click(self):
         """Restore button appearance after click"""
         # Restore background based on state
-        if self.selected:
+        if self.pressed:
+            self.itemconfig(self.rect_id, fill=COLORS["success"])
+            self.itemconfig(self.name_id, fill=COLORS["bg_dark"])
+            self.itemconfig(self.keys_id, fill=COLORS["bg_dark"])
+        elif self.selected:
             self.itemconfig(self.rect_id, fill=COLORS["selection"])
             self.itemconfig(self.name_id, fill=COLORS["accent"])
             self.itemconfig(self.keys_id, fill=COLORS["accent"])
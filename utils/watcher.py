@@ -0,0 +1,212 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+
+# inotify constants from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_CLOEXEC = 0o2000000
+IN_NONBLOCK = 0o4000
+
+_EVENT = struct.Struct("iIII")
+
+
+def diff_profiles(old, new):
+    """
+    Return the set of (profile_id, key_id) pairs that differ between two
+    profiles dicts. A profile that was added or removed is reported as
+    (profile_id, None).
+
+    The store replaces the dicts it changes rather than mutating them, so
+    unchanged profiles are skipped by identity before comparing contents.
+    """
+    changed = set()
+    for profile_id in set(old) | set(new):
+        if profile_id not in old or profile_id not in new:
+            changed.add((profile_id, None))
+            continue
+        old_profile, new_profile = old[profile_id], new[profile_id]
+        if old_profile is new_profile:
+            continue
+        for key_id in set(old_profile) | set(new_profile):
+            if old_profile.get(key_id) != new_profile.get(key_id):
+                changed.add((profile_id, key_id))
+    return changed
+
+
+class InotifyBackend:
+    """Wait for changes to files in one directory using Linux inotify"""
+
+    def __init__(self, directory):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch failed for {directory}")
+
+    def wait(self, timeout):
+        """Return the names of files changed within timeout seconds"""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+        try:
+            buf = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+
+        names = set()
+        offset = 0
+        while offset + _EVENT.size <= len(buf):
+            _, _, _, length = _EVENT.unpack_from(buf, offset)
+            name = buf[offset + _EVENT.size:offset + _EVENT.size + length]
+            names.add(os.fsdecode(name.rstrip(b"\0")))
+            offset += _EVENT.size + length
+        return names
+
+    def close(self):
+        os.close(self.fd)
+
+
+class _PollingBackend:
+    """Portable fallback that compares stat results of the watched files"""
+
+    def __init__(self, directory, names, interval=0.5):
+        self.directory = directory
+        self.names = names
+        self.interval = interval
+        self._last = self._snapshot()
+
+    def _snapshot(self):
+        snapshot = {}
+        for name in self.names:
+            try:
+                st = os.stat(os.path.join(self.directory, name))
+                snapshot[name] = (st.st_size, st.st_mtime_ns, st.st_ino)
+            except OSError:
+                snapshot[name] = None
+        return snapshot
+
+    def wait(self, timeout):
+        time.sleep(min(timeout, self.interval))
+        current = self._snapshot()
+        changed = {name for name in self.names if current[name] != self._last[name]}
+        self._last = current
+        return changed
+
+    def close(self):
+        pass
+
+
+class KeysfileWatcher:
+    """
+    Watch keysfile.json for edits made outside this process.
+
+    Uses inotify on Linux and stat polling elsewhere (or if inotify is not
+    available). Bursts of writes are debounced, the file is re-read once
+    through the ProfileStore, and callback(changed) is called from the
+    watcher thread with the set of (profile_id, key_id) pairs that changed.
+    """
+
+    def __init__(self, path, callback, store=None, debounce=0.1, force_polling=False):
+        if store is None:
+            from engine import profile_store as store
+        self.store = store
+        self.callback = callback
+        self.debounce = debounce
+        self.force_polling = force_polling
+        self.path = path
+        self._profiles = self._load()
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def _load(self):
+        try:
+            return self.store.read(self.path).get("profiles", {})
+        except Exception as e:
+            print(f"Error reading {self.path}: {e}")
+            return {}
+
+    def _watched_names(self):
+        name = os.path.basename(self.path)
+        return {name, name + ".journal"}
+
+    def _make_backend(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        if sys.platform.startswith("linux") and not self.force_polling:
+            try:
+                return InotifyBackend(directory)
+            except (OSError, AttributeError) as e:
+                print(f"inotify unavailable, falling back to polling: {e}")
+        return _PollingBackend(directory, self._watched_names())
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout=1)
+        self._thread = None
+
+    def set_path(self, path):
+        """Watch a different keysfile, e.g. after the drive was remounted"""
+        if path == self.path:
+            return
+        running = self._thread is not None
+        self.stop()
+        with self._lock:
+            self.path = path
+            self._profiles = self._load()
+        if running:
+            self.start()
+
+    def _run(self):
+        try:
+            backend = self._make_backend()
+        except OSError as e:
+            print(f"Error watching {self.path}: {e}")
+            return
+
+        names = self._watched_names()
+        try:
+            while not self._stop.is_set():
+                if not (backend.wait(0.5) & names):
+                    continue
+                # Debounce: keep waiting until the writes stop
+                while not self._stop.is_set() and backend.wait(self.debounce) & names:
+                    pass
+                self.check()
+        finally:
+            backend.close()
+
+    def check(self):
+        """Re-read the keysfile and dispatch the changes, if any"""
+        with self._lock:
+            old = self._profiles
+            new = self._load()
+            self._profiles = new
+        changed = diff_profiles(old, new)
+        if changed:
+            try:
+                self.callback(changed)
+            except Exception as e:
+                print(f"Error dispatching profile changes: {e}")
+        return changed